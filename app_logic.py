@@ -1,11 +1,207 @@
+import os
 import random
 import re
-import os
+import time
+from collections import deque
 from pathlib import Path
-from send2trash import send2trash
 
-from config import load_or_create_config, save_config, CONFIG_FILE
-from file_utils import find_files, open_file, show_file_in_explorer
+from config import (
+    load_open_history,
+    load_recent_files,
+    JsonWriter,
+    SettingsStore,
+    CONFIG_FILE,
+    DEDUP_FILE,
+    HISTORY_FILE,
+    RECENT_FILE,
+)
+from file_filter import DEFAULT_EXCLUDE_DIRS, FileFilter, parse_rules
+from file_index import FileIndex
+from file_collection import FileCollection
+from file_tree import FileTree
+from scan_cache import ScanCache
+from scan_stats import ScanStats
+from trash_queue import TrashQueue, trash_files
+from file_utils import (
+    classify_entry,
+    resolve_picked_path,
+    sample_matching_files,
+    scan_directories,
+    show_file_in_explorer,
+    warm_file,
+    ScanCancelled,
+    SYMLINK_POLICIES,
+)
+from weight_index import WeightIndex
+
+# Стратегии взвешенного выбора (настройка weighting)
+WEIGHTINGS = ("none", "size", "age", "least_recent", "folder")
+# Предельный возраст (в днях) для весов "age" и "least_recent"
+MAX_WEIGHT_DAYS = 365.0
+# Сколько последних открытых файлов помнит история "least_recent"
+HISTORY_LIMIT = 10000
+# Режимы выбора (настройка picker)
+PICKER_MODES = ("random", "shuffle", "reservoir")
+# Как часто (в секундах) передавать найденные файлы во время потокового сканирования
+STREAM_INTERVAL = 0.1
+
+
+def _make_stream_reporter(directory: str, file_filter: FileFilter, progress):
+    """
+    Возвращает обработчик on_directory для scan_directories(), который
+    пачками передает найденные файлы через progress(количество,
+    [(относительная_папка, путь_папки, все_имена, подходящие_имена), ...]).
+    Подходящие отбираются здесь по file_filter; все имена нужны, если
+    фильтр сменится до конца сканирования (см. AppLogic._add_found).
+    Первая пачка отправляется сразу, следующие — не чаще раза в STREAM_INTERVAL.
+    """
+    root = os.path.realpath(directory)
+    is_match = file_filter.matches
+    batch = []
+    scanned_count = 0
+    last_sent = None
+
+    def on_directory(rel_dir: str, files: list[str]):
+        nonlocal scanned_count, last_sent
+        scanned_count += len(files)
+        matched = [name for name in files if is_match(name)]
+        if files:
+            dir_path = os.path.join(root, *rel_dir.split("/"))
+            batch.append((rel_dir, dir_path, files, matched))
+        now = time.monotonic()
+        if batch and (last_sent is None or now - last_sent >= STREAM_INTERVAL):
+            progress(scanned_count, batch.copy())
+            batch.clear()
+            last_sent = now
+
+    return on_directory
+
+
+def _load_indexed_tree(
+    file_index: FileIndex, directory: str, with_stats: bool
+) -> FileTree | None:
+    """
+    Строит дерево папки из индекса. При with_stats размеры и даты файлов тоже
+    берутся из индекса, но только если они сохранены для всех папок: иначе
+    недостающие пришлось бы читать отдельными stat (их соберет сканирование).
+    """
+    file_stats = {} if with_stats else None
+    records = file_index.load(directory, file_stats)
+    if records is None:
+        return None
+    if file_stats is not None and len(file_stats) != len(records):
+        file_stats = None
+    return FileTree(directory, records, file_stats)
+
+
+def _build_file_list(tree: FileTree, list_settings: tuple) -> FileCollection:
+    """
+    Строит список файлов дерева для настроек list_settings
+    (см. AppLogic._list_settings). Размеры и даты берутся из дерева, только
+    если они собраны при сканировании или сохранены в индексе для всех папок.
+    """
+    file_filter, recursive, subdirectory, with_stats = list_settings
+    with_metadata = with_stats and tree.file_stats is not None
+    return FileCollection.from_groups(
+        tree.file_groups(file_filter, recursive, subdirectory, with_stats=with_metadata),
+        with_metadata,
+    )
+
+
+def _stat_weight(weighting: str, size: int, mtime: float, now: float) -> float:
+    """Вес по размеру или возрасту файла (размер -1 — файл не прочитан)."""
+    if size < 0:
+        return 0.0
+    if weighting == "size":
+        # Пустые файлы тоже можно выбрать, хотя и редко
+        return max(size, 1)
+    days = (now - mtime) / 86400
+    return min(max(days, 0.0), MAX_WEIGHT_DAYS) + 1.0
+
+
+def _history_weight(opened_at: float | None, now: float) -> float:
+    """Вес для стратегии "least_recent" по времени последнего открытия."""
+    if opened_at is None:
+        return MAX_WEIGHT_DAYS  # Еще не открывался — максимальный вес
+    days = (now - opened_at) / 86400
+    # Небольшая добавка, чтобы только что открытый файл не выпадал совсем
+    return min(max(days, 0.0), MAX_WEIGHT_DAYS) + 0.01
+
+
+def _trim_history(history: dict[str, float]) -> dict[str, float]:
+    """
+    Оставляет в истории открытий не больше HISTORY_LIMIT последних файлов,
+    открытых не раньше MAX_WEIGHT_DAYS дней назад (вес более старых
+    и забытых одинаков). Записи упорядочены от старых к новым.
+    """
+    oldest = time.time() - MAX_WEIGHT_DAYS * 86400
+    recent = sorted(
+        (item for item in history.items() if item[1] >= oldest),
+        key=lambda item: item[1],
+    )
+    return dict(recent[-HISTORY_LIMIT:])
+
+
+def _build_weights(
+    tree: FileTree, list_settings: tuple, weighting: str, open_history: dict
+) -> WeightIndex | None:
+    """
+    Строит индекс весов для списка из _build_file_list, перебирая те же
+    группы файлов по папкам (вес "folder" — 1 / число файлов папки).
+    Возвращает None, если весов нет или размеры и даты не собраны.
+    """
+    file_filter, recursive, subdirectory, with_stats = list_settings
+    with_metadata = with_stats and tree.file_stats is not None
+    if weighting == "none" or (weighting in ("size", "age") and not with_metadata):
+        return None
+    now = time.time()
+
+    def weights():
+        for dir_path, names, *columns in tree.file_groups(
+            file_filter, recursive, subdirectory, with_stats=with_metadata
+        ):
+            prefix = os.path.join(dir_path, "")
+            if weighting in ("size", "age"):
+                for name, size, mtime in zip(names, *columns):
+                    yield prefix + name, _stat_weight(weighting, size, mtime, now)
+            elif weighting == "folder":
+                weight = 1.0 / len(names)
+                for name in names:
+                    yield prefix + name, weight
+            else:
+                for name in names:
+                    path = prefix + name
+                    yield path, _history_weight(open_history.get(path), now)
+
+    return WeightIndex(weights())
+
+
+def _prepare_scan_result(
+    tree: FileTree,
+    list_settings: tuple,
+    stats: ScanStats | None = None,
+    weighting: str = "none",
+    open_history: dict | None = None,
+) -> tuple:
+    """
+    Готовит дерево к применению в фоновом потоке: фильтрует файлы, строит
+    список файлов и индекс весов и оценивает занятую деревом память, чтобы
+    главному потоку осталось только подставить готовое. Возвращает
+    (дерево, list_settings, список_файлов, индекс_весов); список — None,
+    если папки нет в дереве, индекс — None, если его нужно строить по списку.
+    """
+    stats = stats or ScanStats()
+    # Фильтрация по расширениям — самая долгая часть, выполняем ее здесь
+    with stats.phase("filter"):
+        tree.files(list_settings[0], recursive=True)
+    file_list = weights = None
+    subdirectory = list_settings[2]
+    if "" in tree and (not subdirectory or subdirectory in tree):
+        with stats.phase("build_list"):
+            file_list = _build_file_list(tree, list_settings)
+            weights = _build_weights(tree, list_settings, weighting, open_history or {})
+    tree.memory_size  # Считается один раз и запоминается (cached_property)
+    return tree, list_settings, file_list, weights
 
 
 class AppLogic:
@@ -14,23 +210,187 @@ class AppLogic:
     не зависящую от пользовательского интерфейса.
     """
 
-    def __init__(self):
-        """Инициализирует состояние приложения, загружая конфигурацию."""
-        # Загружаем начальную конфигурацию
+    def __init__(
+        self,
+        background_scans: bool = False,
+        index_file: str | None = None,
+        directory: str | None = None,
+        defer_index: bool = False,
+    ):
+        """
+        Инициализирует состояние приложения, загружая конфигурацию.
+        directory заменяет папку из настроек на время работы (в конфиг не сохраняется).
+        При background_scans=True сканирование не выполняется внутри методов:
+        они возвращают статус "scanning", а вызывающая сторона сама запускает
+        задачу из make_scan_task() (например, в фоновом потоке).
+        С index_file содержимое папок кэшируется на диске (см. FileIndex):
+        список файлов доступен сразу, а сканирование лишь перепроверяет его.
+        При defer_index=True индекс не читается при создании: его загружает
+        задача из make_index_task(), чтобы окно появилось быстрее.
+        """
+        # Загружаем начальную конфигурацию; изменения записываются на диск
+        # отложенно и в фоне (см. SettingsStore)
+        self.settings = SettingsStore(CONFIG_FILE)
         (
             self.directory_to_scan,
             self.file_extensions,
             self.recursive_scan,
             self.toplevel_dirs_only,
-        ) = load_or_create_config(CONFIG_FILE)
-        self.file_list = []
+        ) = self.settings.settings()
+        if directory:
+            self.directory_to_scan = directory
+        self.file_list = FileCollection()
         self.subdirectories = []
         self.selected_subdirectory: str | None = None  # None означает "Искать везде"
         self.last_selected_file: Path | None = None
+        # Запись списка, из которой получен last_selected_file (до раскрытия ссылок)
+        self._last_selected_entry: str | None = None
+        self.background_scans = background_scans
+        # True, пока file_list не соответствует текущим настройкам
+        self.file_list_outdated = True
+
+        # Режим выбора: "random" — с повторами, "shuffle" — без повторов,
+        # пока не будут выбраны все файлы, "reservoir" — без списка файлов:
+        # каждый выбор — один обход папки (см. make_pick_task)
+        self.picker_mode = self.settings.option("picker", "random")
+        if self.picker_mode not in PICKER_MODES:
+            print(f"Неизвестный режим picker '{self.picker_mode}', используется random")
+            self.picker_mode = "random"
+        # Сколько последних открытых файлов не предлагать снова (0 — не исключать)
+        recent_limit = max(self.settings.option("recent_limit", 0), 0)
+        self._recent = deque(
+            load_recent_files(RECENT_FILE)[-recent_limit:] if recent_limit else (),
+            maxlen=recent_limit,
+        )
+        self._recent_writer = JsonWriter(RECENT_FILE)
+        # Файлы, выбранные в текущем круге режима "shuffle": вышедший из окна
+        # недавних файл снова доступен, только если в этом круге не выбирался
+        self._round: set[str] = set()
+        self._rng = random.Random()
+        # Заранее выбранный и прогретый следующий файл (см. make_prefetch_task)
+        self.prefetch = self.settings.option("prefetch", True)
+        self._next_pick: str | None = None
+        # Файлы, отмеченные для удаления в корзину: удаляются пачкой в фоне
+        # через trash_delay секунд после последней отметки (до этого — отмена)
+        trash_delay = max(self.settings.option("trash_delay", 5.0), 0.0)
+        self.trash_queue = TrashQueue(trash_delay)
+        # False, пока get_random_files() откладывает запись истории выбора на диск
+        self._persist_picks = True
+
+        # Взвешенный выбор: по размеру, возрасту, давности открытия или
+        # с равным весом каждой папки. Индекс весов строится при первом выборе.
+        self.weighting = self.settings.option("weighting", "none")
+        if self.weighting not in WEIGHTINGS:
+            print(f"Неизвестная стратегия weighting '{self.weighting}', выбор без весов")
+            self.weighting = "none"
+        self._open_history = (
+            _trim_history(load_open_history(HISTORY_FILE))
+            if self.weighting == "least_recent"
+            else {}
+        )
+        # История записывается на диск отложенно и в фоне (как и недавние)
+        self._history_writer = JsonWriter(HISTORY_FILE)
+        self._weights: WeightIndex | None = None
+        # Копия истории, по которой идущая фоновая задача строит веса
+        # (см. _snapshot_history)
+        self._pending_history: dict | None = None
+
+        # Фильтр по размеру и дате изменения (0 — без ограничения). Размеры
+        # и даты собираются при сканировании, отдельных stat не требуется
+        self.min_size_mb = max(self.settings.option("min_size_mb", 0.0), 0.0)
+        self.max_size_mb = max(self.settings.option("max_size_mb", 0.0), 0.0)
+        self.max_age_days = max(self.settings.option("max_age_days", 0), 0)
+
+        # Поиск дубликатов: из файлов с одинаковым содержимым выбирается только
+        # один. Хэши считаются в фоне после сканирования (см. make_dedup_task)
+        self.dedup = self.settings.option("dedup", False)
+        self.dedup_index = None
+        if self.dedup:
+            # Импорт здесь: модуль (sqlite3, hashlib, mmap, пул потоков) нужен
+            # только при включенном поиске дубликатов
+            from dedup_index import DedupIndex
+
+            workers = self.settings.option("dedup_workers", 4)
+            self.dedup_index = DedupIndex(DEDUP_FILE, workers)
+        # Группы путей с одинаковым содержимым по всему дереву
+        self.duplicate_groups: list[list[str]] = []
+
+        # Обработка символических ссылок (см. SYMLINK_POLICIES)
+        self.symlinks = self.settings.option("symlinks", "resolve")
+        if self.symlinks not in SYMLINK_POLICIES:
+            print(f"Неизвестный режим symlinks '{self.symlinks}', используется resolve")
+            self.symlinks = "resolve"
+
+        # Сколько потоков обходят подпапки верхнего уровня параллельно
+        # (ускоряет сканирование сетевых дисков с большой задержкой)
+        self.scan_workers = max(self.settings.option("scan_workers", 1), 1)
+
+        # Потоковое сканирование: при первом сканировании папки файлы можно
+        # выбирать из уже найденных, не дожидаясь конца обхода
+        self.streaming_scan = self.settings.option("streaming_scan", True)
+
+        # Диагностика: статистика каждого сканирования пишется в журнал
+        # (logging) и показывается в окне статистики
+        self.diagnostics = self.settings.option("diagnostics", False)
+        if self.diagnostics:
+            import logging
+
+            logging.basicConfig(level=logging.INFO)
+        # Статистика последнего примененного сканирования и идущего сейчас
+        self.last_scan_stats: ScanStats | None = None
+        self._pending_stats: ScanStats | None = None
+
+        # Правила отбора файлов: расширения, шаблоны include/exclude и папки,
+        # которые не обходятся (exclude_dirs). Правила задаются в settings.ini,
+        # расширения — в окне (см. update_extensions)
+        self.file_filter = FileFilter(
+            self.file_extensions,
+            parse_rules(self.settings.option("include", "")),
+            parse_rules(self.settings.option("exclude", "")),
+            parse_rules(self.settings.option("exclude_dirs", DEFAULT_EXCLUDE_DIRS)),
+        )
+
+        # Снимки с разной обработкой ссылок и разными исключенными папками
+        # различаются, поэтому хранятся отдельно
+        variant = self.symlinks
+        if self.file_filter.exclude_dirs:
+            variant += "|" + ",".join(self.file_filter.exclude_dirs)
+        self.file_index = FileIndex(index_file, variant=variant) if index_file else None
+        # Дерево папок с файлами; из него получаются подпапки и список файлов
+        self._tree: FileTree | None = None
+        # Деревья недавно открытых папок (в пределах scan_cache_mb мегабайт):
+        # при возврате к папке список файлов строится сразу, а сканирование
+        # перечитывает только папки, mtime которых изменился
+        cache_mb = max(self.settings.option("scan_cache_mb", 64), 0)
+        self.tree_cache = ScanCache(max_bytes=cache_mb * 1024 * 1024)
+        # True, пока отложенная загрузка индекса не выполнена
+        self.index_pending = (
+            defer_index
+            and self.file_index is not None
+            and self.picker_mode != "reservoir"
+        )
+        if not self.index_pending:
+            self._tree = self._load_tree_from_index()
+        if self._tree is not None:
+            self._update_from_tree()
+
+        # Режим наблюдения: изменения на диске применяются без пересканирования
+        self.watch_enabled = self.settings.option("watch", False)
+        self._watcher = None
+        # События, пришедшие до окончания сканирования: оно могло прочитать
+        # папку до изменения, поэтому они применяются и к его дереву
+        self._watch_backlog: list | None = None
+
+        # Папка идущего фонового сканирования (None — сканирование не идет)
+        # и все, что нашло потоковое сканирование: по этому при смене
+        # настроек список перестраивается без повторного сканирования
+        self._scan_directory: str | None = None
+        self._found: list = []
+        self._found_filter: FileFilter | None = None
 
         # Выполняем первоначальное сканирование
-        self.update_subdirectories()
-        self.refresh_file_list()
+        if not self.background_scans:
+            self._rescan()
 
     def get_scan_path(self) -> Path:
         """Определяет корневой путь для сканирования на основе выбранной подпапки."""
@@ -39,58 +399,634 @@ class AppLogic:
             return main_path / self.selected_subdirectory
         return main_path
 
-    def refresh_file_list(self) -> tuple[str, str]:
+    @staticmethod
+    def _cache_key(directory: str) -> str:
+        return os.path.normcase(os.path.abspath(directory))
+
+    def _load_cached_tree(self) -> FileTree | None:
+        """Возвращает дерево текущей папки из кэша, иначе из индекса."""
+        if self.picker_mode == "reservoir":
+            return None
+        tree = self.tree_cache.get(self._cache_key(self.directory_to_scan))
+        if tree is None:
+            tree = self._load_tree_from_index()
+        return tree
+
+    def _load_tree_from_index(self) -> FileTree | None:
         """
-        Сканирует указанную директорию на наличие файлов с заданными расширениями.
+        Загружает сохраненное дерево текущей папки из индекса.
+        В режиме "reservoir" дерево и список файлов не строятся.
+        """
+        if self.file_index is None or self.picker_mode == "reservoir":
+            return None
+        return _load_indexed_tree(
+            self.file_index, self.directory_to_scan, self.capture_stats
+        )
+
+    @property
+    def capture_stats(self) -> bool:
+        """Нужны ли размеры и даты файлов: для весов, фильтра или дубликатов."""
+        return (
+            self.weighting in ("size", "age")
+            or self.dedup
+            or any(self._metadata_bounds())
+        )
+
+    def _metadata_bounds(self) -> tuple:
+        """Границы фильтра (мин_размер, макс_размер, не_раньше) в байтах и секундах."""
+        return (
+            int(self.min_size_mb * 1024 * 1024) or None,
+            int(self.max_size_mb * 1024 * 1024) or None,
+            time.time() - self.max_age_days * 86400 if self.max_age_days else None,
+        )
+
+    def _snapshot_history(self) -> dict | None:
+        """
+        Копирует историю открытий для фоновой задачи, строящей веса
+        "least_recent": открытые за время ее работы файлы учитываются
+        при применении результата (см. apply_scan_result).
+        """
+        if self.weighting != "least_recent":
+            return None
+        self._pending_history = dict(self._open_history)
+        return self._pending_history
+
+    def _list_settings(self) -> tuple:
+        """Настройки, от которых зависит список файлов (см. _build_file_list)."""
+        return (
+            self.file_filter,
+            self.recursive_scan,
+            self.selected_subdirectory,
+            self.capture_stats,
+        )
+
+    def _update_from_tree(
+        self,
+        stats: ScanStats | None = None,
+        file_list: FileCollection | None = None,
+        weights: WeightIndex | None = None,
+    ) -> tuple[str, str]:
+        """
+        Пересчитывает подпапки и список файлов из дерева без обращения к диску.
         Возвращает кортеж (сообщение, статус) для UI.
+        file_list и weights — список и индекс весов, уже построенные по дереву
+        для текущих настроек (см. _prepare_scan_result); иначе список строится
+        здесь, а индекс — при первом взвешенном выборе.
+        В stats записывается время этапов и размер списка файлов.
         """
-        scan_path = self.get_scan_path()
-        if not scan_path.is_dir():
-            self.file_list = []
+        stats = stats or ScanStats()
+        with stats.phase("subdirectories"):
+            self.subdirectories = self._tree.subdirectories(self.toplevel_dirs_only)
+        self.file_list_outdated = False
+        if "" not in self._tree or (
+            self.selected_subdirectory
+            and self.selected_subdirectory not in self._tree
+        ):
+            self.file_list = FileCollection()
             return (
-                f"Ошибка: Папка не найдена!\n{scan_path}",
+                f"Ошибка: Папка не найдена!\n{self.get_scan_path()}",
                 "error",
             )
 
-        self.file_list = find_files(
-            str(scan_path), self.file_extensions, self.recursive_scan
-        )
-        return f"Найдено файлов: {len(self.file_list)}", "info"
+        previous_list = self.file_list
+        if file_list is None:
+            weights = None  # Индекс весов перестроится при следующем выборе
+        self._weights = weights
+        with stats.phase("build_list"):
+            if file_list is None:
+                file_list = _build_file_list(self._tree, self._list_settings())
+            self.file_list = file_list
+            # Файлы в очереди на удаление не возвращаются в список
+            for entry in self.trash_queue.entries():
+                self._remove_from_list(entry)
+            self.file_list.set_metadata_filter(*self._metadata_bounds())
+            if self.duplicate_groups:
+                self._hide_duplicates()
+            # Уже выбранные и недавние файлы остаются исключенными: обновление
+            # списка не начинает круг выбора заново
+            for path in previous_list.excluded():
+                self.file_list.exclude(path)
+            self._exclude_recent()
+        stats.matches = self.file_list.visible_count
+        stats.file_list_bytes = self.file_list.memory_size
+        return self.get_file_count_message()
 
-    def update_subdirectories(self) -> list[str]:
-        """Сканирует и обновляет список подпапок первого уровня."""
-        self.subdirectories = []
-        scan_path = Path(self.directory_to_scan)
-        if not scan_path.is_dir():
-            return []
+    def get_file_count_message(self) -> tuple[str, str]:
+        """Возвращает (сообщение, статус) с текущим количеством файлов."""
+        visible = self.file_list.visible_count
+        if visible != len(self.file_list):
+            hidden = len(self.file_list) - visible
+            return f"Найдено файлов: {visible} (скрыто: {hidden})", "info"
+        return f"Найдено файлов: {visible}", "info"
+
+    def _forget_file(self, path: str):
+        """Убирает файл из списка и дерева, не перечитывая папку."""
+        if self._tree is not None:
+            self._tree.remove_file(path)
+        self._remove_from_list(path)
+        self._forget_duplicates([path])
+
+    def _add_to_list(self, path: str):
+        """Добавляет файл в список и в индекс весов."""
+        stat = None
+        if self.file_list.with_metadata and self._tree is not None:
+            stat = self._tree.stat(path)
+        if self.file_list.add(path, *(stat or ())) and self._weights is not None:
+            self._weights.set(path, self._weight_of(path))
+            self._reweight_folder(path)
+
+    def _remove_from_list(self, path: str):
+        """Убирает файл из списка и из индекса весов."""
+        if self.file_list.remove(path) and self._weights is not None:
+            self._weights.remove(path)
+            self._reweight_folder(path)
+
+    def _weight_of(self, path: str) -> float:
+        """Вычисляет вес файла для текущей стратегии weighting."""
+        if self.weighting in ("size", "age"):
+            stat = self._tree.stat(path) if self._tree is not None else None
+            return _stat_weight(self.weighting, *stat, time.time()) if stat else 0.0
+        if self.weighting == "least_recent":
+            return _history_weight(self._open_history.get(path), time.time())
+        if self.weighting == "folder":
+            if self._tree is None:
+                return 1.0
+            rel_dir, _ = self._tree.split_path(path)
+            return 1.0 / max(self._tree.matching_count(rel_dir), 1)
+        return 1.0
+
+    def _reweight_folder(self, path: str):
+        """При стратегии "folder" пересчитывает веса соседей файла."""
+        if self.weighting != "folder" or self._tree is None:
+            return
+        rel_dir, _ = self._tree.split_path(path)
+        for sibling in self._tree.matching_paths(rel_dir):
+            if sibling in self._weights:
+                self._weights.set(sibling, self._weight_of(sibling))
+
+    def _get_weights(self) -> WeightIndex:
+        """Возвращает индекс весов, строя его при первом обращении."""
+        if self._weights is None:
+            if self.weighting in ("size", "age") and self.file_list.with_metadata:
+                # Размеры и даты уже лежат в колонках списка
+                now = time.time()
+                weights = (
+                    (path, _stat_weight(self.weighting, size, mtime, now))
+                    for path, size, mtime in self.file_list.iter_metadata()
+                )
+            else:
+                weights = ((path, self._weight_of(path)) for path in self.file_list)
+            self._weights = WeightIndex(weights)
+        return self._weights
+
+    def _draw_weighted(self) -> str | None:
+        """Выбирает доступный файл пропорционально весу за O(log n)."""
+        weights = self._get_weights()
+        while True:
+            path = weights.sample(self._rng)
+            if path is None:
+                # Все доступные веса нулевые — выбираем равновероятно
+                return self.file_list.random_available(self._rng)
+            if self.file_list.is_available(path):
+                return path
+            # Исключенный файл обнуляем до начала нового круга
+            weights.suppress(path)
 
+    def make_scan_task(self):
+        """
+        Создает задачу сканирования текущей папки.
+        Задача не меняет состояние AppLogic, поэтому ее можно выполнять в другом
+        потоке: task(progress, cancel_event) -> результат для apply_scan_result().
+        Папки, не изменившиеся с прошлого сканирования, повторно не читаются.
+        При потоковом сканировании папки без сохраненного дерева найденные
+        файлы передаются через progress(количество, найденное) по мере обхода
+        (см. add_found_files).
+        """
+        directory = self.directory_to_scan
+        file_filter = self.file_filter
+        file_index = self.file_index
+        previous = self._tree.records if self._tree is not None else None
+        list_settings = self._list_settings()
+        weighting = self.weighting
+        open_history = self._snapshot_history()
+        symlinks = self.symlinks
+        workers = self.scan_workers
+
+        # Размеры и даты файлов собираются при обходе (DirEntry.stat), только
+        # если они нужны; для неизменившихся папок берутся из прежнего дерева
+        file_stats = previous_stats = None
+        if self.capture_stats:
+            previous_stats = self._tree.file_stats if self._tree is not None else None
+            previous_stats = previous_stats or {}
+            file_stats = dict(previous_stats)
+        stream = self.streaming_scan and previous is None
+        self._scan_directory = directory
+        if stream:
+            self._found = []
+            self._found_filter = file_filter
+        self._watch_backlog = []
+        watcher_ready = self._watcher.ready if self._watcher is not None else None
+        # Статистика собирается всегда (это несколько замеров времени на
+        # сканирование), а в журнал пишется только при включенной диагностике
+        stats = self._pending_stats = ScanStats()
+
+        def task(progress=None, cancel_event=None):
+            if watcher_ready is not None:
+                # Папки читаются только после того, как наблюдение поставлено:
+                # иначе изменение между чтением папки и началом наблюдения
+                # потерялось бы
+                while not watcher_ready.wait(0.1):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ScanCancelled()
+            on_directory = None
+            if stream and progress is not None:
+                on_directory = _make_stream_reporter(directory, file_filter, progress)
+            with stats.phase("scan"):
+                records, relisted = scan_directories(
+                    directory,
+                    previous,
+                    progress,
+                    cancel_event,
+                    symlinks,
+                    workers,
+                    on_directory,
+                    stats,
+                    file_filter.skip_directory,
+                    file_stats,
+                )
+            if file_index is not None and records:
+                changed = relisted
+                if file_stats is not None:
+                    # Колонки, прочитанные заново для неперечитанных папок,
+                    # тоже сохраняются: после перезапуска stat не понадобится
+                    changed = relisted | {
+                        rel_dir
+                        for rel_dir, columns in file_stats.items()
+                        if previous_stats.get(rel_dir) is not columns
+                    }
+                with stats.phase("index_save"):
+                    file_index.save(directory, records, changed, previous, file_stats)
+            tree = FileTree(directory, records, file_stats)
+            return _prepare_scan_result(
+                tree, list_settings, stats, weighting, open_history
+            )
+
+        return task
+
+    def apply_scan_result(self, result) -> tuple[str, str]:
+        """
+        Применяет результат задачи из make_scan_task().
+        Возвращает кортеж (сообщение, статус) для UI.
+        """
+        tree, list_settings, file_list, weights = result
+        if list_settings != self._list_settings():
+            file_list = None  # Настройки сменились во время сканирования
+        self._tree = tree
+        self.index_pending = False
+        self.end_scan()
+        self.tree_cache.put(self._cache_key(tree.directory), tree, tree.memory_size)
+        stats, self._pending_stats = self._pending_stats, None
+        history, self._pending_history = self._pending_history, None
+        message = self._update_from_tree(stats, file_list, weights)
+        if self._weights is not None and history is not None:
+            # Веса файлов, открытых во время сканирования, построены по старой истории
+            for path, opened_at in self._open_history.items():
+                if history.get(path) != opened_at and path in self._weights:
+                    self._weights.set(path, self._weight_of(path))
+        if self._watcher is not None and self._watcher.directory == tree.directory:
+            self._watcher.seed(tree.records)  # Исходный снимок для проверки mtime
+        backlog, self._watch_backlog = self._watch_backlog, None
+        if backlog:
+            # Изменения уже учтенные сканированием повторно ничего не меняют
+            message = self._apply_watch_events(backlog) or message
+        if stats is not None:
+            self.last_scan_stats = stats
+            if self.diagnostics:
+                stats.log()
+        return message
+
+    def make_index_task(self):
+        """
+        Создает задачу отложенной загрузки индекса (см. defer_index):
+        task(progress, cancel_event) -> результат для apply_index_result().
+        Чтение индекса и построение списка файлов выполняются в фоне.
+        """
+        directory = self.directory_to_scan
+        file_index = self.file_index
+        with_stats = self.capture_stats
+        list_settings = self._list_settings()
+        weighting = self.weighting
+        open_history = self._snapshot_history()
+
+        def task(progress=None, cancel_event=None):
+            tree = _load_indexed_tree(file_index, directory, with_stats)
+            if tree is None:
+                return directory, None
+            return directory, _prepare_scan_result(
+                tree, list_settings, None, weighting, open_history
+            )
+
+        return task
+
+    def apply_index_result(self, result) -> tuple[str, str] | None:
+        """
+        Применяет результат задачи из make_index_task(). Возвращает
+        (сообщение, статус), если список файлов получен из индекса.
+        """
+        directory, prepared = result
+        self.index_pending = False
+        if prepared is None or self._tree is not None or directory != self.directory_to_scan:
+            return None  # Папки нет в индексе или данные уже устарели
+        return self.apply_scan_result(prepared)
+
+    def add_found_files(self, found) -> bool:
+        """
+        Добавляет файлы, найденные идущим потоковым сканированием (см.
+        make_scan_task), чтобы из них можно было выбирать до его завершения.
+        Возвращает True, если список изменился.
+        """
+        if self._tree is not None or not self.file_list_outdated:
+            return False  # Список уже построен по дереву
+        self._found.extend(found)
+        count = len(self.file_list)
+        self._add_found(found)
+        return len(self.file_list) != count
+
+    def _add_found(self, found):
+        """Добавляет в список подходящие файлы из пачек потокового сканирования."""
+        file_filter = self.file_filter
+        for rel_dir, dir_path, names, matched in found:
+            if not FileTree.in_scope(rel_dir, self.selected_subdirectory, self.recursive_scan):
+                continue
+            if file_filter is not self._found_filter:
+                # Фильтр сменился во время сканирования
+                matched = [name for name in names if file_filter.matches(name)]
+            for name in matched:
+                self._add_to_list(os.path.join(dir_path, name))
+        self._exclude_recent()
+
+    def end_scan(self):
+        """Забывает об идущем сканировании: оно применено или завершилось ошибкой."""
+        self._scan_directory = None
+        self._found = []
+        self._found_filter = None
+
+    @property
+    def can_pick(self) -> bool:
+        """
+        Можно ли выбирать файл: список актуален или пополняется
+        потоковым сканированием.
+        """
+        if self.picker_mode == "reservoir":
+            return not self.file_list_outdated
+        if not self.file_list:
+            return False
+        return not self.file_list_outdated or self.streaming_scan
+
+    def refresh_file_list(self) -> tuple[str, str]:
+        """
+        Сканирует указанную директорию на наличие файлов с заданными расширениями.
+        Возвращает кортеж (сообщение, статус) для UI.
+        """
+        return self.apply_scan_result(self.make_scan_task()())
+
+    def prepare_reservoir(self) -> tuple[str, str]:
+        """
+        Подготовка режима "reservoir": файлы не ищутся заранее, читается только
+        список подпапок верхнего уровня. Возвращает (сообщение, статус).
+        """
+        self.file_list = FileCollection()
+        self.file_list_outdated = True
         try:
-            if self.toplevel_dirs_only:
-                # Только папки первого уровня
+            skip_dir = self.file_filter.skip_directory
+            with os.scandir(self.directory_to_scan) as entries:
                 self.subdirectories = sorted(
-                    [p.name for p in scan_path.iterdir() if p.is_dir()]
+                    entry.name
+                    for entry in entries
+                    if classify_entry(entry, self.symlinks) == "dir"
+                    and (skip_dir is None or not skip_dir(entry.name))
                 )
-            else:
-                # Все вложенные папки
-                all_dirs = []
-                # Используем os.walk для рекурсивного и эффективного поиска всех папок,
-                # так как он не итерируется по файлам, в отличие от rglob('*').
-                for root, dirs, _ in os.walk(scan_path):
-                    for d in dirs:
-                        # Составляем полный путь к подпапке
-                        full_path = Path(root) / d
-                        # Получаем относительный путь от scan_path и нормализуем разделители
-                        relative_path_str = str(
-                            full_path.relative_to(scan_path)
-                        ).replace("\\", "/")
-                        all_dirs.append(relative_path_str)
-                self.subdirectories = sorted(all_dirs)
-        except OSError as e:
-            print(f"Ошибка сканирования подпапок в {scan_path}: {e}")
+        except OSError:
             self.subdirectories = []
+            return f"Ошибка: Папка не найдена!\n{self.get_scan_path()}", "error"
+        self.file_list_outdated = False
+        return "Файлы ищутся при каждом выборе (режим без списка)", "info"
+
+    def make_pick_task(self, count: int = 1):
+        """
+        Создает задачу выбора count файлов без построения списка: один обход
+        папки с выборкой резервуаром (см. sample_matching_files).
+        Как и make_scan_task(), задачу можно выполнять в другом потоке:
+        task(progress, cancel_event) -> результат для apply_pick_result().
+        """
+        directory = str(self.get_scan_path())
+        file_filter = self.file_filter
+        recursive = self.recursive_scan
+        symlinks = self.symlinks
+        recent = list(self._recent)
+        rng = random.Random(self._rng.getrandbits(64))
+
+        def task(progress=None, cancel_event=None):
+            for excluded in (recent, ()):
+                paths, total = sample_matching_files(
+                    directory,
+                    file_filter,
+                    recursive,
+                    count,
+                    rng,
+                    excluded,
+                    cancel_event,
+                    symlinks,
+                )
+                # Если подходят только недавние файлы, выбираем среди них
+                if paths or not recent:
+                    break
+            return paths, total
 
+        return task
+
+    def apply_pick_result(self, result) -> tuple[list[Path], str]:
+        """
+        Применяет результат задачи из make_pick_task(): запоминает выбранные
+        файлы. Возвращает (пути, сообщение_для_ui).
+        """
+        paths, total = result
+        if not paths:
+            return [], "Файлы с указанными расширениями не найдены."
+        picked = []
+        self._persist_picks = False
+        try:
+            for path in paths:
+                self._set_picked(path)
+                picked.append(self.last_selected_file)
+        finally:
+            self._persist_picks = True
+            self._save_pick_state()
+        return picked, f"Выбрано: {self.last_selected_file.name} (из {total})"
+
+    def pick_without_listing(self, count: int = 1) -> tuple[list[Path], str]:
+        """
+        Выбирает count файлов одним обходом, не строя список файлов
+        (память не зависит от числа файлов). Возвращает (пути, сообщение_для_ui).
+        """
+        return self.apply_pick_result(self.make_pick_task(count)())
+
+    def update_subdirectories(self) -> list[str]:
+        """Обновляет список подпапок из дерева (сканирует папку, если дерева нет)."""
+        if self._tree is None:
+            self.refresh_file_list()
+        else:
+            self.subdirectories = self._tree.subdirectories(self.toplevel_dirs_only)
         return self.subdirectories
 
+    def child_subdirectories(self, rel_dir: str) -> list[str]:
+        """
+        Возвращает подпапки папки rel_dir ("" — корень) для постепенного
+        раскрытия дерева в списке выбора подпапки.
+        """
+        if self._tree is None:
+            # Без дерева (режим "reservoir") известен только верхний уровень
+            return [] if rel_dir else list(self.subdirectories)
+        return self._tree.children(rel_dir)
+
+    def _refresh(self) -> tuple[str, str]:
+        """
+        Обновляет данные после изменения настроек. Если дерево папок уже есть,
+        список файлов пересчитывается по нему без обращения к диску.
+        Иначе нужно сканирование: в фоновом режиме возвращается статус "scanning".
+        """
+        if self._tree is not None:
+            return self._update_from_tree()
+        if self.background_scans and self._scan_directory == self.directory_to_scan:
+            # Идущее сканирование этой папки подходит и для новых настроек:
+            # его не перезапускаем, а список строим из уже найденного
+            return self._rebuild_found_list()
+        return self._rescan()
+
+    def _rebuild_found_list(self) -> tuple[str, str]:
+        """
+        Перестраивает список по файлам, уже найденным идущим потоковым
+        сканированием (см. add_found_files); остальные добавит оно само.
+        """
+        previous_list = self.file_list
+        self.file_list = FileCollection()
+        self._weights = None
+        self._add_found(self._found)
+        # Уже выбранные файлы остаются исключенными (как в _update_from_tree)
+        for path in previous_list.excluded():
+            self.file_list.exclude(path)
+        return "Сканирование...", "info"
+
+    def _rescan(self) -> tuple[str, str]:
+        """
+        Перечитывает текущую папку с диска. В фоновом режиме только сообщает,
+        что нужно сканирование (статус "scanning"); пока оно идет, список файлов
+        берется из имеющегося дерева, если оно есть.
+        """
+        if self.picker_mode == "reservoir":
+            return self.prepare_reservoir()
+        if not self.background_scans:
+            return self.refresh_file_list()
+        if self._tree is not None:
+            self._update_from_tree()
+        else:
+            self.file_list_outdated = True
+            if self.streaming_scan:
+                # Список будет наполняться найденными файлами по ходу сканирования
+                self.file_list = FileCollection()
+                self._weights = None
+        return "Сканирование...", "scanning"
+
+    def ensure_watching(self):
+        """
+        Запускает наблюдение за текущей папкой, если оно включено в настройках.
+        Вызывать до сканирования: события, пришедшие во время него, применятся
+        после, а повторное применение уже учтенных изменений ничего не меняет.
+        """
+        if not self.watch_enabled:
+            return
+        if self._watcher is not None:
+            if self._watcher.directory == self.directory_to_scan:
+                return
+            self._watcher.stop()
+            self._watch_backlog = None  # События относились к прежней папке
+        # Импорт здесь: модуль наблюдения (ctypes, select) нужен только в режиме watch
+        from fs_watcher import create_watcher
+
+        self._watcher = create_watcher(
+            self.directory_to_scan,
+            symlinks=self.symlinks,
+            skip_dir=self.file_filter.skip_directory,
+        )
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Останавливает наблюдение за папкой."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _save_settings(self):
+        """Запоминает основные настройки (на диск они попадут отложенно)."""
+        self.settings.update(
+            self.directory_to_scan,
+            self.file_extensions,
+            self.recursive_scan,
+            self.toplevel_dirs_only,
+        )
+
+    def close(self):
+        """Останавливает наблюдение и записывает несохраненные настройки и историю."""
+        self.stop_watching()
+        self.settings.flush()
+        self._recent_writer.flush()
+        self._history_writer.flush()
+
+    def process_watch_events(self) -> tuple[str, str] | None:
+        """
+        Применяет накопившиеся изменения файловой системы к дереву, списку
+        файлов и подпапкам. Возвращает (сообщение, статус), если что-то изменилось.
+        """
+        if self._watcher is None:
+            return None
+        events = self._watcher.poll()
+        if not events:
+            return None
+        if self._watch_backlog is not None or self._tree is None:
+            # Сканирование еще идет: события понадобятся и для его дерева
+            if self._watch_backlog is None:
+                self._watch_backlog = []
+            self._watch_backlog.extend(events)
+        if self._tree is None:
+            return None  # Применятся к дереву первого сканирования
+        return self._apply_watch_events(events)
+
+    def _apply_watch_events(self, events) -> tuple[str, str]:
+        """Применяет события наблюдателя к дереву, списку файлов и подпапкам."""
+        subdirectories_changed = False
+        for kind, rel_dir, name in events:
+            if kind == "overflow":
+                # Часть событий потеряна — надежнее перечитать папку
+                return self._rescan()
+            if kind == "file_added":
+                if self._tree.add_file(rel_dir, name) and self._tree.in_scope(
+                    rel_dir, self.selected_subdirectory, self.recursive_scan
+                ):
+                    self._add_to_list(self._tree.path_of(rel_dir, name))
+            elif kind == "file_removed":
+                if self._tree.remove_file_at(rel_dir, name):
+                    self._remove_from_list(self._tree.path_of(rel_dir, name))
+            elif kind == "dir_added":
+                subdirectories_changed |= self._tree.add_directory(rel_dir, name)
+            elif kind == "dir_removed":
+                for path in self._tree.remove_directory(rel_dir, name):
+                    self._remove_from_list(path)
+                subdirectories_changed = True
+
+        if subdirectories_changed:
+            self.subdirectories = self._tree.subdirectories(self.toplevel_dirs_only)
+        return self.get_file_count_message()
+
     def select_new_directory(self, new_directory: str) -> tuple[str, str] | None:
         """
         Обновляет рабочую директорию, сохраняет конфигурацию и обновляет список файлов.
@@ -99,15 +1035,13 @@ class AppLogic:
             self.directory_to_scan = new_directory
             self.last_selected_file = None
             self.selected_subdirectory = None  # Сбрасываем на "Искать везде"
-            self.update_subdirectories()  # Обновляем список подпапок
-            save_config(
-                self.directory_to_scan,
-                self.file_extensions,
-                self.recursive_scan,
-                self.toplevel_dirs_only,
-                CONFIG_FILE,
-            )
-            return self.refresh_file_list()
+            # Дерево прежней папки больше не подходит; берем недавнее из кэша
+            # или сохраненное в индексе
+            self._tree = self._load_cached_tree()
+            self.duplicate_groups = []  # Найдутся заново после сканирования
+            self.index_pending = False
+            self._save_settings()
+            return self._rescan()
         return None  # Нет изменений
 
     def update_extensions(
@@ -122,44 +1056,35 @@ class AppLogic:
         seen = set()
         for part in raw_parts:
             clean_part = part.strip().lstrip(".")
-            if clean_part and clean_part not in seen:
+            # Расширения сравниваются без учета регистра: "MP4" и "mp4" — одно
+            if clean_part and clean_part.lower() not in seen:
                 cleaned_extensions.append(clean_part)
-                seen.add(clean_part)
+                seen.add(clean_part.lower())
 
         new_extensions_with_dots = [f".{ext}" for ext in cleaned_extensions]
         cleaned_display_str = ", ".join(cleaned_extensions)
 
         if set(new_extensions_with_dots) != set(self.file_extensions):
             self.file_extensions = new_extensions_with_dots
-            save_config(
-                self.directory_to_scan,
-                self.file_extensions,
-                self.recursive_scan,
-                self.toplevel_dirs_only,
-                CONFIG_FILE,
-            )
+            self.file_filter = self.file_filter.with_extensions(self.file_extensions)
+            self._save_settings()
             self.last_selected_file = None
-            message, status = self.refresh_file_list()
+            message, status = self._refresh()
             return cleaned_display_str, message, status
 
         # Возвращаем очищенную строку для консистентности UI, но без сообщения
         return cleaned_display_str, None, None
 
-    def set_toplevel_dirs_only(self, is_toplevel_only: bool) -> bool:
+    def set_toplevel_dirs_only(
+        self, is_toplevel_only: bool
+    ) -> tuple[str, str] | None:
         """Обновляет настройку отображения подпапок и их список."""
         if is_toplevel_only != self.toplevel_dirs_only:
             self.toplevel_dirs_only = is_toplevel_only
             self.selected_subdirectory = None  # Сбрасываем выбор
-            save_config(
-                self.directory_to_scan,
-                self.file_extensions,
-                self.recursive_scan,
-                self.toplevel_dirs_only,
-                CONFIG_FILE,
-            )
-            self.update_subdirectories()
-            return True  # Изменение было
-        return False  # Изменений не было
+            self._save_settings()
+            return self._refresh()
+        return None  # Изменений не было
 
     def set_selected_subdirectory(
         self, subdir_name: str | None
@@ -169,7 +1094,7 @@ class AppLogic:
             self.selected_subdirectory = subdir_name
             self.last_selected_file = None
             # Эта настройка не сохраняется в конфиг, это временный фильтр
-            return self.refresh_file_list()
+            return self._refresh()
         return None
 
     def set_recursive_scan(self, is_recursive: bool) -> tuple[str, str] | None:
@@ -179,16 +1104,122 @@ class AppLogic:
         if is_recursive != self.recursive_scan:
             self.recursive_scan = is_recursive
             self.last_selected_file = None
-            save_config(
-                self.directory_to_scan,
-                self.file_extensions,
-                self.recursive_scan,
-                self.toplevel_dirs_only,
-                CONFIG_FILE,
-            )
-            return self.refresh_file_list()
+            self._save_settings()
+            return self._refresh()
         return None
 
+    def set_metadata_filter(
+        self, min_size_mb: float, max_size_mb: float, max_age_days: int
+    ) -> tuple[str, str] | None:
+        """
+        Обновляет фильтр по размеру (МБ) и возрасту (дни); 0 — без ограничения.
+        Если размеры и даты уже есть в списке, он фильтруется на месте,
+        иначе нужно пересканирование, собирающее их.
+        """
+        values = (max(min_size_mb, 0.0), max(max_size_mb, 0.0), max(max_age_days, 0))
+        if values == (self.min_size_mb, self.max_size_mb, self.max_age_days):
+            return None
+        self.min_size_mb, self.max_size_mb, self.max_age_days = values
+        self.settings.set_option("min_size_mb", self.min_size_mb)
+        self.settings.set_option("max_size_mb", self.max_size_mb)
+        self.settings.set_option("max_age_days", self.max_age_days)
+        if self.file_list.set_metadata_filter(*self._metadata_bounds()):
+            if self._weights is not None:
+                # Ранее скрытые файлы снова могут выпасть при выборе
+                self._weights.restore_all()
+            return self.get_file_count_message()
+        if not self.capture_stats:
+            return None  # Фильтр снят, а список и так без него
+        if self._tree is not None and self._tree.file_stats is not None:
+            return self._update_from_tree()
+        return self._rescan()
+
+    def make_dedup_task(self):
+        """
+        Создает задачу поиска дубликатов среди подходящих файлов всего дерева
+        (не только выбранной подпапки). Как и make_scan_task(), выполняется
+        в другом потоке: task(progress, cancel_event) -> группы для
+        apply_dedup_result(). Возвращает None, если искать не нужно или
+        размеры файлов еще не собраны.
+        """
+        if self.dedup_index is None or self._tree is None:
+            return None
+        if self._tree.file_stats is None:
+            return None
+        # Дерево меняется в главном потоке (наблюдение), поэтому задача
+        # работает с копиями словарей; сами списки при изменении заменяются
+        records = dict(self._tree.records)
+        file_stats = dict(self._tree.file_stats)
+        path_of = self._tree.path_of
+        is_match = self.file_filter.matches
+        dedup_index = self.dedup_index
+
+        def task(progress=None, cancel_event=None):
+            entries = []
+            for rel_dir, (_, _, files) in records.items():
+                columns = file_stats.get(rel_dir)
+                if columns is None:
+                    continue  # Папка менялась после сканирования
+                for name, size, mtime in zip(files, *columns):
+                    if size > 0 and is_match(name):
+                        entries.append((path_of(rel_dir, name), size, mtime))
+            return dedup_index.find_duplicates(entries, progress, cancel_event)
+
+        return task
+
+    def apply_dedup_result(self, groups: list[list[str]]) -> tuple[str, str]:
+        """Применяет результат make_dedup_task(). Возвращает (сообщение, статус)."""
+        self.duplicate_groups = groups
+        self._hide_duplicates()
+        if self._weights is not None:
+            # Раньше скрытые копии снова могут выпасть при выборе
+            self._weights.restore_all()
+        return self.get_file_count_message()
+
+    def _hide_duplicates(self):
+        """Оставляет видимым в списке только первый путь каждой группы дубликатов."""
+        hidden = []
+        for group in self.duplicate_groups:
+            present = [path for path in group if path in self.file_list]
+            hidden.extend(present[1:])
+        self.file_list.set_hidden(hidden)
+
+    def _forget_duplicates(self, paths: list[str]):
+        """Убирает удаленные файлы из групп дубликатов и кэша хэшей."""
+        if self.dedup_index is None or not paths:
+            return
+        self.dedup_index.forget(paths)
+        removed = set(paths)
+        groups = []
+        for group in self.duplicate_groups:
+            group = [path for path in group if path not in removed]
+            if len(group) > 1:
+                groups.append(group)
+        self.duplicate_groups = groups
+        self._hide_duplicates()
+
+    def _exclude_recent(self):
+        """Исключает недавно открытые файлы из выбора."""
+        for path in self._recent:
+            self.file_list.exclude(path)
+
+    def _remember_recent(self, path: str):
+        """Добавляет файл в окно недавних и сохраняет его на диск."""
+        if not self._recent.maxlen:
+            return
+        if len(self._recent) == self._recent.maxlen:
+            dropped = self._recent[0]
+            # Файл, вышедший из окна, снова можно выбрать; в режиме "shuffle" —
+            # только если в этом круге он еще не выбирался
+            if dropped != path and dropped not in self._round:
+                self.file_list.include(dropped)
+                if self._weights is not None:
+                    self._weights.restore(dropped)
+        self._recent.append(path)
+        self.file_list.exclude(path)
+        if self._persist_picks:
+            self._recent_writer.save(list(self._recent))
+
     def get_random_file(self) -> tuple[Path | None, str]:
         """
         Выбирает случайный файл из списка.
@@ -196,21 +1227,121 @@ class AppLogic:
         """
         if not self.file_list:
             return None, "Файлы с указанными расширениями не найдены."
+        if not self.file_list.visible_count:
+            return None, "Нет файлов, подходящих под фильтр по размеру и дате."
 
-        random_file_path_str = random.choice(self.file_list)
-        self.last_selected_file = Path(random_file_path_str)
+        # Заранее выбранный файл берется, только если его еще можно выбрать
+        # (список мог измениться после выбора)
+        random_file_path_str, self._next_pick = self._next_pick, None
+        if random_file_path_str is None or not self.file_list.is_available(
+            random_file_path_str
+        ):
+            random_file_path_str = self._draw()
+        if self.picker_mode == "shuffle":
+            self.file_list.exclude(random_file_path_str)
+            self._round.add(random_file_path_str)
+        self._set_picked(random_file_path_str)
         return self.last_selected_file, f"Выбрано: {self.last_selected_file.name}"
 
-    def open_last_file(self) -> str:
-        """Открывает последний выбранный файл. Возвращает статус операции."""
-        if not self.last_selected_file:
-            return "Файл не был выбран."
+    def _draw(self) -> str:
+        """Выбирает случайный доступный файл, не запоминая выбор."""
+        if not self.file_list.available_count:
+            # Все файлы уже выбирались: начинаем новый круг,
+            # но недавно открытые по-прежнему пропускаем (если есть другие)
+            self.file_list.include_all()
+            self._round.clear()
+            self._exclude_recent()
+            if not self.file_list.available_count:
+                self.file_list.include_all()
+            if self._weights is not None:
+                self._weights.restore_all()
+
+        # Пока идет первое сканирование, весов нет: выбираем равновероятно
+        # из уже найденных файлов
+        if self.weighting == "none" or self._tree is None:
+            return self.file_list.random_available(self._rng)
+        return self._draw_weighted()
+
+    def make_prefetch_task(self):
+        """
+        Заранее выбирает следующий файл (как get_random_file(), но без записи
+        выбора) и создает задачу его прогрева: проверка, что файл есть,
+        и чтение его начала в кэш ОС (см. warm_file). Как и make_scan_task(),
+        задачу можно выполнять в другом потоке: task(progress, cancel_event) ->
+        результат для apply_prefetch_result(). Возвращает None, если выбирать
+        заранее нечего или настройка prefetch выключена.
+        """
+        self._next_pick = None
+        if not self.prefetch or self.picker_mode == "reservoir" or not self.can_pick:
+            return None
+        if not self.file_list.visible_count:
+            return None
+        path = self._draw()
+        symlinks = self.symlinks
+
+        def task(progress=None, cancel_event=None):
+            return path, warm_file(resolve_picked_path(path, symlinks))
+
+        return task
+
+    def apply_prefetch_result(self, result) -> bool:
+        """
+        Применяет результат make_prefetch_task(): файл будет выбран
+        следующим. Если файла на диске уже нет, он убирается из списка
+        и возвращается False — нужно выбрать заранее другой. Файл, который
+        не удалось прогреть по другой причине, остается в списке и тоже
+        выбирается (ошибку покажет открытие).
+        """
+        path, warmed = result
+        if warmed is False:
+            self._forget_file(path)
+            return False
+        self._next_pick = path
+        return True
+
+    def get_random_files(self, count: int) -> tuple[list[Path], str]:
+        """
+        Выбирает count файлов подряд (как count вызовов get_random_file()),
+        записывая историю выбора на диск один раз в конце.
+        Возвращает (пути, сообщение_для_ui).
+        """
+        picked = []
+        message = "Файлы с указанными расширениями не найдены."
+        self._persist_picks = False
         try:
-            open_file(str(self.last_selected_file))
-            return "success"
-        except IOError as e:
-            # В `e` уже обернуто имя файла из file_utils
-            return f"Ошибка открытия файла:\n{Path(str(e)).name}"
+            for _ in range(count):
+                path, message = self.get_random_file()
+                if path is None:
+                    break
+                picked.append(path)
+        finally:
+            self._persist_picks = True
+            self._save_pick_state()
+        return picked, message
+
+    def _save_pick_state(self):
+        """Записывает на диск недавние файлы и историю открытий."""
+        if self._recent.maxlen:
+            self._recent_writer.save(list(self._recent))
+        if self.weighting == "least_recent":
+            self._history_writer.save(dict(self._open_history))
+
+    def _set_picked(self, path: str):
+        """Запоминает выбранный файл: история, недавние и last_selected_file."""
+        if self.weighting == "least_recent":
+            # Записи идут от старых к новым: при переполнении забывается первая
+            self._open_history.pop(path, None)
+            self._open_history[path] = time.time()
+            if len(self._open_history) > HISTORY_LIMIT:
+                del self._open_history[next(iter(self._open_history))]
+            if self._weights is not None:
+                self._weights.set(path, self._weight_of(path))
+            if self._persist_picks:
+                self._history_writer.save(dict(self._open_history))
+        self._remember_recent(path)
+        self._last_selected_entry = path
+        # Реальный путь вычисляется только для выбранного файла
+        self.last_selected_file = Path(resolve_picked_path(path, self.symlinks))
 
     def show_last_file_in_explorer(self) -> str:
         """Показывает последний выбранный файл в проводнике. Возвращает статус."""
@@ -224,23 +1355,113 @@ class AppLogic:
             return f"Ошибка:\n{e}"
 
     def delete_last_file(self) -> tuple[str, str]:
-        """Перемещает последний выбранный файл в корзину. Возвращает (сообщение, статус)."""
+        """Ставит последний выбранный файл в очередь удаления (см. delete_file)."""
         if not self.last_selected_file:
             return "Еще ничего не выбиралось.", "info"
+        # В списке файл записан путем до раскрытия символических ссылок
+        entry = self._last_selected_entry or str(self.last_selected_file)
+        return self.delete_file(entry)
 
-        file_to_delete = self.last_selected_file
-        filename = file_to_delete.name
-
-        if not file_to_delete.exists():
+    def delete_file(self, path: str) -> tuple[str, str]:
+        """
+        Ставит файл из списка в очередь удаления в корзину (см. TrashQueue).
+        Файл сразу убирается из выбора, а удаляется пачкой вместе с другими
+        отмеченными (make_trash_task); до этого удаление можно отменить
+        (undo_delete). Возвращает (сообщение, статус).
+        """
+        file_to_delete = resolve_picked_path(path, self.symlinks)
+        filename = os.path.basename(file_to_delete)
+        if path == self._last_selected_entry:
             self.last_selected_file = None
-            return f"Файл '{filename}' уже удален или перемещен.", "error"
+        if not self.trash_queue.mark(path, file_to_delete):
+            return f"Файл '{filename}' уже в очереди на удаление.", "info"
+        # Убираем файл из списка на месте, без пересканирования
+        self._remove_from_list(path)
+        if self.duplicate_groups:
+            self._hide_duplicates()  # Видимой может стать другая копия
+        return (
+            f"Файл '{filename}' будет перемещен в корзину "
+            f"(в очереди: {self.trash_queue.pending_count}).",
+            "info",
+        )
 
-        try:
-            send2trash(str(file_to_delete))
-            self.last_selected_file = None
-            # Обновляем список файлов после удаления
-            self.refresh_file_list()
-            return f"Файл '{filename}' перемещен в корзину.", "success"
-        except OSError as e:
-            print(f"Не удалось удалить файл {file_to_delete}: {e}")
-            return f"Ошибка удаления файла:\n{filename}", "error"
+    def undo_delete(self) -> tuple[str, str]:
+        """Отменяет удаление файлов, которые еще ждут в очереди."""
+        entries = self.trash_queue.undo()
+        if not entries:
+            return "Удалять уже нечего: файлы перемещены в корзину.", "info"
+        for entry in entries:
+            self._restore_to_list(entry)
+        if self.duplicate_groups:
+            self._hide_duplicates()
+        return f"Удаление отменено, файлов: {len(entries)}.", "success"
+
+    def _restore_to_list(self, entry: str):
+        """Возвращает в список файл, удаление которого отменено или не удалось."""
+        if self.picker_mode == "reservoir":
+            return  # Списка нет, файлы ищутся при каждом выборе
+        if self._tree is None:
+            self._add_to_list(entry)
+            return
+        rel_dir, name = self._tree.split_path(entry)
+        record = self._tree.records.get(rel_dir)
+        # Настройки могли смениться: возвращаем, только если файл подходит
+        if (
+            record is not None
+            and name in record[2]
+            and self.file_filter.matches(name)
+            and self._tree.in_scope(
+                rel_dir, self.selected_subdirectory, self.recursive_scan
+            )
+        ):
+            self._add_to_list(entry)
+
+    def make_trash_task(self):
+        """
+        Забирает файлы из очереди удаления (отменить уже нельзя) и создает
+        задачу их перемещения в корзину пачками (см. trash_files). Как и
+        make_scan_task(), задачу можно выполнять в другом потоке:
+        task(progress, cancel_event) -> результат для apply_trash_result().
+        Возвращает None, если очередь пуста.
+        """
+        batch = self.trash_queue.take()
+        if not batch:
+            return None
+
+        def task(progress=None, cancel_event=None):
+            paths = [path for _, path in batch]
+            try:
+                trashed, failed = trash_files(paths, progress)
+            except Exception as e:  # Например, не удалось импортировать send2trash
+                # Задача не должна падать: файлы пачки иначе остались бы
+                # в очереди навсегда (не удалены и не возвращены в список)
+                print(f"Ошибка удаления в корзину: {e}")
+                trashed, failed = [], [(path, e) for path in paths]
+            return batch, set(trashed), failed
+
+        return task
+
+    def apply_trash_result(self, result) -> tuple[str, str]:
+        """
+        Применяет результат make_trash_task(): удаленные файлы убираются
+        из дерева, а те, что удалить не удалось, возвращаются в список.
+        Возвращает (сообщение, статус).
+        """
+        batch, trashed, failed = result
+        self.trash_queue.finish(batch)
+        removed = []
+        for entry, path in batch:
+            if path in trashed:
+                if self._tree is not None:
+                    self._tree.remove_file(entry)
+                removed.append(entry)
+            else:
+                self._restore_to_list(entry)
+        self._forget_duplicates(removed)
+        if failed:
+            names = ", ".join(os.path.basename(path) for path, _ in failed[:3])
+            return (
+                f"Не удалось переместить в корзину файлов: {len(failed)}\n{names}",
+                "error",
+            )
+        return f"Перемещено в корзину файлов: {len(removed)}.", "success"
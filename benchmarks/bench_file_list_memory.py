@@ -0,0 +1,76 @@
+"""
+Бенчмарк памяти списка файлов: list[str] полных путей (как возвращает
+find_files) против компактного FileCollection.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_file_list_memory
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+
+from benchmarks.common import measure, tree_layout
+from file_collection import FileCollection
+
+ROOT = os.path.join(os.sep, "mnt", "nas", "media", "archive")
+# Правдоподобная длина имени файла
+NAME_FORMAT = "Episode {index:07d} - some descriptive title 1080p{ext}"
+
+
+def make_groups(
+    depth: int, fanout: int, files_per_dir: int, seed: int
+) -> list[tuple[str, list[str]]]:
+    """Пары (путь_папки, имена) синтетического дерева без записи на диск."""
+    return [
+        (os.path.join(ROOT, *rel_dir.split("/")), names)
+        for rel_dir, names in tree_layout(
+            depth, fanout, files_per_dir, [".mkv"], seed, NAME_FORMAT
+        )
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, nargs="+", default=[100_000, 500_000])
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--files-per-dir", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'файлов':>9} {'list, МБ':>9} {'байт/файл':>10} "
+        f"{'compact, МБ':>12} {'байт/файл':>10} {'выбор, мкс':>11}"
+    )
+    for wanted in args.files:
+        # Наименьшее ветвление, при котором в дереве не меньше wanted файлов
+        dir_count = math.ceil(wanted / args.files_per_dir)
+        fanout = 1
+        while sum(fanout**level for level in range(args.depth + 1)) < dir_count:
+            fanout += 1
+        groups = make_groups(args.depth, fanout, args.files_per_dir, args.seed)
+        file_count = sum(len(names) for _, names in groups)
+        list_bytes = measure(
+            lambda _: [os.path.join(d, name) for d, names in groups for name in names],
+            repeat=1,
+        )["retained_kb"] * 1024
+        compact_bytes = measure(
+            lambda _: FileCollection.from_groups(groups), repeat=1
+        )["retained_kb"] * 1024
+        collection = FileCollection.from_groups(groups)
+        rng = random.Random(0)
+        start = time.perf_counter()
+        for _ in range(100_000):
+            collection.random_available(rng)
+        pick_us = (time.perf_counter() - start) / 100_000 * 1e6
+        print(
+            f"{file_count:>9} {list_bytes / 2**20:>9.1f} {list_bytes / file_count:>10.0f} "
+            f"{compact_bytes / 2**20:>12.1f} {compact_bytes / file_count:>10.0f} "
+            f"{pick_us:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Бенчмарк поиска файлов: однопроходный обход (find_files) против прежнего
+варианта с отдельным rglob на каждое расширение.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_find_files
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import make_tree, measure
+from file_utils import find_files
+
+EXTENSIONS = [
+    ".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv",
+    ".webm", ".m4v", ".mpg", ".mpeg", ".ts", ".3gp",
+]
+# В дереве есть и файлы, которые не ищутся
+TREE_EXTENSIONS = EXTENSIONS + [".txt", ".jpg", ".nfo"]
+
+
+def find_files_per_extension(
+    directory: str, extensions: list[str], recursive: bool
+) -> list[str]:
+    """Прежняя реализация: один проход rglob на каждое расширение."""
+    p = Path(directory)
+    glob_method = p.rglob if recursive else p.glob
+    found_files = []
+    for ext in extensions:
+        found_files.extend(glob_method(f"*{ext}"))
+    return [str(f.resolve()) for f in found_files]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--fanouts",
+        type=int,
+        nargs="+",
+        default=[4, 10, 20],
+        help="подпапок в каждой папке (размер дерева)",
+    )
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--files-per-dir", type=int, default=40)
+    parser.add_argument(
+        "--ext-counts", type=int, nargs="+", default=[1, 3, 12]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'файлов':>8} {'расш.':>6} {'rglob, с':>10} {'scandir, с':>11} {'x':>6}")
+    for fanout in args.fanouts:
+        with tempfile.TemporaryDirectory() as tmp:
+            _, size = make_tree(
+                Path(tmp),
+                args.depth,
+                fanout,
+                args.files_per_dir,
+                TREE_EXTENSIONS,
+                args.seed,
+            )
+            for ext_count in args.ext_counts:
+                exts = EXTENSIONS[:ext_count]
+                old_result = find_files_per_extension(tmp, exts, True)
+                new_result = find_files(tmp, exts, True)
+                assert sorted(old_result) == sorted(new_result), "результаты различаются"
+                old_time = measure(
+                    lambda _: find_files_per_extension(tmp, exts, True), args.repeat
+                )["min_ms"] / 1000
+                new_time = measure(
+                    lambda _: find_files(tmp, exts, True), args.repeat
+                )["min_ms"] / 1000
+                print(
+                    f"{size:>8} {ext_count:>6} {old_time:>10.3f} "
+                    f"{new_time:>11.3f} {old_time / new_time:>6.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Бенчмарк параллельного сканирования: scan_directories с пулом потоков против
+последовательного обхода на искусственно замедленной файловой системе.
+
+Задержка добавляется к каждому os.scandir и os.stat, как у сетевого диска.
+Запуск из корня репозитория:
+    python -m benchmarks.bench_parallel_scan
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from benchmarks.common import make_tree, measure
+from file_utils import scan_directories
+
+
+@contextmanager
+def slow_filesystem(latency: float):
+    """Подменяет os.scandir и os.stat версиями с задержкой latency секунд."""
+    original_scandir, original_stat = os.scandir, os.stat
+
+    def slow_scandir(*args, **kwargs):
+        time.sleep(latency)
+        return original_scandir(*args, **kwargs)
+
+    def slow_stat(*args, **kwargs):
+        time.sleep(latency)
+        return original_stat(*args, **kwargs)
+
+    os.scandir, os.stat = slow_scandir, slow_stat
+    try:
+        yield
+    finally:
+        os.scandir, os.stat = original_scandir, original_stat
+
+
+def listings(records: dict) -> list:
+    """Папки снимка в порядке обхода с подпапками и файлами, без mtime."""
+    return [(rel_dir, record[1:]) for rel_dir, record in records.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=16)
+    parser.add_argument("--files-per-dir", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_tree(
+            Path(tmp), args.depth, args.fanout, args.files_per_dir, [".mp4"], args.seed
+        )
+        serial_records, _ = scan_directories(tmp)
+
+        def scan_time(workers: int) -> float:
+            result = measure(lambda _: scan_directories(tmp, workers=workers), args.repeat)
+            return result["min_ms"] / 1000
+
+        with slow_filesystem(args.latency_ms / 1000):
+            serial_time = scan_time(1)
+            print(f"{'потоков':>8} {'время, с':>9} {'x':>6}")
+            for workers in args.workers:
+                records, _ = scan_directories(tmp, workers=workers)
+                # mtime только что созданных папок зависит от времени
+                # сканирования (см. MTIME_GRANULARITY_NS), сравниваем листинги
+                # и порядок папок
+                assert listings(records) == listings(
+                    serial_records
+                ), "результаты различаются"
+                elapsed = scan_time(workers)
+                print(f"{workers:>8} {elapsed:>9.3f} {serial_time / elapsed:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
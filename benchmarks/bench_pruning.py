@@ -0,0 +1,69 @@
+"""
+Бенчмарк исключения папок: scan_directories без правил против обхода,
+в котором служебные папки (.git, @eaDir и т.п.) отсекаются до чтения.
+
+В каждой папке с файлами создаются служебные .git/objects и @eaDir с файлами
+(см. benchmarks.common.make_tree), как в репозиториях и на NAS Synology. Выводятся время и число просмотренных записей.
+Запуск из корня репозитория:
+    python -m benchmarks.bench_pruning
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import make_tree, measure
+from file_filter import DEFAULT_EXCLUDE_DIRS, FileFilter, parse_rules
+from file_utils import scan_directories
+from scan_stats import ScanStats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--fanout", type=int, default=200)
+    parser.add_argument("--files-per-dir", type=int, default=20)
+    parser.add_argument(
+        "--junk", type=int, default=100, help="файлов в каждой служебной папке"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--exclude-dirs", default=DEFAULT_EXCLUDE_DIRS)
+    args = parser.parse_args()
+
+    file_filter = FileFilter([], exclude_dirs=parse_rules(args.exclude_dirs))
+    with tempfile.TemporaryDirectory() as tmp:
+        make_tree(
+            Path(tmp),
+            args.depth,
+            args.fanout,
+            args.files_per_dir,
+            [".mp4"],
+            args.seed,
+            junk_per_dir=args.junk,
+        )
+        print(
+            f"{'вариант':<14} {'время, с':>9} {'папок':>7} {'записей':>9} "
+            f"{'исключено':>10} {'x':>6}"
+        )
+        baseline = None
+        for name, skip_dir in (
+            ("без правил", None),
+            ("exclude_dirs", file_filter.skip_directory),
+        ):
+            stats = ScanStats()
+            scan_directories(tmp, stats=stats, skip_dir=skip_dir)
+            result = measure(
+                lambda _: scan_directories(tmp, skip_dir=skip_dir), args.repeat
+            )
+            elapsed = result["min_ms"] / 1000
+            baseline = baseline or elapsed
+            print(
+                f"{name:<14} {elapsed:>9.3f} {stats.directories_visited:>7} "
+                f"{stats.entries_examined:>9} {stats.directories_pruned:>10} "
+                f"{baseline / elapsed:>6.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
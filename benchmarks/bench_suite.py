@@ -0,0 +1,182 @@
+"""
+Набор бенчмарков: сканирование, выбор файла и работа с настройками на
+синтетическом дереве папок во временной директории.
+
+Для каждой операции измеряются задержка (среднее и перцентили), пропускная
+способность и пиковая память (tracemalloc). Результат можно сохранить в JSON
+и сравнить с результатом другого коммита.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_suite --output before.json
+    python -m benchmarks.bench_suite --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from app_logic import AppLogic
+from benchmarks.common import make_tree, measure
+from config import CONFIG_FILE, load_or_create_config, save_config
+from file_utils import find_files
+
+DEFAULT_EXTENSIONS = [".mp4", ".mkv", ".avi", ".txt", ".jpg"]
+
+
+def git_revision() -> str | None:
+    """Текущий коммит репозитория, если git доступен."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(tree_dir: str, extensions: list[str], args) -> dict:
+    """Измеряет операции; текущая папка должна быть временной (там settings.ini)."""
+    picked_ext = extensions[:2]
+    other_ext = extensions[:3]
+    save_config(tree_dir, picked_ext, True, False, CONFIG_FILE)
+    results = {}
+
+    results["find_files"] = measure(
+        lambda _: find_files(tree_dir, picked_ext, True), args.repeat
+    )
+
+    # Без дерева update_subdirectories сканирует папку целиком
+    results["update_subdirectories"] = measure(
+        lambda logic: logic.update_subdirectories(),
+        args.repeat,
+        setup=lambda: AppLogic(background_scans=True),
+    )
+
+    # С деревом повторное сканирование перечитывает только изменившиеся папки
+    logic = AppLogic()
+    results["refresh_file_list"] = measure(
+        lambda _: logic.refresh_file_list(), args.repeat
+    )
+
+    def pick_many(_):
+        for _ in range(args.picks):
+            logic.get_random_file()
+
+    results["get_random_file"] = measure(pick_many, args.repeat, calls=args.picks)
+
+    variants = [", ".join(ext.lstrip(".") for ext in e) for e in (other_ext, picked_ext)]
+
+    def toggle_extensions(_):
+        for variant in variants:
+            logic.update_extensions(variant)
+
+    results["update_extensions"] = measure(
+        toggle_extensions, args.repeat, calls=len(variants)
+    )
+
+    results["save_config"] = measure(
+        lambda _: save_config(tree_dir, picked_ext, True, False, CONFIG_FILE),
+        args.repeat,
+    )
+    results["load_or_create_config"] = measure(
+        lambda _: load_or_create_config(CONFIG_FILE), args.repeat
+    )
+    return results
+
+
+def print_results(results: dict, baseline: dict | None):
+    header = (
+        f"{'операция':<24} {'p50, мс':>10} {'p90, мс':>10} {'p99, мс':>10} "
+        f"{'оп/с':>11} {'пик, КБ':>9}"
+    )
+    if baseline:
+        header += f" {'p50 было':>10} {'x':>6}"
+    print(header)
+    for name, r in results.items():
+        ops = f"{r['ops_per_sec']:>11.0f}" if r["ops_per_sec"] else f"{'-':>11}"
+        line = (
+            f"{name:<24} {r['p50_ms']:>10.3f} {r['p90_ms']:>10.3f} "
+            f"{r['p99_ms']:>10.3f} {ops} {r['peak_kb']:>9.0f}"
+        )
+        old = baseline.get(name) if baseline else None
+        if old:
+            line += f" {old['p50_ms']:>10.3f} {old['p50_ms'] / r['p50_ms']:>6.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--files-per-dir", type=int, default=40)
+    parser.add_argument(
+        "--extensions",
+        nargs="+",
+        default=DEFAULT_EXTENSIONS,
+        help="расширения файлов дерева; первые два ищутся",
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="повторов каждой операции")
+    parser.add_argument("--picks", type=int, default=1000, help="выборов за один повтор")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="сохранить результат в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        tree_dir = os.path.join(tmp, "tree")
+        dir_count, file_count = make_tree(
+            Path(tree_dir),
+            args.depth,
+            args.fanout,
+            args.files_per_dir,
+            args.extensions,
+            args.seed,
+        )
+        print(f"Дерево: {dir_count} папок, {file_count} файлов")
+        # settings.ini и другие файлы приложения создаются во временной папке
+        os.chdir(tmp)
+        try:
+            results = run_benchmarks(tree_dir, args.extensions, args)
+        finally:
+            os.chdir(previous_cwd)
+
+    print_results(results, baseline)
+    if args.output:
+        report = {
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "params": {
+                "depth": args.depth,
+                "fanout": args.fanout,
+                "files_per_dir": args.files_per_dir,
+                "extensions": args.extensions,
+                "repeat": args.repeat,
+                "picks": args.picks,
+                "seed": args.seed,
+                "dirs": dir_count,
+                "files": file_count,
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результат сохранен в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
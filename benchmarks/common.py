@@ -0,0 +1,119 @@
+"""
+Общие части бенчмарков: синтетическое дерево папок и замер времени и памяти.
+Все скрипты строят дерево и измеряют одним и тем же кодом, поэтому их
+результаты сопоставимы между собой.
+"""
+
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+# Служебные папки, которые создаются при junk_per_dir (как в репозиториях и на NAS)
+JUNK_DIRS = (".git/objects", "@eaDir")
+
+
+def tree_layout(
+    depth: int,
+    fanout: int,
+    files_per_dir: int,
+    extensions: list[str],
+    seed: int = 0,
+    name_format: str = "file_{index}{ext}",
+):
+    """
+    Перебирает пары (относительная_папка, имена_файлов) дерева глубины depth:
+    в каждой папке fanout подпапок и files_per_dir файлов со случайными
+    расширениями из extensions. Корень — пустая строка, разделитель — '/'.
+    Дерево только описывается, на диск ничего не пишется (см. make_tree).
+    """
+    rng = random.Random(seed)
+    file_count = 0
+    pending = [("", 0)]
+    while pending:
+        rel_dir, level = pending.pop()
+        names = [
+            name_format.format(index=file_count + i, ext=rng.choice(extensions))
+            for i in range(files_per_dir)
+        ]
+        file_count += files_per_dir
+        yield rel_dir, names
+        if level < depth:
+            pending.extend(
+                (f"{rel_dir}/dir_{j}" if rel_dir else f"dir_{j}", level + 1)
+                for j in range(fanout)
+            )
+
+
+def make_tree(
+    root: Path,
+    depth: int,
+    fanout: int,
+    files_per_dir: int,
+    extensions: list[str],
+    seed: int = 0,
+    junk_per_dir: int = 0,
+) -> tuple[int, int]:
+    """
+    Создает на диске дерево из tree_layout(). При junk_per_dir > 0 в каждой
+    папке появляются служебные JUNK_DIRS с junk_per_dir файлами.
+    Возвращает (число папок, число файлов) без учета служебных.
+    """
+    dir_count = file_count = 0
+    for rel_dir, names in tree_layout(depth, fanout, files_per_dir, extensions, seed):
+        folder = root.joinpath(*rel_dir.split("/")) if rel_dir else root
+        folder.mkdir(parents=True, exist_ok=True)
+        for name in names:
+            (folder / name).touch()
+        for junk_dir in JUNK_DIRS if junk_per_dir else ():
+            junk_folder = folder.joinpath(*junk_dir.split("/"))
+            junk_folder.mkdir(parents=True)
+            for j in range(junk_per_dir):
+                (junk_folder / f"junk_{j}").touch()
+        dir_count += 1
+        file_count += len(names)
+    return dir_count, file_count
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Перцентиль по отсортированному списку (ближайший ранг)."""
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(func, repeat: int, setup=None, calls: int = 1) -> dict:
+    """
+    Выполняет func(state) repeat раз (state = setup() перед каждым запуском,
+    не измеряется). calls — сколько операций делает один вызов func
+    (для пропускной способности). Память измеряется отдельным запуском под
+    tracemalloc: пиковая и занятая результатом func на момент возврата.
+    """
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state)
+        timings.append((time.perf_counter() - start) / calls)
+
+    state = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    result = func(state)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    timings.sort()
+    return {
+        "runs": repeat,
+        "min_ms": timings[0] * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p90_ms": percentile(timings, 0.90) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "ops_per_sec": 1 / statistics.fmean(timings) if timings[0] > 0 else None,
+        "peak_kb": peak / 1024,
+        "retained_kb": retained / 1024,
+    }
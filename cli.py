@@ -0,0 +1,137 @@
+"""
+Консольный запуск без графического интерфейса (customtkinter не импортируется).
+
+    python cli.py pick [--count N] [--json] [--no-open] [--rescan | --no-index]
+    python cli.py sample [--count N] [--json] [--no-open]
+
+Настройки (папка, расширения, рекурсия, режим выбора) берутся из settings.ini,
+как и в окне приложения; --directory временно заменяет папку.
+"""
+
+import argparse
+import json
+import sys
+
+from app_logic import AppLogic
+from config import INDEX_FILE
+from file_utils import open_file
+
+
+def report(logic: AppLogic, paths, message: str, total: int, args) -> int:
+    """Выводит выбранные файлы и при необходимости открывает их."""
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "directory": logic.directory_to_scan,
+                    "total": total,
+                    "files": [str(path) for path in paths],
+                },
+                ensure_ascii=False,
+            )
+        )
+    else:
+        for path in paths:
+            print(path)
+    if not paths:
+        print(message, file=sys.stderr)
+        return 1
+
+    if not args.no_open:
+        for path in paths:
+            try:
+                open_file(str(path))
+            except IOError as e:
+                print(f"Ошибка открытия файла: {e}", file=sys.stderr)
+                return 1
+    return 0
+
+
+def run_pick(logic: AppLogic, args) -> int:
+    """Выбирает файлы из списка, взятого из индекса или полученного сканированием."""
+    if logic.picker_mode == "reservoir":
+        return run_sample(logic, args)
+    # Для поиска дубликатов нужны размеры файлов: если в индексе они есть
+    # не для всех папок, недостающие собирает сканирование
+    needs_sizes = logic.dedup and logic.make_dedup_task() is None
+    if logic.file_list_outdated or args.rescan or needs_sizes:
+        # В индексе нет этой папки (или нужна проверка): сканируем,
+        # изменившиеся папки сохраняются в индекс для следующих запусков
+        message, status = logic.refresh_file_list()
+        if status == "error":
+            print(message, file=sys.stderr)
+            return 1
+    if logic.dedup:
+        logic.apply_dedup_result(logic.make_dedup_task()())
+    paths, message = logic.get_random_files(args.count)
+    return report(logic, paths, message, len(logic.file_list), args)
+
+
+def run_sample(logic: AppLogic, args) -> int:
+    """Выбирает файлы одним обходом, без списка (режим "reservoir")."""
+    result = logic.make_pick_task(args.count)()
+    paths, message = logic.apply_pick_result(result)
+    return report(logic, paths, message, result[1], args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Random File Opener без окна")
+    parser.add_argument(
+        "--directory", help="папка для поиска (по умолчанию из settings.ini)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Общие параметры команд выбора
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--count", type=int, default=1, help="сколько файлов выбрать")
+    common.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    common.add_argument(
+        "--no-open", action="store_true", help="только вывести пути, не открывая файлы"
+    )
+
+    pick = commands.add_parser(
+        "pick", parents=[common], help="выбрать случайные файлы (как кнопка в окне)"
+    )
+    index_group = pick.add_mutually_exclusive_group()
+    index_group.add_argument(
+        "--rescan",
+        action="store_true",
+        help="перепроверить папку на диске, даже если она есть в индексе",
+    )
+    index_group.add_argument(
+        "--no-index",
+        action="store_true",
+        help=f"не использовать индекс {INDEX_FILE}, всегда сканировать",
+    )
+    pick.set_defaults(handler=run_pick)
+
+    sample = commands.add_parser(
+        "sample",
+        parents=[common],
+        help="выбрать случайные файлы одним обходом, не строя список файлов",
+    )
+    sample.set_defaults(handler=run_sample, no_index=True)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.count < 1:
+        print("--count должно быть не меньше 1", file=sys.stderr)
+        return 2
+    # Фоновый режим: AppLogic не сканирует папку при создании, а список
+    # файлов сразу берется из индекса, если папка в нем есть
+    logic = AppLogic(
+        background_scans=True,
+        index_file=None if args.no_index else INDEX_FILE,
+        directory=args.directory,
+    )
+    try:
+        return args.handler(logic, args)
+    finally:
+        # Отложенные записи настроек и истории выбора не должны потеряться
+        logic.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
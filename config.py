@@ -1,34 +1,93 @@
 import configparser
+import io
+import json
+import os
+import stat
+import tempfile
+import threading
 from pathlib import Path
 
 # --- КОНСТАНТЫ ---
 CONFIG_FILE = "settings.ini"
 CONFIG_SECTION = "Settings"
+# Файл индекса содержимого папок (хранится рядом с settings.ini)
+INDEX_FILE = "file_index.db"
+# Файл со списком недавно открытых файлов
+RECENT_FILE = "recent_files.json"
+# Файл с временем последнего открытия файлов (для взвешенного выбора)
+HISTORY_FILE = "open_history.json"
+# Кэш хэшей для поиска дубликатов (см. DedupIndex)
+DEDUP_FILE = "dedup_cache.db"
 DEFAULT_EXTENSIONS = ".mp4, .mkv, .avi"
 # Путь к папке "Видео" пользователя для использования по умолчанию.
 DEFAULT_SCAN_PATH = str(Path.home() / "Videos")
+# Через сколько секунд после последнего изменения настройки записываются на диск
+SAVE_DELAY = 0.5
 
 
-def load_or_create_config(
-    config_file: str,
-) -> tuple[str, list[str], bool, bool]:
-    """Загружает конфигурацию из .ini файла или создает его с настройками по умолчанию."""
-    config = configparser.ConfigParser()
-    config_path = Path(config_file)
+def _current_umask() -> int:
+    # Узнать umask можно, только заменив его; вызывается один раз при импорте,
+    # пока не запущены другие потоки
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
 
-    if not config_path.exists():
-        # Создаем конфиг по умолчанию, если файл не найден
-        config[CONFIG_SECTION] = {
-            "directory": DEFAULT_SCAN_PATH,
-            "extensions": DEFAULT_EXTENSIONS,
-            "recursive": "true",
-            "toplevel_only": "true",
-        }
-        with config_path.open("w", encoding="utf-8") as f:
-            config.write(f)
 
-    config.read(config_path, encoding="utf-8")
+_UMASK = _current_umask()
+
 
+def _file_mode(path: Path) -> int:
+    """Права существующего файла или 0666 с учетом umask для нового."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def _write_atomic(path: Path, text: str):
+    """
+    Записывает файл атомарно: во временный файл в той же папке, затем
+    переименованием. При сбое во время записи остается прежний файл.
+    Права прежнего файла сохраняются (mkstemp создает файл с правами 0600);
+    новый файл получает обычные права с учетом umask.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{path.name}.", suffix=".tmp", dir=path.parent
+    )
+    try:
+        os.chmod(tmp_path, _file_mode(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _config_text(config: configparser.ConfigParser) -> str:
+    buffer = io.StringIO()
+    config.write(buffer)
+    return buffer.getvalue()
+
+
+def _default_config() -> dict[str, str]:
+    return {
+        "directory": DEFAULT_SCAN_PATH,
+        "extensions": DEFAULT_EXTENSIONS,
+        "recursive": "true",
+        "toplevel_only": "true",
+    }
+
+
+def _read_settings(
+    config: configparser.ConfigParser,
+) -> tuple[str, list[str], bool, bool]:
+    """Возвращает основные настройки (папка, расширения, рекурсия, подпапки)."""
     directory = config.get(CONFIG_SECTION, "directory", fallback=DEFAULT_SCAN_PATH)
     extensions_str = config.get(
         CONFIG_SECTION, "extensions", fallback=DEFAULT_EXTENSIONS
@@ -39,6 +98,51 @@ def load_or_create_config(
     return directory, extensions, recursive, toplevel_only
 
 
+def _set_settings(
+    config: configparser.ConfigParser,
+    directory: str,
+    extensions: list[str],
+    recursive: bool,
+    toplevel_only: bool,
+):
+    if not config.has_section(CONFIG_SECTION):
+        config.add_section(CONFIG_SECTION)
+    config.set(CONFIG_SECTION, "directory", directory)
+    config.set(CONFIG_SECTION, "extensions", ", ".join(extensions))
+    config.set(CONFIG_SECTION, "recursive", str(recursive))
+    config.set(CONFIG_SECTION, "toplevel_only", str(toplevel_only))
+
+
+def _get_option(config: configparser.ConfigParser, option: str, fallback):
+    try:
+        if isinstance(fallback, bool):
+            return config.getboolean(CONFIG_SECTION, option, fallback=fallback)
+        if isinstance(fallback, int):
+            return config.getint(CONFIG_SECTION, option, fallback=fallback)
+        if isinstance(fallback, float):
+            return config.getfloat(CONFIG_SECTION, option, fallback=fallback)
+    except ValueError:
+        print(f"Некорректное значение настройки '{option}', используется {fallback}")
+        return fallback
+    return config.get(CONFIG_SECTION, option, fallback=fallback)
+
+
+def load_or_create_config(
+    config_file: str,
+) -> tuple[str, list[str], bool, bool]:
+    """Загружает конфигурацию из .ini файла или создает его с настройками по умолчанию."""
+    config = configparser.ConfigParser()
+    config_path = Path(config_file)
+
+    if not config_path.exists():
+        # Создаем конфиг по умолчанию, если файл не найден
+        config[CONFIG_SECTION] = _default_config()
+        _write_atomic(config_path, _config_text(config))
+
+    config.read(config_path, encoding="utf-8")
+    return _read_settings(config)
+
+
 def save_config(
     directory: str,
     extensions: list[str],
@@ -52,13 +156,177 @@ def save_config(
     # Читаем существующий файл, чтобы не потерять другие секции, если они есть
     config.read(config_path, encoding="utf-8")
 
-    if not config.has_section(CONFIG_SECTION):
-        config.add_section(CONFIG_SECTION)
+    _set_settings(config, directory, extensions, recursive, toplevel_only)
+    _write_atomic(config_path, _config_text(config))
 
-    config.set(CONFIG_SECTION, "directory", directory)
-    config.set(CONFIG_SECTION, "extensions", ", ".join(extensions))
-    config.set(CONFIG_SECTION, "recursive", str(recursive))
-    config.set(CONFIG_SECTION, "toplevel_only", str(toplevel_only))
 
-    with config_path.open("w", encoding="utf-8") as f:
-        config.write(f)
+def load_option(config_file: str, option: str, fallback):
+    """
+    Читает дополнительную настройку из секции Settings.
+    Тип результата определяется значением по умолчанию (bool, int, float или str).
+    Такие настройки не показываются в окне и задаются вручную в .ini файле.
+    """
+    config = configparser.ConfigParser()
+    config.read(Path(config_file), encoding="utf-8")
+    return _get_option(config, option, fallback)
+
+
+class SettingsStore:
+    """
+    Настройки в памяти: файл читается один раз, а изменения записываются
+    в фоновом потоке через delay секунд после последнего из них (несколько
+    быстрых изменений — одна запись). Запись атомарная (см. _write_atomic).
+    Перед выходом нужно вызвать flush(), чтобы не потерять отложенную запись.
+    """
+
+    def __init__(self, config_file: str, delay: float = SAVE_DELAY):
+        self.config_path = Path(config_file)
+        self.delay = delay
+        self._config = configparser.ConfigParser()
+        self._lock = threading.Lock()  # Защищает настройки в памяти
+        # Запись на диск идет под своей блокировкой, чтобы update() из потока
+        # UI не ждал диска, а более старый снимок не перезаписал более новый
+        self._write_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._dirty = False
+        if not self.config_path.exists():
+            # Создаем конфиг по умолчанию, если файл не найден
+            self._config[CONFIG_SECTION] = _default_config()
+            self._dirty = True
+            self.flush()
+        self._config.read(self.config_path, encoding="utf-8")
+
+    def settings(self) -> tuple[str, list[str], bool, bool]:
+        """Возвращает (папка, расширения, рекурсия, только_верхний_уровень)."""
+        with self._lock:
+            return _read_settings(self._config)
+
+    def option(self, option: str, fallback):
+        """Читает дополнительную настройку (см. load_option)."""
+        with self._lock:
+            return _get_option(self._config, option, fallback)
+
+    def update(
+        self,
+        directory: str,
+        extensions: list[str],
+        recursive: bool,
+        toplevel_only: bool,
+    ):
+        """Меняет основные настройки и откладывает запись на диск."""
+        with self._lock:
+            _set_settings(self._config, directory, extensions, recursive, toplevel_only)
+            self._schedule_flush()
+
+    def set_option(self, option: str, value):
+        """Меняет дополнительную настройку и откладывает запись на диск."""
+        with self._lock:
+            if not self._config.has_section(CONFIG_SECTION):
+                self._config.add_section(CONFIG_SECTION)
+            self._config.set(CONFIG_SECTION, option, str(value))
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Откладывает запись на delay секунд (вызывается под _lock)."""
+        self._dirty = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Сразу записывает несохраненные изменения."""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                text = _config_text(self._config)
+            try:
+                _write_atomic(self.config_path, text)
+            except (OSError, ValueError) as e:  # UnicodeError — подкласс ValueError
+                print(f"Не удалось сохранить {self.config_path}: {e}")
+
+
+def _load_json(json_file: str, default):
+    """Читает JSON-файл; при ошибке или другом типе данных возвращает default."""
+    try:
+        with Path(json_file).open(encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return default
+    return data if isinstance(data, type(default)) else default
+
+
+def _save_json(data, json_file: str):
+    """
+    Записывает данные в JSON-файл (атомарно). Не-ASCII символы экранируются:
+    так сохраняются и пути с именами не в UTF-8 (суррогаты os.fsdecode).
+    """
+    try:
+        _write_atomic(Path(json_file), json.dumps(data))
+    except (OSError, ValueError) as e:  # UnicodeError — подкласс ValueError
+        print(f"Не удалось сохранить {json_file}: {e}")
+
+
+def load_recent_files(recent_file: str) -> list[str]:
+    """Загружает список недавно открытых файлов (от старых к новым)."""
+    return [path for path in _load_json(recent_file, []) if isinstance(path, str)]
+
+
+def load_open_history(history_file: str) -> dict[str, float]:
+    """Загружает время последнего открытия файлов {путь: timestamp}."""
+    return {
+        path: float(opened_at)
+        for path, opened_at in _load_json(history_file, {}).items()
+        if isinstance(opened_at, (int, float))
+    }
+
+
+class JsonWriter:
+    """
+    Отложенная запись JSON-файла, как в SettingsStore: данные записываются
+    в фоновом потоке через delay секунд после последнего save() (несколько
+    выборов подряд — одна запись). Перед выходом нужно вызвать flush().
+    """
+
+    def __init__(self, json_file: str, delay: float = SAVE_DELAY):
+        self.json_file = json_file
+        self.delay = delay
+        self._lock = threading.Lock()
+        # Запись последовательная, чтобы старый снимок не перезаписал новый
+        self._write_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._data = None
+        self._dirty = False
+
+    def save(self, data):
+        """
+        Откладывает запись data. Передается снимок: после вызова он не должен
+        меняться (сериализуется в другом потоке).
+        """
+        with self._lock:
+            self._data = data
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Сразу записывает отложенные данные."""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                data, self._data = self._data, None
+            _save_json(data, self.json_file)
@@ -0,0 +1,170 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from file_utils import ScanCancelled
+
+# Версия схемы; при несовпадении кэш хэшей пересоздается
+SCHEMA_VERSION = 2
+# Сколько байт читается с начала и с конца файла для хэша
+HASH_CHUNK = 4 * 1024 * 1024
+# Сколько путей запрашивается из кэша одним запросом (лимит параметров SQLite)
+QUERY_BATCH = 500
+
+
+def partial_hash(path: str, chunk: int = HASH_CHUNK) -> bytes | None:
+    """
+    Хэш первых и последних chunk байт файла (файл меньше 2*chunk хэшируется
+    целиком). Файл отображается в память (mmap), поэтому читаются только
+    нужные страницы. Возвращает None, если файл пустой или недоступен.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as m:
+            size = len(m)
+            digest.update(size.to_bytes(8, "little"))
+            with memoryview(m) as view:
+                digest.update(view[:chunk])
+                if size > chunk:
+                    digest.update(view[max(size - chunk, chunk) :])
+    except (OSError, ValueError):  # ValueError: пустой файл нельзя отобразить
+        return None
+    return digest.digest()
+
+
+class DedupIndex:
+    """
+    Поиск файлов с одинаковым содержимым. Кандидаты сначала группируются
+    по размеру (файл с уникальным размером — уникален), затем файлы одного
+    размера сравниваются по partial_hash. Совпадение хэшей начала и конца
+    для файлов одного размера — практически наверняка дубликат (для видео
+    и архивов), но не гарантия, поэтому удаляет дубликаты только пользователь.
+    Хэши хранятся в SQLite по ключу (путь, размер, mtime): при повторном
+    поиске заново читаются только новые и изменившиеся файлы. Как и FileIndex,
+    каждая операция открывает свое соединение (можно из фонового потока),
+    а пути хранятся байтами (os.fsencode), чтобы сохранялись и имена не в UTF-8.
+    """
+
+    def __init__(self, cache_file: str, workers: int = 4):
+        self.cache_file = cache_file
+        self.workers = max(workers, 1)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.cache_file)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            connection.executescript(
+                f"""
+                DROP TABLE IF EXISTS hashes;
+                CREATE TABLE hashes (
+                    path BLOB PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    digest BLOB NOT NULL
+                );
+                PRAGMA user_version = {SCHEMA_VERSION};
+                """
+            )
+        return connection
+
+    def _load(self, entries: list[tuple[str, int, float]]) -> dict[str, bytes]:
+        """Хэши из кэша для путей, размер и mtime которых не изменились."""
+        cached = {}
+        try:
+            with closing(self._connect()) as connection:
+                for start in range(0, len(entries), QUERY_BATCH):
+                    batch = {
+                        os.fsencode(path): (path, size, mtime)
+                        for path, size, mtime in entries[start : start + QUERY_BATCH]
+                    }
+                    placeholders = ", ".join("?" * len(batch))
+                    rows = connection.execute(
+                        "SELECT path, size, mtime, digest FROM hashes"
+                        f" WHERE path IN ({placeholders})",
+                        list(batch),
+                    )
+                    for key, size, mtime, digest in rows:
+                        path, *stat = batch[key]
+                        if stat == [size, mtime]:
+                            cached[path] = digest
+        except (sqlite3.Error, UnicodeError) as e:
+            print(f"Не удалось прочитать кэш хэшей {self.cache_file}: {e}")
+        return cached
+
+    def _save(self, rows: list[tuple[str, int, float, bytes]]):
+        if not rows:
+            return
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+                    [(os.fsencode(path), *values) for path, *values in rows],
+                )
+        except (sqlite3.Error, UnicodeError) as e:
+            print(f"Не удалось сохранить кэш хэшей {self.cache_file}: {e}")
+
+    def forget(self, paths):
+        """Удаляет хэши путей из кэша (например, после удаления файлов)."""
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.executemany(
+                    "DELETE FROM hashes WHERE path = ?",
+                    [(os.fsencode(path),) for path in paths],
+                )
+        except (sqlite3.Error, UnicodeError) as e:
+            print(f"Не удалось обновить кэш хэшей {self.cache_file}: {e}")
+
+    def find_duplicates(
+        self, entries, progress=None, cancel_event=None
+    ) -> list[list[str]]:
+        """
+        entries: тройки (путь, размер, mtime); размер -1 — файл не прочитан.
+        Возвращает группы путей с одинаковым содержимым (в каждой не меньше
+        двух, пути отсортированы). Хэши недостающих файлов считаются в
+        нескольких потоках; progress(количество) сообщает о ходе работы,
+        cancel_event прерывает поиск (ScanCancelled).
+        """
+        by_size = defaultdict(list)
+        for entry in entries:
+            if entry[1] > 0:  # Пустые и непрочитанные файлы не сравниваются
+                by_size[entry[1]].append(entry)
+        candidates = [
+            entry for group in by_size.values() if len(group) > 1 for entry in group
+        ]
+
+        digests = self._load(candidates)
+        missing = [entry for entry in candidates if entry[0] not in digests]
+        new_rows = []
+        if missing:
+            with ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="dedup"
+            ) as executor:
+                try:
+                    hashed = executor.map(lambda entry: partial_hash(entry[0]), missing)
+                    for count, (entry, digest) in enumerate(zip(missing, hashed), 1):
+                        if cancel_event is not None and cancel_event.is_set():
+                            raise ScanCancelled()
+                        if digest is not None:
+                            digests[entry[0]] = digest
+                            new_rows.append((*entry, digest))
+                        if progress is not None:
+                            progress(count)
+                except ScanCancelled:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                finally:
+                    # Уже посчитанные хэши пригодятся и после отмены
+                    self._save(new_rows)
+
+        groups = defaultdict(list)
+        for path, size, _ in candidates:
+            digest = digests.get(path)
+            if digest is not None:
+                groups[(size, digest)].append(path)
+        return sorted(sorted(paths) for paths in groups.values() if len(paths) > 1)
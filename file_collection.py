@@ -0,0 +1,480 @@
+import operator
+import os
+from array import array
+
+# Кодировка имен в буфере: surrogatepass сохраняет любые str без потерь,
+# в том числе имена с некорректными байтами (os.fsdecode)
+NAME_ENCODING = "utf-8"
+NAME_ERRORS = "surrogatepass"
+# Служебные значения хэш-таблицы
+EMPTY_SLOT = -1
+DELETED_SLOT = -2
+# Хранятся только младшие 32 бита хэша: их хватает и для выбора ячейки,
+# и для быстрой отсечки несовпадающих путей
+HASH_MASK = 0xFFFFFFFF
+# Сколько случайных попыток сделать, прежде чем перебрать все видимые пути
+VISIBLE_DRAW_ATTEMPTS = 64
+# Причины, по которым путь скрыт (биты маски; 0 — путь виден)
+FILTERED_OUT = 1  # Не проходит фильтр по размеру и дате
+HIDDEN = 2  # Скрыт явно (set_hidden)
+# Перевод маски metadata_mask (1 — подходит) в биты FILTERED_OUT
+_FILTER_FLAGS = bytes([FILTERED_OUT, 0]) + bytes(254)
+
+
+def metadata_mask(
+    sizes: array,
+    mtimes: array,
+    min_size: int | None = None,
+    max_size: int | None = None,
+    newer_than: float | None = None,
+) -> bytearray:
+    """
+    Возвращает маску (1 — подходит) для колонок размеров и mtime: размер
+    в [min_size, max_size], mtime не раньше newer_than; None — без ограничения.
+    Если установлен NumPy, колонки обрабатываются им без копирования,
+    иначе — поколоночно через map (без цикла Python по элементам).
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    if np is not None:
+        size_column = np.frombuffer(sizes, dtype=np.int64)
+        mtime_column = np.frombuffer(mtimes, dtype=np.float64)
+        mask = size_column >= max(min_size or 0, 0)  # -1 — файл не прочитан
+        if max_size is not None:
+            mask &= size_column <= max_size
+        if newer_than is not None:
+            mask &= mtime_column >= newer_than
+        return bytearray(mask.view(np.uint8).tobytes())
+
+    mask = bytearray(map(operator.le, [max(min_size or 0, 0)] * len(sizes), sizes))
+    if max_size is not None:
+        upper = bytes(map(operator.ge, [max_size] * len(sizes), sizes))
+        mask = bytearray(map(operator.and_, mask, upper))
+    if newer_than is not None:
+        recent = bytes(map(operator.le, [newer_than] * len(mtimes), mtimes))
+        mask = bytearray(map(operator.and_, mask, recent))
+    return mask
+
+
+def _split_prefix(path: str) -> tuple[str, str]:
+    """Делит путь на префикс папки (с разделителем на конце) и имя файла."""
+    index = path.rfind(os.sep)
+    if os.altsep:
+        index = max(index, path.rfind(os.altsep))
+    return path[: index + 1], path[index + 1 :]
+
+
+class FileCollection:
+    """
+    Компактный список путей файлов с удалением известного пути за O(1).
+
+    Пути не хранятся целиком: префикс папки хранится один раз в таблице папок,
+    имена файлов — подряд в одном байтовом буфере, а для каждого элемента
+    в массивах array лежат номер папки, смещение и длина имени и хэш пути.
+    Поиск пути по значению — собственная хэш-таблица с открытой адресацией
+    (тоже array), поэтому память растет с суммарной длиной имен, а не полных путей.
+    Строка пути собирается только при обращении к элементу.
+
+    При удалении на освободившееся место переносится другой элемент, поэтому
+    порядок не сохраняется (для случайного выбора он и не важен).
+
+    Элементы разделены на две части: доступные для выбора (в начале списка)
+    и исключенные (в конце). Исключение и возврат пути — это обмен
+    с элементом на границе частей, то есть тоже O(1). На этом построены
+    выбор без повторов и исключение недавно открытых файлов.
+
+    С with_metadata=True для каждого пути хранятся еще размер и mtime
+    (колонки array), и пути можно скрывать фильтром по ним
+    (set_metadata_filter): он вычисляет маску сразу для всех элементов,
+    ничего не перестраивая и не обращаясь к диску. Отдельные пути можно
+    скрыть и явно (set_hidden, например дубликаты). Скрытые пути
+    не выбираются и не считаются доступными, но остаются в коллекции.
+    """
+
+    def __init__(self, paths=(), with_metadata: bool = False):
+        self._dirs: list[str] = []
+        self._dir_ids: dict[str, int] = {}
+        self._dir_of = array("I")
+        self._name_start = array("I")
+        self._name_len = array("I")
+        self._names = bytearray()
+        self._hashes = array("I")
+        self._table = array("i", [EMPTY_SLOT] * 8)
+        self._used_slots = 0  # Занятые и удаленные ячейки таблицы
+        self._garbage = 0  # Байты буфера имен, оставшиеся от удаленных путей
+        # Граница: элементы с индексом меньше нее доступны для выбора
+        self._available = 0
+        self.with_metadata = with_metadata
+        self._sizes = array("q")
+        self._mtimes = array("d")
+        # Биты FILTERED_OUT и HIDDEN для каждого пути (0 — путь виден)
+        # или None, если скрытых нет
+        self._hidden_flags: bytearray | None = None
+        self._metadata_filter: tuple = (None, None, None)
+        # Пути, скрытые явно (см. set_hidden)
+        self._hidden: frozenset[str] = frozenset()
+        for path in paths:
+            self.add(path)
+
+    @classmethod
+    def from_groups(cls, groups, with_metadata: bool = False) -> "FileCollection":
+        """
+        Строит коллекцию из пар (путь_папки, имена_файлов) без промежуточного
+        списка полных путей. С with_metadata=True группы — четверки
+        (путь_папки, имена, размеры, mtime), см. FileTree.file_groups.
+        """
+        collection = cls(with_metadata=with_metadata)
+        dirs, dir_of, hashes = collection._dirs, collection._dir_of, collection._hashes
+        name_start, name_len, buffer = (
+            collection._name_start,
+            collection._name_len,
+            collection._names,
+        )
+        for dir_path, names, *columns in groups:
+            if with_metadata:
+                collection._sizes.extend(columns[0])
+                collection._mtimes.extend(columns[1])
+            prefix = os.path.join(dir_path, "")
+            dir_id = collection._dir_ids.setdefault(prefix, len(dirs))
+            if dir_id == len(dirs):
+                dirs.append(prefix)
+            for name in names:
+                encoded = name.encode(NAME_ENCODING, NAME_ERRORS)
+                dir_of.append(dir_id)
+                name_start.append(len(buffer))
+                name_len.append(len(encoded))
+                buffer += encoded
+                hashes.append(hash(prefix + name) & HASH_MASK)
+        # Все элементы доступны; хэш-таблица строится один раз в конце
+        collection._available = len(hashes)
+        collection._rehash()
+        return collection
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("индекс вне диапазона FileCollection")
+        return self._path(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._path(index)
+
+    def __contains__(self, path: str) -> bool:
+        return self._find(path) >= 0
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"FileCollection({list(self)!r})"
+
+    @property
+    def available_count(self) -> int:
+        """Количество путей, доступных для выбора (и не скрытых фильтром)."""
+        if self._hidden_flags is None:
+            return self._available
+        return self._hidden_flags.count(0, 0, self._available)
+
+    @property
+    def visible_count(self) -> int:
+        """Количество путей, не скрытых фильтром по размеру и дате."""
+        if self._hidden_flags is None:
+            return len(self)
+        return self._hidden_flags.count(0)
+
+    @property
+    def memory_size(self) -> int:
+        """Приблизительный объем памяти, занятый коллекцией, в байтах."""
+        arrays = (
+            self._dir_of,
+            self._name_start,
+            self._name_len,
+            self._hashes,
+            self._table,
+            self._sizes,
+            self._mtimes,
+        )
+        size = sum(a.itemsize * len(a) for a in arrays) + len(self._names)
+        if self._hidden_flags is not None:
+            size += len(self._hidden_flags)
+        size += sum(len(d) for d in self._dirs)
+        return size
+
+    # --- Внутреннее устройство ---
+
+    def _path(self, index: int) -> str:
+        start = self._name_start[index]
+        name = self._names[start : start + self._name_len[index]]
+        return self._dirs[self._dir_of[index]] + name.decode(NAME_ENCODING, NAME_ERRORS)
+
+    def _probe(self, path_hash: int):
+        """Перебирает ячейки таблицы для хэша (линейное пробирование)."""
+        mask = len(self._table) - 1
+        slot = path_hash & mask
+        while True:
+            yield slot
+            slot = (slot + 1) & mask
+
+    def _find(self, path: str) -> int:
+        """Возвращает индекс пути или -1."""
+        path_hash = hash(path) & HASH_MASK
+        for slot in self._probe(path_hash):
+            index = self._table[slot]
+            if index == EMPTY_SLOT:
+                return -1
+            if (
+                index != DELETED_SLOT
+                and self._hashes[index] == path_hash
+                and self._path(index) == path
+            ):
+                return index
+
+    def _slot_of(self, index: int) -> int:
+        """Возвращает ячейку таблицы, указывающую на элемент с индексом."""
+        for slot in self._probe(self._hashes[index]):
+            if self._table[slot] == index:
+                return slot
+
+    def _insert_slot(self, index: int):
+        for slot in self._probe(self._hashes[index]):
+            if self._table[slot] == EMPTY_SLOT:
+                self._used_slots += 1
+                self._table[slot] = index
+                return
+            if self._table[slot] == DELETED_SLOT:
+                self._table[slot] = index
+                return
+
+    def _rehash(self):
+        """Перестраивает хэш-таблицу так, чтобы она была заполнена не более чем наполовину."""
+        size = 8
+        while size < (len(self) + 1) * 2:
+            size *= 2
+        self._table = array("i", [EMPTY_SLOT]) * size
+        self._used_slots = 0
+        for index in range(len(self)):
+            self._insert_slot(index)
+
+    def _compact_names(self):
+        """Убирает из буфера имен байты удаленных путей."""
+        names = bytearray()
+        for index in range(len(self)):
+            start = self._name_start[index]
+            self._name_start[index] = len(names)
+            names += self._names[start : start + self._name_len[index]]
+        self._names = names
+        self._garbage = 0
+
+    def _columns(self) -> list:
+        """Колонки, значения которых переставляются вместе с элементами."""
+        columns = [self._dir_of, self._name_start, self._name_len, self._hashes]
+        if self.with_metadata:
+            columns += [self._sizes, self._mtimes]
+        if self._hidden_flags is not None:
+            columns.append(self._hidden_flags)
+        return columns
+
+    def _append(
+        self,
+        prefix: str,
+        name: str,
+        path_hash: int,
+        size: int,
+        mtime: float,
+        hidden: bool = False,
+    ):
+        """Добавляет новый элемент и делает его доступным для выбора."""
+        dir_id = self._dir_ids.get(prefix)
+        if dir_id is None:
+            dir_id = self._dir_ids[prefix] = len(self._dirs)
+            self._dirs.append(prefix)
+        encoded = name.encode(NAME_ENCODING, NAME_ERRORS)
+        self._dir_of.append(dir_id)
+        self._name_start.append(len(self._names))
+        self._name_len.append(len(encoded))
+        self._names += encoded
+        if (self._used_slots + 1) * 4 > len(self._table) * 3:
+            self._rehash()  # Таблица почти заполнена; новый элемент вставим ниже
+        if self.with_metadata:
+            self._sizes.append(size)
+            self._mtimes.append(mtime)
+        if self._hidden_flags is not None:
+            flags = HIDDEN if hidden else 0
+            if self._filter_active:
+                mask = metadata_mask(
+                    array("q", [size]), array("d", [mtime]), *self._metadata_filter
+                )
+                flags |= _FILTER_FLAGS[mask[0]]
+            self._hidden_flags.append(flags)
+        self._hashes.append(path_hash)
+        self._insert_slot(len(self) - 1)
+        # Переносим новый элемент в доступную часть
+        self._swap(self._available, len(self) - 1)
+        self._available += 1
+
+    def _swap(self, i: int, j: int):
+        if i == j:
+            return
+        slot_i, slot_j = self._slot_of(i), self._slot_of(j)
+        for column in self._columns():
+            column[i], column[j] = column[j], column[i]
+        self._table[slot_i], self._table[slot_j] = j, i
+
+    # --- Публичные операции ---
+
+    def add(self, path: str, size: int = -1, mtime: float = 0.0) -> bool:
+        """
+        Добавляет путь (доступным для выбора), если его еще нет.
+        size и mtime нужны только коллекции с with_metadata.
+        Возвращает True, если путь добавлен.
+        """
+        if self._find(path) >= 0:
+            return False
+        prefix, name = _split_prefix(path)
+        hidden = path in self._hidden
+        self._append(prefix, name, hash(path) & HASH_MASK, size, mtime, hidden)
+        return True
+
+    def remove(self, path: str) -> bool:
+        """Удаляет путь, если он есть. Возвращает True, если путь был удален."""
+        index = self._find(path)
+        if index < 0:
+            return False
+        if index < self._available:
+            # Сначала переводим элемент в исключенные, чтобы не нарушить границу
+            self._available -= 1
+            self._swap(index, self._available)
+            index = self._available
+        last = len(self) - 1
+        self._swap(index, last)
+        self._table[self._slot_of(last)] = DELETED_SLOT
+        self._garbage += self._name_len[last]
+        for column in self._columns():
+            column.pop()
+        if self._garbage > 4096 and self._garbage * 2 > len(self._names):
+            self._compact_names()
+        return True
+
+    def exclude(self, path: str) -> bool:
+        """Делает путь недоступным для выбора. Возвращает True, если он был доступен."""
+        index = self._find(path)
+        if index < 0 or index >= self._available:
+            return False
+        self._available -= 1
+        self._swap(index, self._available)
+        return True
+
+    def include(self, path: str) -> bool:
+        """Возвращает путь в доступные. Возвращает True, если он был исключен."""
+        index = self._find(path)
+        if index < 0 or index < self._available:
+            return False
+        self._swap(index, self._available)
+        self._available += 1
+        return True
+
+    def is_available(self, path: str) -> bool:
+        """Проверяет, что путь есть, доступен для выбора и не скрыт фильтром."""
+        index = self._find(path)
+        if not 0 <= index < self._available:
+            return False
+        return self._hidden_flags is None or not self._hidden_flags[index]
+
+    def include_all(self):
+        """Делает доступными все пути."""
+        self._available = len(self)
+
+    def excluded(self) -> list[str]:
+        """Возвращает исключенные пути."""
+        return [self._path(index) for index in range(self._available, len(self))]
+
+    def random_available(self, rng) -> str | None:
+        """Возвращает случайный доступный путь (rng — объект random.Random)."""
+        if not self._available:
+            return None
+        if self._hidden_flags is None:
+            return self._path(rng.randrange(self._available))
+        # Обычно фильтр пропускает заметную долю файлов, и несколько случайных
+        # попыток быстрее перебора; иначе выбираем из списка видимых
+        flags = self._hidden_flags
+        for _ in range(VISIBLE_DRAW_ATTEMPTS):
+            index = rng.randrange(self._available)
+            if not flags[index]:
+                return self._path(index)
+        candidates = [i for i in range(self._available) if not flags[i]]
+        return self._path(rng.choice(candidates)) if candidates else None
+
+    def set_metadata_filter(
+        self,
+        min_size: int | None = None,
+        max_size: int | None = None,
+        newer_than: float | None = None,
+    ) -> bool:
+        """
+        Скрывает пути, размер которых вне [min_size, max_size] или mtime раньше
+        newer_than (None — без ограничения; все None — снять фильтр).
+        Работает только с with_metadata; возвращает False, если данных нет.
+        """
+        if not self.with_metadata:
+            return False
+        bounds = (min_size, max_size, newer_than)
+        if bounds == self._metadata_filter:
+            return True
+        self._metadata_filter = bounds
+        if self._filter_active:
+            # Маска фильтра пересчитывается целиком, явно скрытые пути
+            # отмечаются заново (их обычно немного)
+            mask = metadata_mask(self._sizes, self._mtimes, *bounds)
+            self._hidden_flags = mask.translate(_FILTER_FLAGS)
+            self._mark_hidden(self._hidden, True)
+        elif self._hidden:
+            self._hidden_flags = bytearray(len(self))
+            self._mark_hidden(self._hidden, True)
+        else:
+            self._hidden_flags = None
+        return True
+
+    def set_hidden(self, paths):
+        """
+        Скрывает указанные пути (остальные явно скрытые снова видны).
+        Пути, которых нет в коллекции, запоминаются и скрываются при add().
+        Меняются только отметки путей, добавленных или убранных из скрытых.
+        """
+        hidden = frozenset(paths)
+        shown, added = self._hidden - hidden, hidden - self._hidden
+        self._hidden = hidden
+        if not hidden and not self._filter_active:
+            self._hidden_flags = None
+            return
+        if self._hidden_flags is None:
+            self._hidden_flags = bytearray(len(self))
+        self._mark_hidden(shown, False)
+        self._mark_hidden(added, True)
+
+    @property
+    def _filter_active(self) -> bool:
+        return any(bound is not None for bound in self._metadata_filter)
+
+    def _mark_hidden(self, paths, hidden: bool):
+        """Ставит или снимает бит HIDDEN у путей, которые есть в коллекции."""
+        flags = self._hidden_flags
+        for path in paths:
+            index = self._find(path)
+            if index >= 0:
+                if hidden:
+                    flags[index] |= HIDDEN
+                else:
+                    flags[index] &= ~HIDDEN
+
+    def iter_metadata(self):
+        """Перебирает тройки (путь, размер, mtime) коллекции с with_metadata."""
+        for index in range(len(self)):
+            yield self._path(index), self._sizes[index], self._mtimes[index]
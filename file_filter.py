@@ -0,0 +1,145 @@
+import fnmatch
+import re
+
+# Папки, которые по умолчанию не обходятся: служебные данные систем контроля
+# версий, NAS (Synology @eaDir), менеджеров пакетов и кэши миниатюр.
+# В них обычно больше всего записей и никогда нет нужных файлов.
+DEFAULT_EXCLUDE_DIRS = ".git, .svn, .hg, @eaDir, node_modules, .thumbnails"
+# Префикс правила-регулярного выражения (остальные правила — шаблоны glob)
+REGEX_PREFIX = "re:"
+
+
+def build_extension_set(extensions: list[str]) -> frozenset[str]:
+    """
+    Готовит множество расширений для сравнения с именами файлов.
+    Расширения сравниваются без учета регистра на любой ОС ('.MP4' = '.mp4').
+    Расширение без точки дополняется ею ('mp4' = '.mp4'); запись с точкой
+    не в начале ('_small.mp4') — суффикс имени (см. extension_suffixes).
+    """
+    extension_set = set()
+    for ext in extensions:
+        ext = ext.lower()
+        if ext and "." not in ext:
+            ext = "." + ext
+        extension_set.add(ext)
+    return frozenset(extension_set)
+
+
+def extension_suffixes(extension_set: frozenset[str]) -> tuple[str, ...]:
+    """Записи множества, сравниваемые с концом имени, а не с расширением."""
+    return tuple(ext for ext in extension_set if ext and not ext.startswith("."))
+
+
+def matches_extension(
+    name: str, extension_set: frozenset[str], suffixes: tuple[str, ...] = ()
+) -> bool:
+    """
+    Проверяет, оканчивается ли имя файла одним из расширений из множества.
+    Проверяются все суффиксы, начинающиеся с точки, поэтому составные
+    расширения вида '.tar.gz' тоже находятся, а затем suffixes
+    (см. extension_suffixes). Пустое расширение соответствует любому файлу
+    (как паттерн '*').
+    """
+    if "" in extension_set:
+        return True
+    name = name.lower()
+    dot_index = name.find(".")
+    while dot_index != -1:
+        if name[dot_index:] in extension_set:
+            return True
+        dot_index = name.find(".", dot_index + 1)
+    return bool(suffixes) and name.endswith(suffixes)
+
+
+def parse_rules(value: str) -> tuple[str, ...]:
+    """
+    Разбирает правила из настройки: шаблоны glob через запятую или по одному
+    на строке. Строка, начинающаяся с 're:', целиком считается регулярным
+    выражением (в нем запятые допустимы).
+    """
+    rules = []
+    for line in value.splitlines():
+        line = line.strip()
+        if line.startswith(REGEX_PREFIX):
+            rules.append(line)
+        else:
+            rules.extend(part.strip() for part in line.split(",") if part.strip())
+    return tuple(rules)
+
+
+def compile_rules(rules) -> re.Pattern | None:
+    """
+    Компилирует правила в одно регулярное выражение без учета регистра,
+    проверяемое для имени файла или папки (re.match). Шаблоны glob
+    должны совпасть с именем целиком. Некорректные выражения пропускаются.
+    """
+    parts = []
+    for rule in rules:
+        if rule.startswith(REGEX_PREFIX):
+            pattern = rule[len(REGEX_PREFIX) :]
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                print(f"Некорректное правило '{rule}': {e}")
+                continue
+            parts.append(f"(?:{pattern})")
+        else:
+            parts.append(fnmatch.translate(rule))
+    if not parts:
+        return None
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+class FileFilter:
+    """
+    Правила отбора файлов, скомпилированные один раз:
+    - файл подходит, если его расширение из extensions или имя подходит под
+      правило include, и имя не подходит ни под одно правило exclude;
+    - папки, подходящие под exclude_dirs, не обходятся вовсе (вместе со всем
+      содержимым), см. skip_directory.
+    Все сравнения — без учета регистра. Фильтры с одинаковыми правилами
+    равны, поэтому годятся как ключ кэша.
+    """
+
+    def __init__(self, extensions, include=(), exclude=(), exclude_dirs=()):
+        self.extensions = build_extension_set(extensions)
+        self._suffixes = extension_suffixes(self.extensions)
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.exclude_dirs = tuple(exclude_dirs)
+        self._include = compile_rules(self.include)
+        self._exclude = compile_rules(self.exclude)
+        exclude_dirs_pattern = compile_rules(self.exclude_dirs)
+        # skip_directory(имя) -> подходит ли папка под exclude_dirs;
+        # None, если правил нет (обходу не нужно ничего проверять)
+        self.skip_directory = (
+            exclude_dirs_pattern.match if exclude_dirs_pattern else None
+        )
+        self._key = (self.extensions, self.include, self.exclude, self.exclude_dirs)
+        # Без правил include/exclude проверяются только расширения
+        if self._include is None and self._exclude is None:
+            extension_set, suffixes = self.extensions, self._suffixes
+            self.matches = lambda name: matches_extension(name, extension_set, suffixes)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FileFilter) and self._key == other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __bool__(self) -> bool:
+        """False, если под фильтр не может подойти ни один файл."""
+        return bool(self.extensions or self._include)
+
+    def matches(self, name: str) -> bool:
+        """Проверяет, подходит ли файл с таким именем."""
+        if not (
+            matches_extension(name, self.extensions, self._suffixes)
+            or (self._include is not None and self._include.match(name))
+        ):
+            return False
+        return self._exclude is None or not self._exclude.match(name)
+
+    def with_extensions(self, extensions) -> "FileFilter":
+        """Возвращает фильтр с другими расширениями и теми же правилами."""
+        return FileFilter(extensions, self.include, self.exclude, self.exclude_dirs)
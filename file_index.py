@@ -0,0 +1,148 @@
+import os
+import sqlite3
+from array import array
+from contextlib import closing
+
+# Версия схемы; при несовпадении индекс пересоздается
+SCHEMA_VERSION = 3
+# Разделитель списков имен: символ '/' не может встречаться в имени файла
+NAME_SEPARATOR = b"/"
+
+# Пути и имена хранятся байтами (os.fsencode): на Linux имя файла может
+# не быть корректным UTF-8, и как TEXT его не сохранить
+
+
+def _join_names(names: list[str]) -> bytes:
+    return NAME_SEPARATOR.join(map(os.fsencode, names))
+
+
+def _split_names(value: bytes) -> list[str]:
+    return [os.fsdecode(name) for name in value.split(NAME_SEPARATOR)] if value else []
+
+
+def _stats_values(file_stats: dict | None, rel_dir: str, file_count: int) -> tuple:
+    """Колонки размеров и mtime папки для записи (None, если их нет)."""
+    columns = file_stats.get(rel_dir) if file_stats else None
+    if columns is None or len(columns[0]) != file_count:
+        return None, None
+    return columns[0].tobytes(), columns[1].tobytes()
+
+
+class FileIndex:
+    """
+    Постоянный индекс содержимого папок в файле SQLite.
+    Для каждой корневой папки хранится снимок scan_directories():
+    mtime, подпапки и файлы каждой вложенной папки, а если они собирались —
+    размеры и mtime файлов (см. scan_directories, file_stats). Снимок позволяет
+    показать список файлов сразу при запуске и затем перечитать только
+    изменившиеся папки.
+    Каждая операция открывает свое соединение, поэтому индекс можно
+    использовать из фонового потока.
+    variant отделяет снимки, снятые с разными параметрами сканирования
+    (например, политикой символических ссылок), чтобы они не смешивались.
+    """
+
+    def __init__(self, index_file: str, variant: str = ""):
+        self.index_file = index_file
+        self.variant = variant
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.index_file)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            connection.executescript(
+                f"""
+                DROP TABLE IF EXISTS directories;
+                CREATE TABLE directories (
+                    root BLOB NOT NULL,
+                    rel_dir BLOB NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    subdirs BLOB NOT NULL,
+                    files BLOB NOT NULL,
+                    sizes BLOB,
+                    mtimes BLOB,
+                    PRIMARY KEY (root, rel_dir)
+                );
+                PRAGMA user_version = {SCHEMA_VERSION};
+                """
+            )
+        return connection
+
+    def _root_key(self, directory: str) -> bytes:
+        root = os.path.normcase(os.path.abspath(directory))
+        return os.fsencode(f"{root}|{self.variant}" if self.variant else root)
+
+    def load(self, directory: str, file_stats: dict | None = None) -> dict | None:
+        """
+        Возвращает сохраненный снимок для папки или None, если его нет.
+        Если передан словарь file_stats, в него добавляются сохраненные
+        колонки (размеры, mtime) папок, для которых они есть.
+        """
+        try:
+            with closing(self._connect()) as connection:
+                rows = connection.execute(
+                    "SELECT rel_dir, mtime_ns, subdirs, files, sizes, mtimes"
+                    " FROM directories WHERE root = ?",
+                    (self._root_key(directory),),
+                ).fetchall()
+            if not rows:
+                return None
+            records = {}
+            for rel_dir, mtime_ns, subdirs, files, sizes, mtimes in rows:
+                rel_dir = os.fsdecode(rel_dir)
+                files = _split_names(files)
+                records[rel_dir] = (mtime_ns, _split_names(subdirs), files)
+                if file_stats is not None and sizes is not None:
+                    columns = array("q", sizes), array("d", mtimes)
+                    if len(columns[0]) == len(columns[1]) == len(files):
+                        file_stats[rel_dir] = columns
+            return records
+        except (sqlite3.Error, ValueError) as e:  # В т.ч. UnicodeError
+            print(f"Не удалось прочитать индекс {self.index_file}: {e}")
+            return None
+
+    def save(
+        self,
+        directory: str,
+        records: dict,
+        changed: set[str],
+        previous: dict | None = None,
+        file_stats: dict | None = None,
+    ):
+        """
+        Сохраняет снимок. Записываются только перечитанные папки (changed),
+        папки из предыдущего снимка, которых больше нет, удаляются.
+        Без previous все старые записи для этой папки заменяются.
+        Вместе с папками из changed записываются их колонки из file_stats.
+        """
+        root = self._root_key(directory)
+        removed = set(previous or ()) - set(records)
+        try:
+            with closing(self._connect()) as connection, connection:
+                if previous is None:
+                    connection.execute(
+                        "DELETE FROM directories WHERE root = ?", (root,)
+                    )
+                connection.executemany(
+                    "DELETE FROM directories WHERE root = ? AND rel_dir = ?",
+                    [(root, os.fsencode(rel_dir)) for rel_dir in removed],
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO directories"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            root,
+                            os.fsencode(rel_dir),
+                            records[rel_dir][0],
+                            _join_names(records[rel_dir][1]),
+                            _join_names(records[rel_dir][2]),
+                            *_stats_values(
+                                file_stats, rel_dir, len(records[rel_dir][2])
+                            ),
+                        )
+                        for rel_dir in changed
+                    ],
+                )
+        except (sqlite3.Error, UnicodeError) as e:
+            print(f"Не удалось сохранить индекс {self.index_file}: {e}")
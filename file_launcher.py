@@ -0,0 +1,72 @@
+import queue
+import threading
+
+from file_utils import launch_file
+
+
+class FileLauncher:
+    """
+    Открывает файлы, не блокируя поток UI: запуск приложения (os.startfile,
+    open, xdg-open) и ожидание результата идут в фоновом потоке — своем для
+    каждого запуска. Запускатель (например, xdg-open без окружения рабочего
+    стола) может ждать, пока приложение не закроется; общий пул потоков
+    тогда держал бы очередь следующих запусков.
+    Как и у ScanWorker, результаты забираются главным потоком методом poll()
+    (Tk не потокобезопасен), где и вызываются обработчики завершения.
+    """
+
+    def __init__(self):
+        self._events: queue.Queue = queue.Queue()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        """True, пока есть незавершенные запуски или необработанные результаты."""
+        with self._lock:
+            running = self._running
+        return running > 0 or not self._events.empty()
+
+    def launch(self, filepath: str, on_done=None):
+        """
+        Запускает приложение для файла в фоне. on_done(путь, ошибка) будет
+        вызван из poll(); ошибка — None при успехе или IOError.
+        """
+
+        def run():
+            try:
+                process = launch_file(filepath)
+                if process is not None and process.wait() != 0:
+                    raise IOError(
+                        f"Не удалось запустить приложение для файла: {filepath}"
+                    )
+            except IOError as e:
+                self._events.put((on_done, filepath, e))
+            else:
+                self._events.put((on_done, filepath, None))
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        with self._lock:
+            self._running += 1
+        # Поток-демон не мешает закрыть окно, пока запущенное приложение работает
+        threading.Thread(target=run, name="launch", daemon=True).start()
+
+    def poll(self):
+        """Вызывает обработчики завершившихся запусков. Вызывать из главного потока."""
+        while True:
+            try:
+                on_done, filepath, error = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                print(f"Ошибка открытия файла {filepath}: {error}")
+            if on_done is not None:
+                on_done(filepath, error)
+
+    def shutdown(self):
+        """
+        Ничего не ждет: потоки запусков — демоны и не мешают выйти,
+        а сами приложения работают в отдельной сессии (см. launch_file).
+        """
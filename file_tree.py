@@ -0,0 +1,303 @@
+import functools
+import os
+from array import array
+
+from file_filter import FileFilter
+from scan_cache import ScanCache
+
+# Сколько результатов фильтрации по разным наборам расширений хранить
+FILTER_CACHE_SIZE = 4
+# Приблизительные накладные расходы Python на строку и на запись папки (байты)
+NAME_OVERHEAD = 57
+RECORD_OVERHEAD = 200
+
+
+class FileTree:
+    """
+    Модель дерева папок, построенная одним обходом (см. scan_directories).
+    Из нее без обращения к диску получаются и список подпапок, и список файлов
+    для любой выбранной подпапки, расширений и режима рекурсии.
+    """
+
+    def __init__(self, directory: str, records: dict, file_stats: dict | None = None):
+        """
+        records: {относительная_папка: (mtime_ns, подпапки, файлы)}.
+        file_stats: размеры и mtime файлов, собранные при сканировании
+        (см. scan_directories), или None, если они не собирались.
+        """
+        self.directory = directory
+        self.records = records
+        self.file_stats = file_stats
+        self._root = os.path.realpath(directory)
+        # Подходящие файлы каждой папки для последнего использованного фильтра
+        self._matches_key: FileFilter | None = None
+        self._matches: dict[str, list[str]] = {}
+        # Результаты фильтрации для нескольких недавних наборов расширений,
+        # чтобы возврат к прежнему набору не требовал повторной фильтрации
+        self._filter_cache = ScanCache(max_entries=FILTER_CACHE_SIZE)
+        # (размер, mtime) файлов, прочитанные отдельно (не из file_stats)
+        self._stats: dict[str, tuple[int, float]] = {}
+
+    def __contains__(self, rel_dir: str) -> bool:
+        return rel_dir in self.records
+
+    def subdirectories(self, toplevel_only: bool) -> list[str]:
+        """Возвращает отсортированный список подпапок (относительные пути через '/')."""
+        if toplevel_only:
+            root_record = self.records.get("")
+            return sorted(root_record[1]) if root_record else []
+        return sorted(rel_dir for rel_dir in self.records if rel_dir)
+
+    def children(self, rel_dir: str) -> list[str]:
+        """Возвращает отсортированные пути непосредственных подпапок rel_dir."""
+        record = self.records.get(rel_dir)
+        if record is None:
+            return []
+        paths = (f"{rel_dir}/{name}" if rel_dir else name for name in record[1])
+        return sorted(path for path in paths if path in self.records)
+
+    def _matching_files(self, file_filter: FileFilter) -> dict[str, list[str]]:
+        """
+        Возвращает {папка: подходящие имена файлов}. Результаты для нескольких
+        последних наборов расширений кэшируются, поэтому ни смена подпапки,
+        ни возврат к недавнему набору не требуют повторной фильтрации всех имен.
+        """
+        if file_filter != self._matches_key:
+            matches = self._filter_cache.get(file_filter)
+            if matches is None:
+                matches = {}
+                if file_filter:
+                    is_match = file_filter.matches
+                    for rel_dir, (_, _, files) in self.records.items():
+                        matched = [name for name in files if is_match(name)]
+                        if matched:
+                            matches[rel_dir] = matched
+                self._filter_cache.put(file_filter, matches)
+            self._matches = matches
+            self._matches_key = file_filter
+        return self._matches
+
+    def _forget_other_filters(self):
+        """
+        Дерево изменилось: результат фильтрации для текущего набора расширений
+        обновляется на месте, а остальные сохраненные становятся неверными.
+        """
+        self._filter_cache.retain(self._matches_key)
+
+    def _forget_file_stats(self, rel_dir: str):
+        """Список файлов папки изменился: ее колонки размеров больше не совпадают."""
+        if self.file_stats is not None:
+            self.file_stats.pop(rel_dir, None)
+
+    @functools.cached_property
+    def memory_size(self) -> int:
+        """
+        Приблизительный объем памяти, занятый деревом, в байтах
+        (считается один раз; изменения через add_file и т.п. не учитываются).
+        """
+        size = 0
+        for rel_dir, (_, subdirs, files) in self.records.items():
+            size += RECORD_OVERHEAD + len(rel_dir)
+            size += NAME_OVERHEAD * (len(subdirs) + len(files))
+            size += sum(map(len, subdirs)) + sum(map(len, files))
+        if self.file_stats:
+            size += sum(len(sizes) * 16 for sizes, _ in self.file_stats.values())
+        return size
+
+    def file_groups(
+        self,
+        file_filter: FileFilter,
+        recursive: bool,
+        subdirectory: str | None = None,
+        with_stats: bool = False,
+    ):
+        """
+        Перебирает пары (путь_папки, подходящие_имена) в подпапке (или во всем
+        дереве). Обходятся только папки выбранного поддерева.
+        При with_stats=True перебираются четверки (путь_папки, имена, размеры,
+        mtime) с колонками array в порядке имен (см. group_stats).
+        """
+        matches = self._matching_files(file_filter)
+        start = subdirectory or ""
+        if start not in self.records:
+            return
+
+        pending_dirs = [start]
+        while pending_dirs:
+            rel_dir = pending_dirs.pop()
+            names = matches.get(rel_dir)
+            if names:
+                dir_path = os.path.join(self._root, *rel_dir.split("/"))
+                if with_stats:
+                    yield (dir_path, names, *self.group_stats(rel_dir, names))
+                else:
+                    yield dir_path, names
+            if recursive:
+                for name in self.records[rel_dir][1]:
+                    child = f"{rel_dir}/{name}" if rel_dir else name
+                    if child in self.records:
+                        pending_dirs.append(child)
+
+    def files(
+        self, file_filter: FileFilter, recursive: bool, subdirectory: str | None = None
+    ) -> list[str]:
+        """Возвращает полные пути подходящих файлов (см. file_groups)."""
+        groups = self.file_groups(file_filter, recursive, subdirectory)
+        return [os.path.join(dir_path, name) for dir_path, names in groups for name in names]
+
+    def matching_count(self, rel_dir: str) -> int:
+        """Количество подходящих файлов непосредственно в папке."""
+        return len(self._matches.get(rel_dir, ()))
+
+    def matching_paths(self, rel_dir: str) -> list[str]:
+        """Полные пути подходящих файлов непосредственно в папке."""
+        return [self.path_of(rel_dir, name) for name in self._matches.get(rel_dir, ())]
+
+    def stat(self, path: str) -> tuple[int, float] | None:
+        """
+        Возвращает (размер, mtime) файла: из собранных при сканировании
+        данных, а если их нет — через os.stat, запоминая результат.
+        """
+        stat = self._stats.get(path)
+        if stat is not None:
+            return stat
+        if self.file_stats:
+            rel_dir, name = self.split_path(path)
+            columns = self.file_stats.get(rel_dir)
+            record = self.records.get(rel_dir)
+            if columns is not None and record is not None and name in record[2]:
+                index = record[2].index(name)
+                if columns[0][index] >= 0:
+                    return columns[0][index], columns[1][index]
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stat = self._stats[path] = (st.st_size, st.st_mtime)
+        return stat
+
+    def group_stats(self, rel_dir: str, names: list[str]) -> tuple[array, array]:
+        """
+        Возвращает колонки (размеры, mtime) для имен файлов папки в их порядке.
+        Берутся из file_stats без обращения к диску; если для папки их нет
+        (например, она менялась через add_file), файлы читаются os.stat.
+        Размер -1 означает, что файл прочитать не удалось.
+        """
+        columns = self.file_stats.get(rel_dir) if self.file_stats else None
+        files = self.records[rel_dir][2]
+        if columns is not None:
+            if len(names) == len(files):
+                return columns  # Подходят все файлы папки, порядок тот же
+            sizes, mtimes = columns
+            wanted = set(names)
+            positions = [i for i, name in enumerate(files) if name in wanted]
+            return (
+                array("q", [sizes[i] for i in positions]),
+                array("d", [mtimes[i] for i in positions]),
+            )
+        sizes, mtimes = array("q"), array("d")
+        for name in names:
+            stat = self.stat(self.path_of(rel_dir, name))
+            sizes.append(stat[0] if stat else -1)
+            mtimes.append(stat[1] if stat else 0.0)
+        return sizes, mtimes
+
+    def path_of(self, rel_dir: str, name: str) -> str:
+        """Возвращает полный путь файла по относительной папке и имени."""
+        return os.path.join(self._root, *rel_dir.split("/"), name)
+
+    def split_path(self, path: str) -> tuple[str, str]:
+        """Разбивает полный путь файла на (относительная_папка, имя)."""
+        rel_dir = os.path.relpath(os.path.dirname(path), self._root)
+        if rel_dir == os.curdir:
+            rel_dir = ""
+        return rel_dir.replace(os.sep, "/"), os.path.basename(path)
+
+    @staticmethod
+    def in_scope(rel_dir: str, subdirectory: str | None, recursive: bool) -> bool:
+        """Проверяет, входит ли папка в выборку для подпапки и режима рекурсии."""
+        start = subdirectory or ""
+        if rel_dir == start:
+            return True
+        if not recursive:
+            return False
+        return not start or rel_dir.startswith(start + "/")
+
+    def add_file(self, rel_dir: str, name: str) -> bool:
+        """
+        Добавляет файл в дерево без обращения к диску. Возвращает True, если
+        файл новый и подходит под последний использованный фильтр.
+        """
+        record = self.records.get(rel_dir)
+        if record is None or name in record[2]:
+            return False
+        # Списки могут использоваться фоновым сканированием, поэтому не меняем
+        # их на месте, а заменяем копиями. mtime обнуляется, чтобы следующее
+        # сканирование перепроверило папку.
+        _, subdirs, files = record
+        self.records[rel_dir] = (0, subdirs, files + [name])
+        self._forget_other_filters()
+        self._forget_file_stats(rel_dir)
+        if self._matches_key and self._matches_key.matches(name):
+            self._matches[rel_dir] = self._matches.get(rel_dir, []) + [name]
+            return True
+        return False
+
+    def remove_file(self, path: str) -> bool:
+        """
+        Удаляет файл из дерева без обращения к диску.
+        Возвращает True, если файл был в дереве.
+        """
+        return self.remove_file_at(*self.split_path(path))
+
+    def remove_file_at(self, rel_dir: str, name: str) -> bool:
+        """Удаляет файл по относительной папке и имени. См. remove_file()."""
+        record = self.records.get(rel_dir)
+        if record is None or name not in record[2]:
+            return False
+        _, subdirs, files = record
+        self.records[rel_dir] = (0, subdirs, [n for n in files if n != name])
+        self._forget_other_filters()
+        self._forget_file_stats(rel_dir)
+        matched = self._matches.get(rel_dir)
+        if matched and name in matched:
+            self._matches[rel_dir] = [n for n in matched if n != name]
+        return True
+
+    def add_directory(self, parent: str, name: str) -> bool:
+        """Добавляет пустую папку. Возвращает True, если ее еще не было."""
+        rel_dir = f"{parent}/{name}" if parent else name
+        record = self.records.get(parent)
+        if record is None or rel_dir in self.records:
+            return False
+        _, subdirs, files = record
+        self.records[parent] = (0, subdirs + [name], files)
+        self.records[rel_dir] = (0, [], [])
+        return True
+
+    def remove_directory(self, parent: str, name: str) -> list[str]:
+        """
+        Удаляет папку со всем содержимым.
+        Возвращает полные пути удаленных подходящих файлов.
+        """
+        rel_dir = f"{parent}/{name}" if parent else name
+        if rel_dir not in self.records:
+            return []
+        removed_files = []
+        pending_dirs = [rel_dir]
+        while pending_dirs:
+            current = pending_dirs.pop()
+            record = self.records.pop(current, None)
+            if record is None:
+                continue
+            self._forget_file_stats(current)
+            for file_name in self._matches.pop(current, ()):
+                removed_files.append(self.path_of(current, file_name))
+            pending_dirs.extend(f"{current}/{child}" for child in record[1])
+        self._forget_other_filters()
+
+        parent_record = self.records.get(parent)
+        if parent_record is not None:
+            _, subdirs, files = parent_record
+            self.records[parent] = (0, [d for d in subdirs if d != name], files)
+        return removed_files
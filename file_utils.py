@@ -1,48 +1,603 @@
 import os
+import queue
+import random
 import subprocess
 import sys
+import threading
+import time
+from array import array
 from pathlib import Path
 
+from file_filter import FileFilter
 
-def find_files(directory: str, extensions: list[str], recursive: bool) -> list[str]:
-    """Рекурсивно ищет файлы с заданными расширениями в указанной директории."""
+# Как часто (в найденных файлах) сообщать о прогрессе сканирования
+PROGRESS_STEP = 500
+# Папки, измененные позже этого срока до листинга, перечитываются при следующей
+# проверке: изменение в пределах точности mtime может быть не замечено.
+MTIME_GRANULARITY_NS = 2_000_000_000
+# Сколько байт в начале файла заранее читать в кэш перед открытием (warm_file)
+WARM_BYTES = 4 * 1024 * 1024
+# Обработка символических ссылок при сканировании:
+# "resolve" — ссылки на файлы попадают в список как есть, реальный путь
+#             вычисляется только для выбранного файла; в ссылки на папки не заходим;
+# "follow"  — заходим и в ссылки на папки (с защитой от циклов);
+# "skip"    — ссылки пропускаются.
+SYMLINK_POLICIES = ("resolve", "follow", "skip")
+
+
+class ScanCancelled(Exception):
+    """Сканирование прервано, так как его результат больше не нужен."""
+
+
+def _check_cancelled(cancel_event):
+    """Вызывает ScanCancelled, если сканирование было отменено."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise ScanCancelled
+
+
+def classify_entry(entry: os.DirEntry, symlinks: str) -> str | None:
+    """
+    Определяет, чем считать запись папки при обходе: "dir", "file" или None
+    (пропустить). Для обычных записей stat не нужен (тип известен из листинга),
+    для символических ссылок — один stat, и только если они не пропускаются.
+    """
+    if not entry.is_symlink():
+        return "dir" if entry.is_dir(follow_symlinks=False) else "file"
+    if symlinks == "skip":
+        return None
+    if entry.is_dir():
+        # В режиме "resolve" в ссылки на папки не заходим
+        return "dir" if symlinks == "follow" else None
+    # Битые ссылки пропускаем
+    return "file" if entry.is_file() else None
+
+
+def _is_new_directory(path: str, visited: set) -> bool:
+    """
+    Защита от циклов по символическим ссылкам: запоминает (устройство, inode)
+    папки и возвращает False, если папка уже встречалась.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    key = (st.st_dev, st.st_ino)
+    if not st.st_ino:
+        return True  # Файловая система не сообщает inode — проверить нельзя
+    if key in visited:
+        return False
+    visited.add(key)
+    return True
+
+
+def iter_matching_files(
+    directory: str,
+    extensions: list[str] | FileFilter,
+    recursive: bool,
+    cancel_event=None,
+    symlinks: str = "resolve",
+):
+    """
+    Обходит дерево каталогов ровно один раз (через os.scandir) и возвращает
+    пути файлов, имена которых оканчиваются одним из расширений. Вместо списка
+    расширений можно передать FileFilter: тогда учитываются его правила,
+    а исключенные папки не обходятся.
+    Пути строятся от переданной папки, без вычисления реальных путей.
+    Символические ссылки обрабатываются согласно symlinks (см. SYMLINK_POLICIES),
+    недоступные папки пропускаются.
+    Если передан cancel_event (threading.Event), перед чтением каждой папки
+    проверяется отмена.
+    """
+    file_filter = (
+        extensions if isinstance(extensions, FileFilter) else FileFilter(extensions)
+    )
+    if not file_filter:
+        return
+    matches = file_filter.matches
+    skip_dir = file_filter.skip_directory
+
+    visited = set()
+    if symlinks == "follow":
+        _is_new_directory(directory, visited)
+    # Стек вместо рекурсии: глубокие деревья не упираются в лимит рекурсии.
+    pending_dirs = [directory]
+    while pending_dirs:
+        _check_cancelled(cancel_event)
+        current_dir = pending_dirs.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    try:
+                        kind = classify_entry(entry, symlinks)
+                        if kind == "dir":
+                            if (
+                                recursive
+                                and (skip_dir is None or not skip_dir(entry.name))
+                                and (
+                                    symlinks != "follow"
+                                    or _is_new_directory(entry.path, visited)
+                                )
+                            ):
+                                pending_dirs.append(entry.path)
+                        elif kind == "file" and matches(entry.name):
+                            yield entry.path
+                    except OSError:
+                        # Запись могла исчезнуть между листингом и проверкой
+                        continue
+        except OSError as e:
+            print(f"Ошибка чтения папки {current_dir}: {e}")
+
+
+def find_files(
+    directory: str,
+    extensions: list[str] | FileFilter,
+    recursive: bool,
+    progress=None,
+    cancel_event=None,
+    symlinks: str = "resolve",
+) -> list[str]:
+    """
+    Рекурсивно ищет файлы с заданными расширениями в указанной директории.
+    Реальный путь вычисляется один раз для корня; пути файлов получаются
+    присоединением, без resolve для каждого файла (см. resolve_picked_path).
+    progress(количество) вызывается каждые PROGRESS_STEP найденных файлов.
+    При срабатывании cancel_event вызывается ScanCancelled.
+    """
     p = Path(directory)
     if not p.is_dir():
         # Возвращаем пустой список, если директория не существует.
         # Обработка ошибки будет в UI.
         return []
 
-    glob_method = p.rglob if recursive else p.glob
-
+    # Возвращаем строки с абсолютными путями
+    root = os.path.realpath(directory)
     found_files = []
-    for ext in extensions:
-        # glob/rglob выполняет поиск. Паттерн должен быть вида '*.ext'.
-        pattern = f"*{ext}"
-        found_files.extend(glob_method(pattern))
+    for path in iter_matching_files(
+        root, extensions, recursive, cancel_event, symlinks
+    ):
+        found_files.append(path)
+        if progress is not None and len(found_files) % PROGRESS_STEP == 0:
+            progress(len(found_files))
+    return found_files
 
-    # Возвращаем список строк с абсолютными путями
-    return [str(f.resolve()) for f in found_files]
 
+def reservoir_sample(items, k: int, rng) -> tuple[list, int]:
+    """
+    Выбирает k элементов из последовательности неизвестной длины за один
+    проход, храня в памяти только выбранные (алгоритм R). Каждый элемент
+    попадает в выборку с равной вероятностью. rng — объект random.Random.
+    Возвращает (выборка в случайном порядке, всего_элементов).
+    """
+    sample = []
+    count = 0
+    for count, item in enumerate(items, 1):
+        if len(sample) < k:
+            sample.append(item)
+        else:
+            index = rng.randrange(count)
+            if index < k:
+                sample[index] = item
+    rng.shuffle(sample)
+    return sample, count
 
-def open_file(filepath: str):
+
+def sample_matching_files(
+    directory: str,
+    extensions: list[str] | FileFilter,
+    recursive: bool,
+    k: int = 1,
+    rng=None,
+    excluded=(),
+    cancel_event=None,
+    symlinks: str = "resolve",
+) -> tuple[list[str], int]:
     """
-    Открывает файл с помощью приложения по умолчанию в зависимости от ОС.
-    Вызывает IOError при ошибке.
+    Выбирает k случайных подходящих файлов одним обходом, не строя список
+    всех файлов (см. reservoir_sample). Пути из excluded не выбираются.
+    Возвращает (пути, всего_подходящих_файлов).
+    """
+    if not os.path.isdir(directory):
+        return [], 0
+    root = os.path.realpath(directory)
+    excluded = set(excluded)
+    paths = iter_matching_files(root, extensions, recursive, cancel_event, symlinks)
+    if excluded:
+        paths = (path for path in paths if path not in excluded)
+    return reservoir_sample(paths, k, rng or random.Random())
+
+
+def _stat_files(full_dir: str, files: list[str]) -> tuple[array, array]:
+    """
+    Читает размеры и mtime файлов папки отдельными stat (для папок, которые
+    не перечитывались). Для недоступных файлов размер -1.
+    """
+    sizes, mtimes = array("q"), array("d")
+    for name in files:
+        try:
+            st = os.stat(os.path.join(full_dir, name))
+        except OSError:
+            sizes.append(-1)
+            mtimes.append(0.0)
+            continue
+        sizes.append(st.st_size)
+        mtimes.append(st.st_mtime)
+    return sizes, mtimes
+
+
+def _iter_subtree(
+    directory: str,
+    start: str,
+    previous: dict,
+    symlinks: str,
+    visited: set,
+    visited_lock: threading.Lock,
+    cancel_event=None,
+    recursive: bool = True,
+    stats=None,
+    skip_dir=None,
+    file_stats=None,
+    dir_keys=None,
+):
+    """
+    Обходит поддерево start для iter_directories(). Перебирает тройки
+    (относительная_папка, (mtime_ns, подпапки, файлы), перечитана).
+    Счетчики и время этапов копятся локально и попадают в stats в конце обхода.
+    В режиме "follow" в dir_keys (если передан) записывается
+    {относительная_папка: (устройство, inode)} пройденных папок.
+    """
+    stat_time = list_time = 0.0
+    visited_count = listed_count = entry_count = error_count = pruned_count = 0
+    pending_dirs = [start]
+    try:
+        while pending_dirs:
+            _check_cancelled(cancel_event)
+            rel_dir = pending_dirs.pop()
+            full_dir = os.path.join(directory, *rel_dir.split("/"))
+            started = time.perf_counter()
+            try:
+                st = os.stat(full_dir)
+            except OSError:
+                error_count += 1
+                continue  # Папка исчезла или недоступна
+            finally:
+                stat_time += time.perf_counter() - started
+            if symlinks == "follow" and st.st_ino:
+                key = (st.st_dev, st.st_ino)
+                with visited_lock:
+                    if key in visited:
+                        continue  # Цикл через символическую ссылку
+                    visited.add(key)
+                if dir_keys is not None:
+                    dir_keys[rel_dir] = key
+            visited_count += 1
+            mtime_ns = st.st_mtime_ns
+
+            known = previous.get(rel_dir)
+            relisted = known is None or known[0] != mtime_ns
+            if not relisted:
+                _, subdirs, files = known
+                if file_stats is not None:
+                    columns = file_stats.get(rel_dir)
+                    if columns is None or len(columns[0]) != len(files):
+                        started = time.perf_counter()
+                        file_stats[rel_dir] = _stat_files(full_dir, files)
+                        list_time += time.perf_counter() - started
+            else:
+                started = time.perf_counter()
+                subdirs, files = [], []
+                if file_stats is not None:
+                    sizes, mtimes = file_stats[rel_dir] = array("q"), array("d")
+                try:
+                    with os.scandir(full_dir) as entries:
+                        for entry in entries:
+                            entry_count += 1
+                            try:
+                                kind = classify_entry(entry, symlinks)
+                            except OSError:
+                                error_count += 1
+                                continue
+                            if kind == "dir":
+                                if skip_dir is not None and skip_dir(entry.name):
+                                    pruned_count += 1
+                                    continue
+                                subdirs.append(entry.name)
+                            elif kind == "file":
+                                if file_stats is not None:
+                                    # На Windows stat уже получен при листинге,
+                                    # на других ОС это один вызов без поиска пути
+                                    try:
+                                        st = entry.stat()
+                                    except OSError:
+                                        error_count += 1
+                                        continue
+                                    sizes.append(st.st_size)
+                                    mtimes.append(st.st_mtime)
+                                files.append(entry.name)
+                except OSError as e:
+                    error_count += 1
+                    print(f"Ошибка чтения папки {full_dir}: {e}")
+                list_time += time.perf_counter() - started
+                listed_count += 1
+                if time.time_ns() - mtime_ns < MTIME_GRANULARITY_NS:
+                    mtime_ns = 0  # Слишком свежее изменение: перечитаем в следующий раз
+
+            if recursive:
+                for name in subdirs:
+                    pending_dirs.append(f"{rel_dir}/{name}" if rel_dir else name)
+            yield rel_dir, (mtime_ns, subdirs, files), relisted
+    finally:
+        if stats is not None:
+            stats.add_phase("stat", stat_time)
+            stats.add_phase("listdir", list_time)
+            stats.count(
+                directories_visited=visited_count,
+                directories_listed=listed_count,
+                entries_examined=entry_count,
+                errors=error_count,
+                directories_pruned=pruned_count,
+            )
+
+
+def iter_directories(
+    directory: str,
+    previous: dict | None = None,
+    cancel_event=None,
+    symlinks: str = "resolve",
+    workers: int = 1,
+    stats=None,
+    skip_dir=None,
+    file_stats=None,
+):
+    """
+    Потоковый вариант scan_directories(): перебирает тройки
+    (относительная_папка, (mtime_ns, подпапки, файлы), перечитана) по мере
+    обхода, поэтому первые файлы доступны задолго до конца сканирования.
+
+    При workers > 1 поддеревья папок верхнего уровня обходятся параллельно
+    в пуле потоков: на сетевых дисках обход упирается в задержки, а os.scandir
+    и os.stat отпускают GIL на время ввода-вывода. Результат от потоков
+    не зависит: поддеревья перебираются в том же порядке, что и в одном
+    потоке (результаты следующих копятся, пока не закончится текущее).
+    В режиме "follow" каждый поток защищается от циклов сам, а папка,
+    встреченная в нескольких поддеревьях, остается за первым по порядку:
+    в остальных она пропускается вместе с содержимым.
+    В stats (ScanStats) записываются счетчики и время этапов обхода.
+    """
+    previous = previous or {}
+    visited = set()  # (устройство, inode) пройденных папок для режима "follow"
+    visited_lock = threading.Lock()
+
+    def walk(start: str, recursive: bool = True, walk_visited=visited, dir_keys=None):
+        return _iter_subtree(
+            directory,
+            start,
+            previous,
+            symlinks,
+            walk_visited,
+            visited_lock,
+            cancel_event,
+            recursive,
+            stats,
+            skip_dir,
+            file_stats,
+            dir_keys,
+        )
+
+    if workers <= 1:
+        yield from walk("")
+        return
+
+    # Корень читаем сразу, его подпапки раздаем потокам
+    root_subdirs = None
+    for item in walk("", recursive=False):
+        root_subdirs = item[1][1]
+        yield item
+    if not root_subdirs:
+        return
+
+    # Один поток берет подпапки со стека с конца: в том же порядке
+    # перебираются и поддеревья
+    subtrees = root_subdirs[::-1]
+    results = queue.Queue()
+    finished = object()  # Метка завершения поддерева
+    stop_event = threading.Event()  # Потребитель больше не ждет результатов
+
+    def walk_subtree(index: int, name: str):
+        dir_keys = {} if symlinks == "follow" else None
+        try:
+            # Корень уже пройден: ссылка на него — тоже цикл
+            for item in walk(name, walk_visited=set(visited), dir_keys=dir_keys):
+                if stop_event.is_set():
+                    return
+                key = dir_keys.pop(item[0], None) if dir_keys is not None else None
+                results.put((index, key, item))
+        except BaseException as e:  # ScanCancelled и ошибки передаем потребителю
+            results.put((index, None, e))
+        finally:
+            results.put((index, None, finished))
+
+    claimed = set(visited)  # Папки, уже отданные потребителю (режим "follow")
+    dropped = set()  # Пропущенные повторные папки
+
+    def accept(key, item) -> bool:
+        rel_dir = item[0]
+        if rel_dir.rpartition("/")[0] in dropped or key in claimed:
+            dropped.add(rel_dir)
+            return False
+        if key is not None:
+            claimed.add(key)
+        return True
+
+    # Импорт здесь: concurrent.futures заметно замедляет запуск, а нужен только тут
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan-tree")
+    try:
+        for index, name in enumerate(subtrees):
+            executor.submit(walk_subtree, index, name)
+        buffers = [[] for _ in subtrees]
+        done = [False] * len(subtrees)
+        current = 0  # Поддерево, результаты которого отдаются сразу
+        while current < len(subtrees):
+            # Потоки могли закончить раньше: отмену проверяем и здесь
+            _check_cancelled(cancel_event)
+            index, key, item = results.get()
+            if isinstance(item, BaseException):
+                raise item
+            if item is not finished:
+                if index != current:
+                    buffers[index].append((key, item))
+                elif accept(key, item):
+                    yield item
+                continue
+            done[index] = True
+            while current < len(subtrees) and done[current]:
+                current += 1
+                if current < len(subtrees):
+                    for key, item in buffers[current]:
+                        if accept(key, item):
+                            yield item
+                    buffers[current] = []
+    finally:
+        # При отмене, ошибке или досрочном выходе не ждем оставшиеся поддеревья
+        stop_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_directories(
+    directory: str,
+    previous: dict | None = None,
+    progress=None,
+    cancel_event=None,
+    symlinks: str = "resolve",
+    workers: int = 1,
+    on_directory=None,
+    stats=None,
+    skip_dir=None,
+    file_stats=None,
+) -> tuple[dict[str, tuple[int, list[str], list[str]]], set[str]]:
+    """
+    Строит снимок дерева: {относительная_папка: (mtime_ns, подпапки, файлы)}.
+    Корень обозначается пустой строкой, разделитель — '/'.
+    Если передан предыдущий снимок, папки с неизменившимся mtime не
+    перечитываются (достаточно одного stat). Возвращает (снимок, перечитанные_папки).
+    Символические ссылки обрабатываются согласно symlinks (см. SYMLINK_POLICIES);
+    в режиме "follow" папка, уже встреченная по другому пути, повторно не обходится.
+    workers — число потоков обхода (см. iter_directories).
+    progress(количество) сообщает число учтенных файлов,
+    on_directory(относительная_папка, файлы) вызывается для каждой папки сразу
+    после ее обхода. stats (ScanStats) получает статистику обхода.
+    Папки, для которых skip_dir(имя) истинно (см. FileFilter.skip_directory),
+    не попадают в снимок и не обходятся.
+    Если передан словарь file_stats, в нем собираются размеры и mtime файлов:
+    {относительная_папка: (array размеров, array mtime)} в порядке файлов
+    снимка. Для перечитанных папок они берутся из того же листинга
+    (DirEntry.stat), для остальных остаются прежние значения из file_stats
+    (если их нет — читаются). Записи удаленных папок из словаря убираются.
+    """
+    records = {}
+    relisted = set()
+    file_count = 0
+    reported_count = 0
+
+    for rel_dir, record, was_relisted in iter_directories(
+        directory,
+        previous,
+        cancel_event,
+        symlinks,
+        workers,
+        stats,
+        skip_dir,
+        file_stats,
+    ):
+        records[rel_dir] = record
+        if was_relisted:
+            relisted.add(rel_dir)
+        if on_directory is not None:
+            on_directory(rel_dir, record[2])
+
+        file_count += len(record[2])
+        if progress is not None and file_count - reported_count >= PROGRESS_STEP:
+            reported_count = file_count
+            progress(file_count)
+
+    if file_stats is not None:
+        for rel_dir in [d for d in file_stats if d not in records]:
+            del file_stats[rel_dir]
+    if stats is not None:
+        stats.count(files_found=file_count)
+    return records, relisted
+
+
+def resolve_picked_path(filepath: str, symlinks: str) -> str:
+    """
+    Возвращает путь выбранного файла с учетом политики ссылок: в режиме
+    "resolve" вычисляется реальный путь — только для одного выбранного файла.
+    """
+    if symlinks == "resolve":
+        return os.path.realpath(filepath)
+    return filepath
+
+
+def warm_file(filepath: str, length: int = WARM_BYTES) -> bool | None:
+    """
+    Готовит файл к открытию: проверяет, что он есть, и просит ОС заранее
+    прочитать его начало в кэш (posix_fadvise WILLNEED, где он есть; иначе
+    первые length байт читаются). Тогда приложение, открывающее файл
+    с сетевого диска, не ждет холодного чтения.
+    Возвращает True, если файл прогрет, False, если файла нет, и None,
+    если прогреть не удалось по другой причине (нет прав, сбой сети и т.п.).
+    """
+    try:
+        with open(filepath, "rb") as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, length, os.POSIX_FADV_WILLNEED)
+            else:
+                f.read(length)
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+    except OSError:
+        return None
+    return True
+
+
+def launch_file(filepath: str) -> subprocess.Popen | None:
+    """
+    Запускает приложение по умолчанию для файла, не дожидаясь завершения
+    запускателя. Возвращает процесс запускателя (open, xdg-open), код
+    завершения которого сообщает об успехе, или None на Windows
+    (os.startfile не создает отслеживаемого процесса).
+    Вызывает IOError, если запустить не удалось.
     """
     try:
         if sys.platform == "win32":
             os.startfile(filepath)
-        elif sys.platform == "darwin":  # macOS
-            # check=True вызовет CalledProcessError, если команда завершится с ошибкой
-            subprocess.run(["open", filepath], check=True)
+            return None
+        if sys.platform == "darwin":  # macOS
+            command = ["open", filepath]
         else:  # linux variants
-            subprocess.run(["xdg-open", filepath], check=True)
-    except (OSError, subprocess.CalledProcessError) as e:
+            command = ["xdg-open", filepath]
+        # Отдельная сессия: приложение не закроется вместе с нашим окном
+        return subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, start_new_session=True
+        )
+    except OSError as e:
         # Оборачиваем специфичные для платформы ошибки в общее исключение,
         # чтобы UI-слою не нужно было знать детали реализации.
         raise IOError(f"Не удалось запустить приложение для файла: {filepath}") from e
 
 
+def open_file(filepath: str):
+    """
+    Открывает файл с помощью приложения по умолчанию и ждет, пока запускатель
+    сообщит результат (для консольного запуска; окно использует FileLauncher).
+    Вызывает IOError при ошибке.
+    """
+    process = launch_file(filepath)
+    if process is not None and process.wait() != 0:
+        raise IOError(f"Не удалось запустить приложение для файла: {filepath}")
+
+
 def show_file_in_explorer(filepath: str):
     """
     Открывает файловый менеджер и показывает указанный файл.
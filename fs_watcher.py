@@ -0,0 +1,317 @@
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+
+from file_utils import classify_entry, scan_directories
+
+# Маски inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+)
+# Заголовок struct inotify_event: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _join_rel(rel_dir: str, name: str) -> str:
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+class PollingWatcher:
+    """
+    Следит за изменениями в дереве папок и складывает события в очередь.
+    События — кортежи (вид, относительная_папка, имя), где вид:
+    "file_added", "file_removed", "dir_added", "dir_removed" или "overflow"
+    (события потеряны, нужно полное пересканирование).
+
+    Эта реализация периодически сверяет mtime папок (см. scan_directories):
+    перечитываются только изменившиеся папки. Работает на любой ОС.
+    За папками, для которых skip_dir(имя) истинно, не следим.
+
+    Сканирование папки начинается только после ready: к этому моменту
+    наблюдатель готов заметить любое изменение. Периодической проверке
+    собственный обход не нужен: исходным снимком служит результат
+    сканирования (seed), а изменения после чтения папки сканированием
+    видны по ее mtime.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        interval: float = 1.0,
+        symlinks: str = "resolve",
+        skip_dir=None,
+    ):
+        self.directory = directory
+        self.interval = interval
+        self.symlinks = symlinks
+        self.skip_dir = skip_dir
+        self._events: queue.Queue = queue.Queue()
+        self._stop_event = threading.Event()
+        # Установлено, когда можно начинать сканирование (см. выше)
+        self.ready = threading.Event()
+        self._seed: dict | None = None
+        self._seed_lock = threading.Lock()
+        self._seeded = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="fs-watcher", daemon=True
+        )
+
+    def start(self):
+        self.ready.set()
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._seeded.set()
+
+    def seed(self, records: dict):
+        """
+        Передает снимок сканирования, с которым сверяется следующая проверка.
+        records копируется: дерево приложения меняется в главном потоке.
+        """
+        with self._seed_lock:
+            self._seed = dict(records)
+        self._seeded.set()
+
+    def _take_seed(self) -> dict | None:
+        with self._seed_lock:
+            seed, self._seed = self._seed, None
+        return seed
+
+    def poll(self) -> list[tuple[str, str, str]]:
+        """Возвращает накопившиеся события. Вызывать из главного потока."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _emit(self, kind: str, rel_dir: str, name: str = ""):
+        self._events.put((kind, rel_dir, name))
+
+    def _run(self):
+        self._seeded.wait()
+        snapshot = self._take_seed()
+        while not self._stop_event.wait(self.interval):
+            # После пересканирования сверяемся с его снимком
+            snapshot = self._take_seed() or snapshot
+            records, relisted = scan_directories(
+                self.directory, snapshot, symlinks=self.symlinks, skip_dir=self.skip_dir
+            )
+            self._emit_differences(snapshot, records, relisted)
+            snapshot = records
+
+    def _emit_differences(self, old: dict, new: dict, relisted: set[str]):
+        """Сравнивает два снимка и создает события для изменившихся папок."""
+        # Сначала родительские папки, затем вложенные
+        for rel_dir in sorted(relisted, key=lambda d: d.count("/") if d else -1):
+            old_record = old.get(rel_dir)
+            new_subdirs, new_files = new[rel_dir][1], new[rel_dir][2]
+            old_subdirs = set(old_record[1]) if old_record else set()
+            old_files = set(old_record[2]) if old_record else set()
+
+            for name in new_subdirs:
+                if name not in old_subdirs:
+                    self._emit("dir_added", rel_dir, name)
+            for name in old_subdirs.difference(new_subdirs):
+                self._emit("dir_removed", rel_dir, name)
+            for name in new_files:
+                if name not in old_files:
+                    self._emit("file_added", rel_dir, name)
+            for name in old_files.difference(new_files):
+                self._emit("file_removed", rel_dir, name)
+
+
+class InotifyWatcher(PollingWatcher):
+    """
+    Наблюдатель на основе inotify (Linux): изменения приходят сразу,
+    без периодического обхода. Если inotify недоступен или закончился лимит
+    наблюдений (fs.inotify.max_user_watches), работает как PollingWatcher.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        interval: float = 1.0,
+        symlinks: str = "resolve",
+        skip_dir=None,
+    ):
+        super().__init__(directory, interval, symlinks, skip_dir)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = -1
+        self._wd_to_dir: dict[int, str] = {}
+        self._dir_to_wd: dict[str, int] = {}
+
+    def start(self):
+        # ready устанавливается в потоке наблюдения, когда наблюдение
+        # за всеми папками уже поставлено
+        self._thread.start()
+
+    def _run(self):
+        fallback = False
+        try:
+            self._setup()
+        except OSError as e:
+            print(f"inotify недоступен ({e}), используется периодическая проверка")
+            self._close()
+            fallback = True
+        finally:
+            self.ready.set()  # Сканирование не должно ждать вечно
+        if fallback:
+            super()._run()
+            return
+        try:
+            self._read_loop()
+        finally:
+            self._close()
+
+    def _setup(self):
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._watch_tree("", emit=False)
+
+    def _close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _add_watch(self, rel_dir: str):
+        path = os.path.join(self.directory, *rel_dir.split("/"))
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        self._wd_to_dir[wd] = rel_dir
+        self._dir_to_wd[rel_dir] = wd
+
+    def _watch_tree(self, rel_dir: str, emit: bool):
+        """
+        Ставит наблюдение на папку и все вложенные. При emit=True сообщает
+        об их содержимом: файлы могли появиться до установки наблюдения.
+        """
+        pending_dirs = [rel_dir]
+        while pending_dirs:
+            current = pending_dirs.pop()
+            self._add_watch(current)
+            path = os.path.join(self.directory, *current.split("/"))
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        kind = classify_entry(entry, self.symlinks)
+                        if kind == "dir":
+                            if self._skipped(entry.name):
+                                continue
+                            if emit:
+                                self._emit("dir_added", current, entry.name)
+                            pending_dirs.append(_join_rel(current, entry.name))
+                        elif kind == "file" and emit:
+                            self._emit("file_added", current, entry.name)
+            except OSError:
+                continue  # Папка уже удалена
+
+    def _skipped(self, name: str) -> bool:
+        return self.skip_dir is not None and bool(self.skip_dir(name))
+
+    def _unwatch_tree(self, rel_dir: str):
+        """Снимает наблюдение с удаленной или перемещенной папки."""
+        prefix = rel_dir + "/"
+        for watched in [d for d in self._dir_to_wd if d == rel_dir or d.startswith(prefix)]:
+            wd = self._dir_to_wd.pop(watched)
+            self._wd_to_dir.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _read_loop(self):
+        while not self._stop_event.is_set():
+            ready, _, _ = select.select([self._fd], [], [], self.interval)
+            if not ready:
+                continue
+            data = os.read(self._fd, 64 * 1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+                self._handle_event(wd, mask, name)
+
+    def _handle_event(self, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            self._emit("overflow", "")
+            return
+        if mask & IN_IGNORED:
+            rel_dir = self._wd_to_dir.pop(wd, None)
+            if rel_dir is not None and self._dir_to_wd.get(rel_dir) == wd:
+                del self._dir_to_wd[rel_dir]
+            return
+
+        rel_dir = self._wd_to_dir.get(wd)
+        if rel_dir is None:
+            return
+        if mask & IN_ISDIR:
+            if self._skipped(name):
+                return  # Исключенная папка (см. FileFilter.skip_directory)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._emit("dir_added", rel_dir, name)
+                try:
+                    self._watch_tree(_join_rel(rel_dir, name), emit=True)
+                except OSError as e:
+                    # Лимит наблюдений исчерпан: дальнейшие события не гарантированы
+                    print(f"Не удалось следить за папкой {name}: {e}")
+                    self._emit("overflow", "")
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._unwatch_tree(_join_rel(rel_dir, name))
+                self._emit("dir_removed", rel_dir, name)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE):
+            if mask & IN_CREATE:
+                # Обычный файл появится по IN_CLOSE_WRITE, когда будет дописан;
+                # символическая ссылка создается сразу и другого события не дает
+                path = os.path.join(self.directory, *rel_dir.split("/"), name)
+                if not os.path.islink(path) or self.symlinks == "skip":
+                    return
+                if not os.path.isfile(path):
+                    return
+            self._emit("file_added", rel_dir, name)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self._emit("file_removed", rel_dir, name)
+
+
+def create_watcher(
+    directory: str, interval: float = 1.0, symlinks: str = "resolve", skip_dir=None
+) -> PollingWatcher:
+    """
+    Создает наблюдатель для папки: inotify на Linux, иначе периодическую проверку.
+    inotify не видит изменений за ссылками на папки, поэтому в режиме
+    symlinks="follow" всегда используется периодическая проверка.
+    """
+    if (
+        sys.platform.startswith("linux")
+        and symlinks != "follow"
+        and ctypes.util.find_library("c")
+    ):
+        return InotifyWatcher(directory, interval, symlinks, skip_dir)
+    return PollingWatcher(directory, interval, symlinks, skip_dir)
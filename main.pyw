@@ -1,7 +1,18 @@
-from ui import App
+# Замер времени запуска начинается с импорта startup_timing, поэтому он первый
+import startup_timing
+from config import CONFIG_FILE, load_option
 
 # --- ТОЧКА ВХОДА В ПРОГРАММУ ---
 
 if __name__ == "__main__":
+    # Отчет о времени запуска (настройка startup_report)
+    if load_option(CONFIG_FILE, "startup_report", False):
+        startup_timing.enable()
+    # Импортируем по отдельности, чтобы в отчете было видно время каждого модуля
+    for module_name in ("customtkinter", "app_logic", "ui"):
+        startup_timing.import_module(module_name)
+    from ui import App
+
     app = App()
+    startup_timing.mark("app_created")
     app.mainloop()
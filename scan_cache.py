@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+
+class ScanCache:
+    """
+    Кэш в памяти с вытеснением давно не использованных записей (LRU).
+    Размер ограничивается суммарным объемом записей в байтах (max_bytes)
+    и/или их количеством (max_entries); None — без ограничения.
+    Считает попадания и промахи для диагностики.
+    """
+
+    def __init__(self, max_bytes: int | None = None, max_entries: int | None = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.size = 0  # Суммарный объем записей в байтах
+        self._entries: OrderedDict = OrderedDict()  # ключ -> (значение, объем)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Возвращает значение и отмечает его как недавно использованное."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size: int = 0):
+        """
+        Добавляет или заменяет запись и вытесняет самые старые, пока кэш
+        не уложится в ограничения. Запись больше max_bytes не сохраняется.
+        """
+        self.discard(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.size += size
+        while (self.max_bytes is not None and self.size > self.max_bytes) or (
+            self.max_entries is not None and len(self._entries) > self.max_entries
+        ):
+            _, (_, dropped_size) = self._entries.popitem(last=False)
+            self.size -= dropped_size
+
+    def discard(self, key):
+        """Удаляет запись, если она есть."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def retain(self, key):
+        """Удаляет все записи, кроме key."""
+        for other in [k for k in self._entries if k != key]:
+            self.discard(other)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def format(self) -> str:
+        """Возвращает состояние кэша в виде текста для окна диагностики."""
+        return (
+            f"Записей: {len(self._entries)}, {self.size / 1024:.1f} КБ, "
+            f"попаданий: {self.hits}, промахов: {self.misses}"
+        )
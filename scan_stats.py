@@ -0,0 +1,98 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Названия этапов для отчета (в порядке выполнения)
+PHASE_TITLES = {
+    "stat": "stat папок",
+    "listdir": "чтение папок",
+    "scan": "сканирование (всего)",
+    "index_save": "запись индекса",
+    "filter": "фильтр по расширениям",
+    "subdirectories": "список подпапок",
+    "build_list": "построение списка файлов",
+}
+
+
+class ScanStats:
+    """
+    Статистика одного сканирования: время этапов и счетчики
+    (папки, записи, совпадения, пропущенные ошибки, память списка файлов).
+    Счетчики можно увеличивать из нескольких потоков обхода.
+    Время этапов "stat" и "listdir" суммируется по всем потокам, поэтому при
+    параллельном обходе может превышать общее время сканирования.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.directories_visited = 0  # Папки, для которых выполнен stat
+        self.directories_listed = 0  # Папки, прочитанные заново (mtime изменился)
+        self.entries_examined = 0  # Записи в прочитанных папках
+        self.directories_pruned = 0  # Исключенные папки (не обходились)
+        self.files_found = 0  # Все файлы дерева
+        self.matches = 0  # Файлы в списке для выбора
+        self.errors = 0  # Ошибки доступа, пропущенные при обходе
+        self.file_list_bytes = 0  # Память, занятая списком файлов
+        self._lock = threading.Lock()
+
+    def add_phase(self, name: str, seconds: float):
+        """Прибавляет время к этапу."""
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """Контекстный менеджер, замеряющий время этапа."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started)
+
+    def count(self, **deltas: int):
+        """Увеличивает счетчики: count(directories_visited=1, errors=2)."""
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def as_dict(self) -> dict:
+        """Возвращает статистику в виде словаря (время этапов — в мс)."""
+        return {
+            "phases_ms": {
+                name: round(seconds * 1000, 2) for name, seconds in self.phases.items()
+            },
+            "directories_visited": self.directories_visited,
+            "directories_listed": self.directories_listed,
+            "entries_examined": self.entries_examined,
+            "directories_pruned": self.directories_pruned,
+            "files_found": self.files_found,
+            "matches": self.matches,
+            "errors": self.errors,
+            "file_list_bytes": self.file_list_bytes,
+        }
+
+    def format(self) -> str:
+        """Возвращает статистику в виде текста для окна диагностики."""
+        lines = ["Время этапов:"]
+        for name, seconds in self.phases.items():
+            title = PHASE_TITLES.get(name, name)
+            lines.append(f"  {title}: {seconds * 1000:.1f} мс")
+        lines += [
+            "",
+            f"Папок проверено: {self.directories_visited}",
+            f"Папок прочитано заново: {self.directories_listed}",
+            f"Записей просмотрено: {self.entries_examined}",
+            f"Папок исключено правилами: {self.directories_pruned}",
+            f"Файлов в дереве: {self.files_found}",
+            f"Подходящих файлов: {self.matches}",
+            f"Пропущено ошибок: {self.errors}",
+            f"Память списка файлов: {self.file_list_bytes / 1024:.1f} КБ",
+        ]
+        return "\n".join(lines)
+
+    def log(self):
+        """Записывает статистику в журнал (logging, уровень INFO)."""
+        # Импорт здесь: logging нужен только при включенной статистике
+        import logging
+
+        logging.getLogger(__name__).info("Статистика сканирования: %s", self.as_dict())
@@ -0,0 +1,100 @@
+import queue
+import threading
+
+from file_utils import ScanCancelled
+
+
+class ScanWorker:
+    """
+    Выполняет задачи сканирования в фоновом потоке.
+    Результаты не передаются в UI напрямую: главный поток периодически
+    забирает их методом poll() (Tk не потокобезопасен).
+    Новая задача отменяет предыдущую, устаревшие результаты отбрасываются.
+    """
+
+    def __init__(self):
+        # Поток создается при первой задаче (см. submit)
+        self._executor = None
+        self._events: queue.Queue = queue.Queue()
+        self._generation = 0
+        self._cancel_event: threading.Event | None = None
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        """True, пока есть незавершенные задачи или необработанные события."""
+        with self._lock:
+            running = self._running
+        return running > 0 or not self._events.empty()
+
+    def submit(self, task):
+        """
+        Запускает task(progress, cancel_event) в фоне, отменяя предыдущую задачу.
+        progress(количество) можно вызывать из задачи для отчета о ходе работы;
+        progress(количество, найденное) дополнительно передает в UI уже
+        найденные данные (событие "found"), не дожидаясь конца задачи.
+        """
+        self.cancel()
+        self._generation += 1
+        generation = self._generation
+        cancel_event = threading.Event()
+        self._cancel_event = cancel_event
+
+        def progress(count: int, found=None):
+            self._events.put((generation, "progress", count))
+            if found is not None:
+                self._events.put((generation, "found", found))
+
+        def run():
+            try:
+                if cancel_event.is_set():
+                    return
+                result = task(progress, cancel_event)
+            except ScanCancelled:
+                return
+            except Exception as e:  # Ошибку показываем в UI, а не теряем в потоке
+                self._events.put((generation, "error", e))
+            else:
+                self._events.put((generation, "done", result))
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        if self._executor is None:
+            # Импорт здесь: concurrent.futures заметно замедляет запуск окна
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="scan"
+            )
+        with self._lock:
+            self._running += 1
+        self._executor.submit(run)
+
+    def cancel(self):
+        """Просит текущую задачу остановиться; ее результат будет отброшен."""
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+            self._cancel_event = None
+
+    def poll(self) -> list[tuple[str, object]]:
+        """
+        Возвращает накопившиеся события (вид, данные) для актуальной задачи.
+        Вид события: "progress", "found", "done" или "error". Вызывать из главного потока.
+        """
+        events = []
+        while True:
+            try:
+                generation, kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._generation:
+                events.append((kind, payload))
+        return events
+
+    def shutdown(self):
+        """Отменяет текущую задачу и освобождает поток."""
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
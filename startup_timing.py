@@ -0,0 +1,71 @@
+"""
+Замеры времени запуска: импорт модулей, появление окна и момент, когда
+впервые можно выбрать файл. Время отсчитывается от импорта этого модуля,
+поэтому его нужно импортировать первым (см. main.pyw).
+"""
+
+import importlib
+import json
+import sys
+import time
+
+START = time.perf_counter()
+# Файл, куда дописывается отчет каждого запуска (по строке JSON)
+REPORT_FILE = "startup_timing.jsonl"
+
+_imports: dict[str, float] = {}
+_marks: dict[str, float] = {}
+_enabled = False
+
+
+def enable():
+    """Включает запись отчета при finish()."""
+    global _enabled
+    _enabled = True
+
+
+def import_module(name: str):
+    """
+    Импортирует модуль и запоминает время импорта (как -X importtime, но
+    только для модулей верхнего уровня; уже загруженные зависимости не учитываются).
+    """
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    _imports.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+def mark(name: str):
+    """Запоминает момент события (только первый раз)."""
+    _marks.setdefault(name, time.perf_counter() - START)
+
+
+def report() -> dict:
+    """Возвращает отчет: время импорта модулей и событий в миллисекундах."""
+    return {
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "imports_ms": {name: round(t * 1000, 1) for name, t in _imports.items()},
+        "marks_ms": {name: round(t * 1000, 1) for name, t in _marks.items()},
+    }
+
+
+def finish(report_file: str = REPORT_FILE):
+    """
+    Завершает замер: если он включен, печатает отчет и дописывает его
+    в report_file, чтобы было видно, как время запуска меняется со временем.
+    """
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    data = report()
+    imports = ", ".join(f"{name} {ms} мс" for name, ms in data["imports_ms"].items())
+    marks = ", ".join(f"{name} {ms} мс" for name, ms in data["marks_ms"].items())
+    print(f"Импорт: {imports}")
+    print(f"Запуск: {marks}")
+    try:
+        with open(report_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Не удалось сохранить {report_file}: {e}")
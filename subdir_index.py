@@ -0,0 +1,44 @@
+from bisect import bisect_left
+
+
+class SubdirectoryIndex:
+    """
+    Поиск подпапок по мере ввода текста. Запрос без учета регистра
+    сравнивается с началом пути или любой его части после '/':
+    "ph" найдет и "Photos", и "2024/Photos/raw", а "photos/r" — "2024/Photos/raw".
+    Для этого хранится отсортированный список таких окончаний путей,
+    и поиск — это двоичный поиск плюс перебор только совпадений.
+    """
+
+    def __init__(self, paths: list[str]):
+        """paths: относительные пути через '/' (как AppLogic.subdirectories)."""
+        self.paths = paths
+        keys = []
+        for i, path in enumerate(paths):
+            lowered = path.casefold()
+            start = 0
+            while True:
+                keys.append((lowered[start:], i))
+                start = lowered.find("/", start) + 1
+                if not start:
+                    break
+        keys.sort()
+        self._keys = keys
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def search(self, query: str) -> list[str]:
+        """Возвращает подходящие пути в исходном порядке (все — для пустого запроса)."""
+        query = query.strip().casefold()
+        if not query:
+            return self.paths
+        found = set()
+        position = bisect_left(self._keys, (query,))
+        while position < len(self._keys):
+            key, i = self._keys[position]
+            if not key.startswith(query):
+                break
+            found.add(i)
+            position += 1
+        return [self.paths[i] for i in sorted(found)]
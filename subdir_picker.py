@@ -0,0 +1,319 @@
+import customtkinter as ctk
+
+from subdir_index import SubdirectoryIndex
+
+# Текст первого пункта: выбор без ограничения подпапкой
+ALL_FOLDERS = "Искать везде"
+# Высота строки списка и отступ одного уровня дерева, пиксели
+ROW_HEIGHT = 24
+INDENT = 16
+# Сколько строк видно в окне выбора
+VISIBLE_ROWS = 12
+# Задержка поиска после ввода символа, мс
+SEARCH_DELAY_MS = 120
+
+
+def _theme_color(widget: str, key: str) -> str:
+    """Цвет из темы customtkinter для текущего режима (светлый или темный)."""
+    color = ctk.ThemeManager.theme[widget][key]
+    if isinstance(color, (list, tuple)):
+        return color[1] if ctk.get_appearance_mode() == "Dark" else color[0]
+    return color
+
+
+class SubdirectoryPicker(ctk.CTkButton):
+    """
+    Выбор подпапки для больших деревьев (десятки тысяч папок). Вместо
+    выпадающего списка со всеми путями кнопка открывает окно, где:
+    - папки показываются деревом, вложенные подгружаются при раскрытии;
+    - ввод текста фильтрует все подпапки (см. SubdirectoryIndex);
+    - рисуются только видимые строки, поэтому размер списка не важен.
+    """
+
+    def __init__(self, master, children, command, **kwargs):
+        """
+        children(путь) возвращает пути подпапок ("" — корень);
+        command(путь или None) вызывается при выборе (None — "Искать везде").
+        """
+        super().__init__(
+            master, text=ALL_FOLDERS, command=self._open_popup, anchor="w", **kwargs
+        )
+        self._children = children
+        self._command = command
+        self._subdirectories: list[str] = []
+        self._nested = False
+        # Индекс поиска строится при первом вводе текста
+        self._index: SubdirectoryIndex | None = None
+        self._popup: _PickerPopup | None = None
+
+    def set_subdirectories(self, subdirectories: list[str], nested: bool):
+        """
+        Задает список подпапок. nested=False — только верхний уровень,
+        без раскрытия дерева.
+        """
+        self._subdirectories = subdirectories
+        self._nested = nested
+        self._index = None
+        if self._popup is not None and self._popup.winfo_exists():
+            self._popup.reload()
+
+    def set(self, value: str | None):
+        """Показывает выбранную подпапку (None — "Искать везде")."""
+        self.configure(text=value or ALL_FOLDERS)
+
+    def search(self, query: str) -> list[str]:
+        if self._index is None:
+            self._index = SubdirectoryIndex(self._subdirectories)
+        return self._index.search(query)
+
+    def children_of(self, path: str) -> list[str]:
+        if path and not self._nested:
+            return []
+        return self._children(path)
+
+    def _open_popup(self):
+        if self._popup is not None and self._popup.winfo_exists():
+            self._popup.focus()
+            return
+        self._popup = _PickerPopup(self)
+
+    def select(self, path: str | None):
+        """Выбирает подпапку (None — "Искать везде") и сообщает о выборе."""
+        self._popup = None
+        self.set(path)
+        self._command(path)
+
+
+class _PickerPopup(ctk.CTkToplevel):
+    """Окно выбора подпапки: поле поиска и виртуализированный список."""
+
+    def __init__(self, picker: SubdirectoryPicker):
+        super().__init__(picker)
+        self._picker = picker
+        self.title("Выбор подпапки")
+        self.transient(picker.winfo_toplevel())
+        width = max(picker.winfo_width(), 300)
+        height = ROW_HEIGHT * VISIBLE_ROWS + 50
+        self.geometry(
+            f"{width}x{height}+{picker.winfo_rootx()}"
+            f"+{picker.winfo_rooty() + picker.winfo_height()}"
+        )
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self._query = ctk.StringVar()
+        self._entry = ctk.CTkEntry(
+            self, textvariable=self._query, placeholder_text="Поиск папки..."
+        )
+        self._entry.grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
+        self._canvas = ctk.CTkCanvas(
+            self,
+            highlightthickness=0,
+            background=_theme_color("CTkFrame", "fg_color"),
+        )
+        self._canvas.grid(row=1, column=0, padx=(5, 0), pady=(0, 5), sticky="nsew")
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.grid(row=1, column=1, pady=(0, 5), sticky="ns")
+        self._font = ctk.CTkFont()
+        self._text_color = _theme_color("CTkLabel", "text_color")
+        self._active_color = _theme_color("CTkButton", "fg_color")
+        self._active_text_color = _theme_color("CTkButton", "text_color")
+
+        # Строки списка: (путь или None для "Искать везде", уровень вложенности)
+        self._rows: list[tuple[str | None, int]] = []
+        self._expanded: set[str] = set()
+        self._has_children: dict[str, bool] = {}
+        self._top = 0  # Первая видимая строка
+        self._active = 0  # Строка, выбранная клавиатурой
+        self._search_job = None
+
+        self._query.trace_add("write", self._on_query_changed)
+        self._canvas.bind("<Configure>", lambda event: self._draw())
+        self._canvas.bind("<Button-1>", self._on_click)
+        self._canvas.bind("<MouseWheel>", self._on_wheel)
+        self._canvas.bind("<Button-4>", lambda event: self._scroll_by(-3))
+        self._canvas.bind("<Button-5>", lambda event: self._scroll_by(3))
+        self._entry.bind("<Down>", lambda event: self._move_active(1))
+        self._entry.bind("<Up>", lambda event: self._move_active(-1))
+        self._entry.bind("<Next>", lambda event: self._move_active(VISIBLE_ROWS))
+        self._entry.bind("<Prior>", lambda event: self._move_active(-VISIBLE_ROWS))
+        self._entry.bind("<Right>", lambda event: self._expand_active(True))
+        self._entry.bind("<Left>", lambda event: self._expand_active(False))
+        self._entry.bind("<Return>", lambda event: self._choose(self._active))
+        self.bind("<Escape>", lambda event: self.destroy())
+
+        self.reload()
+        self.after(50, self._entry.focus_set)
+
+    # --- Данные строк ---
+
+    def reload(self):
+        """Перестраивает строки по текущему запросу (после смены списка подпапок)."""
+        self._has_children.clear()
+        query = self._query.get()
+        if query.strip():
+            self._rows = [(path, 0) for path in self._picker.search(query)]
+        else:
+            self._rows = [(None, 0)]
+            self._append_children("", 0, len(self._rows))
+        self._top = 0
+        self._active = 0
+        self._draw()
+
+    def _append_children(self, path: str, depth: int, position: int) -> int:
+        """Вставляет раскрытые подпапки path начиная с position; возвращает конец."""
+        children = self._picker.children_of(path)
+        self._rows[position:position] = [(child, depth) for child in children]
+        end = position + len(children)
+        # Папки, раскрытые ранее, остаются раскрытыми
+        i = position
+        while i < end:
+            child = self._rows[i][0]
+            i += 1
+            if child in self._expanded:
+                inserted = self._append_children(child, depth + 1, i) - i
+                i += inserted
+                end += inserted
+        return end
+
+    def _expandable(self, path: str | None) -> bool:
+        if path is None or self._query.get().strip():
+            return False
+        result = self._has_children.get(path)
+        if result is None:
+            result = self._has_children[path] = bool(self._picker.children_of(path))
+        return result
+
+    def _toggle(self, row: int):
+        path, depth = self._rows[row]
+        if not self._expandable(path):
+            return
+        if path in self._expanded:
+            self._expanded.discard(path)
+            end = row + 1
+            while end < len(self._rows) and self._rows[end][1] > depth:
+                end += 1
+            del self._rows[row + 1 : end]
+        else:
+            self._expanded.add(path)
+            self._append_children(path, depth + 1, row + 1)
+        self._draw()
+
+    # --- Отрисовка видимых строк ---
+
+    def _visible_count(self) -> int:
+        return max(self._canvas.winfo_height() // ROW_HEIGHT, 1)
+
+    def _draw(self):
+        canvas = self._canvas
+        canvas.delete("all")
+        width = canvas.winfo_width()
+        visible = self._visible_count()
+        self._top = max(min(self._top, len(self._rows) - visible), 0)
+        for i in range(self._top, min(self._top + visible + 1, len(self._rows))):
+            path, depth = self._rows[i]
+            y = (i - self._top) * ROW_HEIGHT
+            color = self._text_color
+            if i == self._active:
+                canvas.create_rectangle(
+                    0, y, width, y + ROW_HEIGHT, fill=self._active_color, width=0
+                )
+                color = self._active_text_color
+            x = 6 + depth * INDENT
+            if self._expandable(path):
+                arrow = "▾" if path in self._expanded else "▸"
+                canvas.create_text(
+                    x,
+                    y + ROW_HEIGHT // 2,
+                    text=arrow,
+                    anchor="w",
+                    fill=color,
+                    font=self._font,
+                )
+            if path is None:
+                text = ALL_FOLDERS
+            elif self._query.get().strip():
+                text = path  # В результатах поиска показываем полный путь
+            else:
+                text = path.rsplit("/", 1)[-1]
+            canvas.create_text(
+                x + INDENT,
+                y + ROW_HEIGHT // 2,
+                text=text,
+                anchor="w",
+                fill=color,
+                font=self._font,
+            )
+        if self._rows:
+            first = self._top / len(self._rows)
+            last = min((self._top + visible) / len(self._rows), 1.0)
+            self._scrollbar.set(first, last)
+
+    # --- Прокрутка и выбор ---
+
+    def _scroll_by(self, rows: int):
+        self._top += rows
+        self._draw()
+
+    def _on_wheel(self, event):
+        # Windows и macOS: delta кратна 120 (или 1 на macOS)
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self._scroll_by(-3 * step)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self._top = int(float(value) * len(self._rows))
+        elif unit == "pages":
+            self._top += int(value) * self._visible_count()
+        else:
+            self._top += int(value)
+        self._draw()
+
+    def _move_active(self, delta: int):
+        if not self._rows:
+            return
+        self._active = max(min(self._active + delta, len(self._rows) - 1), 0)
+        visible = self._visible_count()
+        if self._active < self._top:
+            self._top = self._active
+        elif self._active >= self._top + visible:
+            self._top = self._active - visible + 1
+        self._draw()
+        return "break"
+
+    def _expand_active(self, expand: bool):
+        if not self._rows or self._query.get().strip():
+            return None  # В поле поиска стрелки двигают курсор
+        path = self._rows[self._active][0]
+        if expand != (path in self._expanded):
+            self._toggle(self._active)
+        return "break"
+
+    def _on_click(self, event):
+        row = self._top + event.y // ROW_HEIGHT
+        if row >= len(self._rows):
+            return
+        path, depth = self._rows[row]
+        # Щелчок по стрелке раскрывает папку, по названию — выбирает ее
+        if self._expandable(path) and event.x < 6 + (depth + 1) * INDENT:
+            self._active = row
+            self._toggle(row)
+        else:
+            self._choose(row)
+
+    def _choose(self, row: int):
+        if row >= len(self._rows):
+            return
+        path = self._rows[row][0]
+        self.destroy()
+        self._picker.select(path)
+
+    def _on_query_changed(self, *args):
+        # Поиск выполняется после паузы во вводе, а не на каждый символ
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(SEARCH_DELAY_MS, self._run_search)
+
+    def _run_search(self):
+        self._search_job = None
+        self.reload()
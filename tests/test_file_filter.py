@@ -0,0 +1,29 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from file_filter import FileFilter  # noqa: E402
+
+
+class ExtensionMatchTest(unittest.TestCase):
+    def test_extension_without_dot(self):
+        file_filter = FileFilter(["mp4", ".MKV"])
+        self.assertTrue(file_filter.matches("clip.MP4"))
+        self.assertTrue(file_filter.matches("clip.mkv"))
+        self.assertFalse(file_filter.matches("clipmp4"))
+        self.assertEqual(file_filter, FileFilter([".mp4", "mkv"]))
+
+    def test_suffix_rule(self):
+        file_filter = FileFilter(["_small.mp4"])
+        self.assertTrue(file_filter.matches("clip_SMALL.mp4"))
+        self.assertFalse(file_filter.matches("clip.mp4"))
+        self.assertFalse(file_filter.matches("clip_small.mp4.part"))
+        # С правилами include/exclude проверка идет другим путем
+        with_rules = FileFilter(["_small.mp4"], exclude=["*.tmp"])
+        self.assertTrue(with_rules.matches("clip_small.mp4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app_logic  # noqa: E402
+from app_logic import AppLogic  # noqa: E402
+
+
+class StreamingScanSettingsTest(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        # Настройки и история пишутся в текущую папку
+        os.chdir(self._tmp.name)
+        self.directory = os.path.realpath(os.path.join(self._tmp.name, "files"))
+        for rel_path in ("top.mp4", "a/1.mp4", "a/2.mkv", "b/3.mp4"):
+            path = Path(self.directory, rel_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+        self.logic = AppLogic(directory=self.directory, background_scans=True)
+        self.logic.update_extensions("mp4, mkv")
+        self.logic.set_recursive_scan(True)
+
+    def tearDown(self):
+        self.logic.close()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def _paths(self, *rel_paths: str) -> list[str]:
+        return sorted(os.path.join(self.directory, *p.split("/")) for p in rel_paths)
+
+    def test_settings_change_keeps_running_scan(self):
+        self.assertEqual(self.logic._rescan()[1], "scanning")
+        found = []
+        with mock.patch.object(app_logic, "STREAM_INTERVAL", 0):
+            result = self.logic.make_scan_task()(
+                lambda count, batch=None: batch and found.append(batch), None
+            )
+        for batch in found:
+            self.logic.add_found_files(batch)
+
+        # Сканирование не перезапускается, список строится из найденного
+        _, message, status = self.logic.update_extensions("mp4")
+        self.assertEqual(status, "info")
+        self.assertEqual(
+            sorted(self.logic.file_list), self._paths("top.mp4", "a/1.mp4", "b/3.mp4")
+        )
+        self.assertEqual(self.logic.set_recursive_scan(False)[1], "info")
+        self.assertEqual(sorted(self.logic.file_list), self._paths("top.mp4"))
+
+        self.logic.apply_scan_result(result)
+        self.assertEqual(sorted(self.logic.file_list), self._paths("top.mp4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
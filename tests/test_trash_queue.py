@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app_logic import AppLogic  # noqa: E402
+from trash_queue import trash_files  # noqa: E402
+
+
+def _raising_send2trash(error: Exception):
+    """Модуль-заглушка send2trash, который не удаляет ни одного файла."""
+    module = types.ModuleType("send2trash")
+
+    def send2trash(paths):
+        raise error
+
+    module.send2trash = send2trash
+    return module
+
+
+class TrashFilesTest(unittest.TestCase):
+    def test_errors_are_reported_per_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f"{i}.mp4") for i in range(3)]
+            for path in paths:
+                Path(path).touch()
+            stub = _raising_send2trash(RuntimeError("корзина недоступна"))
+            with mock.patch.dict(sys.modules, {"send2trash": stub}):
+                trashed, failed = trash_files(paths)
+            self.assertEqual(trashed, [])
+            self.assertEqual([path for path, _ in failed], paths)
+
+
+class TrashTaskTest(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        # Настройки и история пишутся в текущую папку
+        os.chdir(self._tmp.name)
+        self.directory = os.path.realpath(os.path.join(self._tmp.name, "files"))
+        os.mkdir(self.directory)
+        self.paths = [os.path.join(self.directory, f"{i}.mp4") for i in range(3)]
+        for path in self.paths:
+            Path(path).touch()
+        self.logic = AppLogic(directory=self.directory)
+
+    def tearDown(self):
+        self.logic.close()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def _delete_and_run(self, modules: dict) -> tuple[str, str]:
+        for path in self.paths[:2]:
+            self.logic.delete_file(path)
+        self.assertEqual(len(self.logic.file_list), 1)
+        task = self.logic.make_trash_task()
+        with mock.patch.dict(sys.modules, modules):
+            result = task()
+        return self.logic.apply_trash_result(result)
+
+    def test_failed_batch_is_restored(self):
+        stub = _raising_send2trash(RuntimeError("корзина недоступна"))
+        message, status = self._delete_and_run({"send2trash": stub})
+        self.assertEqual(status, "error")
+        self.assertFalse(self.logic.trash_queue.entries())
+        self.assertEqual(sorted(self.logic.file_list), self.paths)
+        self.assertTrue(all(os.path.exists(path) for path in self.paths))
+
+    def test_missing_send2trash_restores_batch(self):
+        # None в sys.modules: импорт send2trash завершается ImportError
+        message, status = self._delete_and_run({"send2trash": None})
+        self.assertEqual(status, "error")
+        self.assertFalse(self.logic.trash_queue.entries())
+        self.assertEqual(sorted(self.logic.file_list), self.paths)
+
+
+if __name__ == "__main__":
+    unittest.main()
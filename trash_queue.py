@@ -0,0 +1,93 @@
+import os
+
+# Сколько файлов передается send2trash за один вызов
+TRASH_BATCH = 50
+
+
+def trash_files(paths: list[str], progress=None):
+    """
+    Перемещает файлы в корзину пачками по TRASH_BATCH (send2trash принимает
+    список путей). Если пачка не удалилась целиком, ее файлы удаляются
+    по одному, чтобы узнать, какие именно не удались. Файлы, которых уже нет,
+    считаются удаленными. progress(количество) сообщает о ходе работы.
+    Удаление не прерывается на середине: файлы уже убраны из списка, поэтому
+    любая ошибка send2trash (не только OSError) лишь отмечает файл неудавшимся.
+    Возвращает (удаленные_пути, [(путь, ошибка)]).
+    """
+    # Импорт здесь: send2trash нужен только при удалении, а не при запуске
+    from send2trash import send2trash
+
+    trashed, failed = [], []
+    for start in range(0, len(paths), TRASH_BATCH):
+        batch = paths[start : start + TRASH_BATCH]
+        existing = [path for path in batch if os.path.lexists(path)]
+        try:
+            if existing:
+                send2trash(existing)
+            trashed.extend(batch)
+        except Exception:
+            for path in batch:
+                try:
+                    if os.path.lexists(path):
+                        send2trash(path)
+                    trashed.append(path)
+                except Exception as e:
+                    print(f"Не удалось удалить файл {path}: {e}")
+                    failed.append((path, e))
+        if progress is not None:
+            progress(len(trashed) + len(failed))
+    return trashed, failed
+
+
+class TrashQueue:
+    """
+    Очередь файлов на удаление в корзину. Отмеченные файлы ждут, пока
+    пользователь может отменить удаление (undo), и затем удаляются одной
+    фоновой задачей (take -> trash_files -> finish). Пока файл в очереди
+    или удаляется, его нет в списке для выбора (см. AppLogic.delete_file).
+    Элементы — пары (запись_в_списке, путь_на_диске): в списке файл записан
+    путем до раскрытия символических ссылок.
+    """
+
+    def __init__(self, delay: float):
+        # Сколько секунд после последней отметки можно отменить удаление
+        self.delay = delay
+        self._pending: list[tuple[str, str]] = []
+        # Записи всех файлов в очереди и удаляемых сейчас
+        self._marked: set[str] = set()
+
+    @property
+    def pending_count(self) -> int:
+        """Сколько файлов ждут удаления (и его еще можно отменить)."""
+        return len(self._pending)
+
+    def __contains__(self, entry: str) -> bool:
+        return entry in self._marked
+
+    def entries(self) -> set[str]:
+        """Записи всех файлов в очереди и удаляемых сейчас."""
+        return self._marked
+
+    def mark(self, entry: str, path: str) -> bool:
+        """Ставит файл в очередь. Возвращает False, если он уже в ней."""
+        if entry in self._marked:
+            return False
+        self._marked.add(entry)
+        self._pending.append((entry, path))
+        return True
+
+    def undo(self) -> list[str]:
+        """Отменяет удаление всех ожидающих файлов; возвращает их записи."""
+        entries = [entry for entry, _ in self._pending]
+        self._marked.difference_update(entries)
+        self._pending = []
+        return entries
+
+    def take(self) -> list[tuple[str, str]]:
+        """Забирает ожидающие файлы для удаления (отменить его уже нельзя)."""
+        batch, self._pending = self._pending, []
+        return batch
+
+    def finish(self, batch: list[tuple[str, str]]):
+        """Отмечает, что удаление пачки из take() завершено."""
+        self._marked.difference_update(entry for entry, _ in batch)
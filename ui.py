@@ -3,7 +3,19 @@ from customtkinter import filedialog
 from pathlib import Path
 
 # Импортируем наши новые модули
+import startup_timing
 from app_logic import AppLogic
+from config import INDEX_FILE
+from file_launcher import FileLauncher
+from scan_worker import ScanWorker
+from subdir_picker import SubdirectoryPicker
+
+# Интервал опроса фонового сканирования, мс
+SCAN_POLL_INTERVAL_MS = 100
+# Интервал применения изменений на диске в режиме наблюдения, мс
+WATCH_POLL_INTERVAL_MS = 500
+# Сколько групп дубликатов показывать в окне дубликатов
+MAX_SHOWN_DUPLICATE_GROUPS = 100
 
 
 class App(ctk.CTk):
@@ -28,8 +40,9 @@ class App(ctk.CTk):
 
         # Задаем размеры окна и центрируем его на экране
         window_width = 600
-        # Высота 300px, чтобы комфортно разместить все элементы, включая чек-боксы
-        window_height = 300
+        # Высота 340px, чтобы комфортно разместить все элементы, включая чек-боксы
+        # и фильтр по размеру и дате
+        window_height = 340
 
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
@@ -43,7 +56,40 @@ class App(ctk.CTk):
         self.grid_columnconfigure(2, weight=1)  # растягивать
 
         # --- 2. Инициализация логики и состояния UI ---
-        self.logic = AppLogic()
+        # Сканирование выполняется в фоне, чтобы окно не зависало,
+        # а индекс позволяет работать со списком файлов еще до его завершения.
+        # Индекс тоже читается в фоне, уже после появления окна.
+        self.logic = AppLogic(
+            background_scans=True, index_file=INDEX_FILE, defer_index=True
+        )
+        self.scan_worker = ScanWorker()
+        self._scan_polling = False
+        # True, пока фоновая задача загружает индекс (а не сканирует папку)
+        self._loading_index = False
+        self._started = False
+        # Отдельный поток для выбора без списка (режим "reservoir"),
+        # чтобы выбор не отменял сканирование и наоборот
+        self.pick_worker = ScanWorker()
+        self._pick_polling = False
+        # Отдельный поток для поиска дубликатов после сканирования
+        self.dedup_worker = ScanWorker()
+        self._dedup_polling = False
+        # Файлы открываются в фоне, чтобы окно не ждало запуска приложения
+        self.launcher = FileLauncher()
+        self._launch_polling = False
+        # Отмеченные файлы удаляются в корзину пачкой в фоне (см. TrashQueue)
+        self.trash_worker = ScanWorker()
+        self._trash_polling = False
+        self._trash_job = None
+        self._trash_total = 0
+        # Следующий файл выбирается и прогревается заранее (см. make_prefetch_task)
+        self.prefetch_worker = ScanWorker()
+        self._prefetch_polling = False
+        self._duplicates_window = None
+        # Список подпапок, который сейчас показан в выпадающем списке
+        self._shown_subdirectories = None
+        # Окно статистики сканирования (режим диагностики), если открыто
+        self._stats_window = None
         # Сохраняем цвет текста по умолчанию для восстановления после ошибки
         self._default_text_color = ctk.ThemeManager.theme["CTkLabel"]["text_color"]
         self._success_text_color = "green"
@@ -108,27 +154,49 @@ class App(ctk.CTk):
         else:
             self.recursive_checkbox.deselect()
 
-        # --- Выпадающий список подпапок ---
-        self.subdir_combobox = ctk.CTkComboBox(
+        # --- Фильтр по размеру и дате (пустое поле или 0 — без ограничения) ---
+        self.metadata_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.metadata_frame.grid(
+            row=2, column=0, columnspan=3, padx=15, pady=(0, 5), sticky="w"
+        )
+        self.metadata_entries = {}
+        for column, (name, text, value) in enumerate(
+            (
+                ("min_size_mb", "Размер от, МБ:", self.logic.min_size_mb),
+                ("max_size_mb", "до:", self.logic.max_size_mb),
+                ("max_age_days", "Не старше, дней:", self.logic.max_age_days),
+            )
+        ):
+            label = ctk.CTkLabel(self.metadata_frame, text=text)
+            label.grid(row=0, column=2 * column, padx=(5, 5))
+            entry = ctk.CTkEntry(self.metadata_frame, width=70, placeholder_text="0")
+            if value:
+                entry.insert(0, f"{value:g}")
+            entry.grid(row=0, column=2 * column + 1, padx=(0, 10))
+            entry.bind("<Return>", self.update_metadata_filter)
+            entry.bind("<FocusOut>", self.update_metadata_filter)
+            self.metadata_entries[name] = entry
+
+        # --- Выбор подпапки (дерево с поиском, см. SubdirectoryPicker) ---
+        self.subdir_picker = SubdirectoryPicker(
             self,
-            values=["Искать везде"],
+            children=self.logic.child_subdirectories,
             command=self.on_subdirectory_selected,
-            state="readonly",  # Чтобы пользователь не мог вводить свой текст
         )
-        self.subdir_combobox.grid(
-            row=2, column=0, columnspan=3, padx=20, pady=(5, 0), sticky="ew"
+        self.subdir_picker.grid(
+            row=3, column=0, columnspan=3, padx=20, pady=(5, 0), sticky="ew"
         )
 
         # Информационная строка для основных сообщений
         self.info_label = ctk.CTkLabel(self, text="Инициализация...")
         self.info_label.grid(
-            row=3, column=0, columnspan=3, padx=20, pady=10, sticky="ew"
+            row=4, column=0, columnspan=3, padx=20, pady=10, sticky="ew"
         )
 
         # --- Фрейм для кнопок действия ---
         self.action_buttons_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.action_buttons_frame.grid(
-            row=4, column=0, columnspan=3, padx=20, pady=(0, 10)
+            row=5, column=0, columnspan=3, padx=20, pady=(0, 10)
         )
 
         # ОКнопка открытия файла
@@ -148,34 +216,123 @@ class App(ctk.CTk):
         )
         self.open_folder_button.grid(row=0, column=1, padx=(5, 0))
 
-        # Кнопка удаления файла
+        # Кнопка окна статистики (только в режиме диагностики)
+        if self.logic.diagnostics:
+            self.stats_button = ctk.CTkButton(
+                self.action_buttons_frame,
+                text="Статистика",
+                command=self.show_scan_stats,
+                width=100,
+            )
+            self.stats_button.grid(row=0, column=2, padx=(10, 0))
+
+        # Кнопка окна дубликатов (только если поиск дубликатов включен)
+        if self.logic.dedup:
+            self.duplicates_button = ctk.CTkButton(
+                self.action_buttons_frame,
+                text="Дубликаты",
+                command=self.show_duplicates,
+                width=100,
+            )
+            self.duplicates_button.grid(row=0, column=3, padx=(10, 0))
+
+        # --- Фрейм для кнопок удаления ---
+        self.delete_buttons_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.delete_buttons_frame.grid(
+            row=6, column=0, columnspan=3, padx=20, pady=(0, 20)
+        )
+
+        # Кнопка удаления файла (файл ставится в очередь, см. TrashQueue)
         self.delete_button = ctk.CTkButton(
-            self,
+            self.delete_buttons_frame,
             text="Удалить последний файл",
             command=self.delete_last_file,
             fg_color="firebrick",
             hover_color="darkred",
             state="disabled",  # Изначально неактивна
         )
-        self.delete_button.grid(row=5, column=0, columnspan=3, padx=20, pady=(0, 20))
+        self.delete_button.grid(row=0, column=0, padx=(0, 5))
+
+        # Кнопка отмены удаления (пока файлы ждут в очереди)
+        self.undo_delete_button = ctk.CTkButton(
+            self.delete_buttons_frame,
+            text="Отменить удаление",
+            command=self.undo_delete,
+            state="disabled",
+        )
+        self.undo_delete_button.grid(row=0, column=1, padx=(5, 0))
 
         # Метка для сообщений об ошибках и удалении
         self.error_label = ctk.CTkLabel(
             self, text="", text_color=self._error_text_color
         )
         self.error_label.grid(
-            row=6, column=0, columnspan=3, padx=20, pady=(0, 10), sticky="ew"
+            row=7, column=0, columnspan=3, padx=20, pady=(0, 10), sticky="ew"
         )
 
         # --- 4. Первоначальное обновление UI ---
-        self.refresh_ui_from_logic()
-        self._update_subdirectory_dropdown()
+        # Загрузка индекса и сканирование начинаются после появления окна
+        self.bind("<Map>", self._on_first_map, add="+")
 
         # --- 5. Дополнительные привязки событий ---
         # Привязываем событие клика к самому окну.
         # Если кликнуть на пустое место, фокус уйдет с поля ввода,
         # что вызовет событие <FocusOut> и сохранит изменения.
         self.bind("<Button-1>", self.clear_focus_on_window_click)
+        # При закрытии окна останавливаем фоновое сканирование
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        # В режиме наблюдения периодически применяем изменения на диске
+        if self.logic.watch_enabled:
+            self.after(WATCH_POLL_INTERVAL_MS, self._poll_watch_events)
+
+    def _on_first_map(self, event):
+        """Когда окно впервые показано, запускает загрузку данных."""
+        if event.widget is not self or self._started:
+            return
+        self._started = True
+        startup_timing.mark("window_shown")
+        # after_idle: сначала Tk дорисует окно
+        self.after_idle(self._load_initial_data)
+
+    def _load_initial_data(self):
+        """Загружает индекс в фоне (если он есть), затем запускает сканирование."""
+        if not self.logic.index_pending:
+            self.refresh_ui_from_logic()
+            return
+        self.scan_worker.submit(self.logic.make_index_task())
+        self._loading_index = True
+        self._update_info_label("Загрузка...", "info")
+        if not self._scan_polling:
+            self._scan_polling = True
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_scan_worker)
+
+    def on_close(self):
+        """Останавливает фоновые задачи и закрывает окно."""
+        startup_timing.finish()
+        # Отмеченные файлы удаляем сразу, не дожидаясь конца паузы для отмены
+        if self._trash_job is not None:
+            self.after_cancel(self._trash_job)
+        task = self.logic.make_trash_task()
+        if task is not None:
+            self.logic.apply_trash_result(task())
+        self.trash_worker.shutdown()
+        self.scan_worker.shutdown()
+        self.pick_worker.shutdown()
+        self.dedup_worker.shutdown()
+        self.prefetch_worker.shutdown()
+        self.launcher.shutdown()
+        self.logic.close()
+        self.destroy()
+
+    def _poll_watch_events(self):
+        """Применяет изменения файловой системы, найденные наблюдателем."""
+        result = self.logic.process_watch_events()
+        if result:
+            message, status = result
+            if self.logic.subdirectories is not self._shown_subdirectories:
+                self._update_subdirectory_dropdown()
+            self._handle_logic_result(message, status)
+        self.after(WATCH_POLL_INTERVAL_MS, self._poll_watch_events)
 
     def clear_focus_on_window_click(self, event):
         """Снимает фокус с активного виджета при клике на пустое место окна."""
@@ -185,33 +342,34 @@ class App(ctk.CTk):
     def toggle_toplevel_dirs_only(self):
         """Обрабатывает изменение состояния чек-бокса отображения подпапок."""
         is_toplevel_only = bool(self.toplevel_dirs_checkbox.get())
-        if self.logic.set_toplevel_dirs_only(is_toplevel_only):
-            # Логика изменила состояние, нужно обновить выпадающий список
+        result = self.logic.set_toplevel_dirs_only(is_toplevel_only)
+        if result:
+            message, status = result
+            # После смены режима отображения папок выбор сбрасывается,
+            # поэтому обновляем и список подпапок, и список файлов.
             self._update_subdirectory_dropdown()
-            # После смены режима отображения папок, выбор сбрасывается,
-            # поэтому обновляем и список файлов для "Искать везде".
-            self.refresh_ui_from_logic()
+            self._handle_logic_result(message, status)
 
     def _update_subdirectory_dropdown(self):
-        """Обновляет выпадающий список подпапками из слоя логики."""
+        """Обновляет список выбора подпапкой из слоя логики."""
         subdirs = self.logic.subdirectories
-        options = ["Искать везде"] + subdirs
-        self.subdir_combobox.configure(values=options)
-        self.subdir_combobox.set("Искать везде")  # Сбрасываем выбор
-        # Отключаем список, если нет подпапок для выбора
-        state = "readonly" if subdirs else "disabled"
-        self.subdir_combobox.configure(state=state)
-
-    def on_subdirectory_selected(self, selected_value: str):
-        """Обработчик выбора подпапки из выпадающего списка."""
-        # `None` для логики означает "Искать везде"
-        subdir_to_set = None if selected_value == "Искать везде" else selected_value
+        self._shown_subdirectories = subdirs
+        # Список не копируется и не отрисовывается целиком: окно выбора
+        # показывает дерево и строит индекс поиска только при вводе текста
+        self.subdir_picker.set_subdirectories(
+            subdirs, nested=not self.logic.toplevel_dirs_only
+        )
+        # Показываем выбор из логики (после смены папки он сброшен)
+        self.subdir_picker.set(self.logic.selected_subdirectory)
+        # Отключаем выбор, если нет подпапок
+        self.subdir_picker.configure(state="normal" if subdirs else "disabled")
 
+    def on_subdirectory_selected(self, subdir_to_set: str | None):
+        """Обработчик выбора подпапки (None означает "Искать везде")."""
         result = self.logic.set_selected_subdirectory(subdir_to_set)
         if result:
             message, status = result
-            self._update_info_label(message, status)
-            self._update_button_states()
+            self._handle_logic_result(message, status)
 
     def toggle_recursive_search(self):
         """
@@ -221,8 +379,7 @@ class App(ctk.CTk):
         result = self.logic.set_recursive_scan(is_recursive)
         if result:
             message, status = result
-            self._update_info_label(message, status)
-            self._update_button_states()
+            self._handle_logic_result(message, status)
 
     def update_extensions_and_refresh(self, event=None):
         """
@@ -243,18 +400,245 @@ class App(ctk.CTk):
 
         # Если расширения изменились, логика вернет сообщение для отображения
         if message:
-            self._update_info_label(message, status)
-            self._update_button_states()
+            self._handle_logic_result(message, status)
 
         # Убираем фокус с поля ввода после нажатия Enter для удобства
         if event and hasattr(event, "keysym") and event.keysym == "Return":
             self.focus()
 
+    def update_metadata_filter(self, event=None):
+        """Передает в логику фильтр по размеру и дате из полей ввода."""
+        values = {}
+        for name, entry in self.metadata_entries.items():
+            text = entry.get().strip().replace(",", ".")
+            try:
+                values[name] = max(float(text), 0.0) if text else 0.0
+            except ValueError:
+                values[name] = 0.0
+            # Показываем значение так, как его поняла программа
+            entry.delete(0, "end")
+            if values[name]:
+                entry.insert(0, f"{values[name]:g}")
+
+        result = self.logic.set_metadata_filter(
+            values["min_size_mb"], values["max_size_mb"], int(values["max_age_days"])
+        )
+        if result:
+            message, status = result
+            self._handle_logic_result(message, status)
+        if event and hasattr(event, "keysym") and event.keysym == "Return":
+            self.focus()
+
     def refresh_ui_from_logic(self):
-        """Обновляет все элементы UI на основе текущего состояния логики."""
-        message, status = self.logic.refresh_file_list()
+        """Запускает пересканирование и обновляет UI по его результату."""
+        if self.logic.picker_mode == "reservoir":
+            # Сканировать нечего: файлы ищутся при каждом выборе
+            self._handle_logic_result(*self.logic.prepare_reservoir())
+            return
+        self._start_scan()
+
+    def _handle_logic_result(self, message: str, status: str):
+        """Показывает результат операции логики и при необходимости запускает сканирование."""
+        if status == "scanning":
+            self._start_scan()
+            return
+        # В режиме "reservoir" подпапки обновляются без сканирования
+        if self.logic.subdirectories is not self._shown_subdirectories:
+            self._update_subdirectory_dropdown()
         self._update_info_label(message, status)
         self._update_button_states()
+        # Список файлов мог измениться: заранее выбранный файл — тоже
+        self._start_prefetch()
+
+    def _start_scan(self):
+        """Запускает фоновое сканирование; предыдущее сканирование отменяется."""
+        self._loading_index = False
+        self.logic.ensure_watching()
+        self.scan_worker.submit(self.logic.make_scan_task())
+        if self.logic.file_list_outdated:
+            self._update_info_label("Сканирование...", "info")
+        else:
+            # Список уже получен из индекса, идет проверка изменений на диске
+            found_count = self.logic.file_list.visible_count
+            self._update_info_label(
+                f"Найдено файлов: {found_count} (проверка...)", "info"
+            )
+        self._update_button_states()
+        if not self._scan_polling:
+            self._scan_polling = True
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_scan_worker)
+
+    def _poll_scan_worker(self):
+        """Забирает события фонового сканирования и обновляет UI."""
+        for kind, payload in self.scan_worker.poll():
+            if kind == "progress":
+                # Если список уже взят из индекса, оставляем его размер на экране
+                if self.logic.file_list_outdated:
+                    self._show_scan_progress(payload)
+            elif kind == "found":
+                # Из уже найденных файлов можно выбирать до конца сканирования
+                self.logic.add_found_files(payload)
+            elif kind == "done" and self._loading_index:
+                self._loading_index = False
+                result = self.logic.apply_index_result(payload)
+                if result:
+                    self._update_info_label(*result)
+                    self._update_subdirectory_dropdown()
+                # Список из индекса уже можно использовать; проверяем его на диске
+                self.refresh_ui_from_logic()
+            elif kind == "done":
+                startup_timing.mark("scan_done")
+                message, status = self.logic.apply_scan_result(payload)
+                self._update_info_label(message, status)
+                if self.logic.subdirectories is not self._shown_subdirectories:
+                    self._update_subdirectory_dropdown()
+                self._update_stats_window()
+                self._start_dedup()
+                self._start_prefetch()
+            else:  # error
+                self.logic.end_scan()
+                self._update_info_label(f"Ошибка сканирования:\n{payload}", "error")
+
+        if self.scan_worker.busy:
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_scan_worker)
+        else:
+            self._scan_polling = False
+        self._update_button_states()
+
+    def _show_scan_progress(self, scanned_count: int):
+        """Показывает ход первого сканирования папки."""
+        found_count = len(self.logic.file_list)
+        if found_count:
+            text = (
+                f"Сканирование... файлов: {scanned_count}, "
+                f"подходящих: {found_count} (можно выбирать)"
+            )
+        else:
+            text = f"Сканирование... файлов: {scanned_count}"
+        self._update_info_label(text, "info")
+
+    def _start_dedup(self):
+        """Запускает поиск дубликатов в фоне (если он включен)."""
+        task = self.logic.make_dedup_task()
+        if task is None:
+            return
+        self.dedup_worker.submit(task)
+        if not self._dedup_polling:
+            self._dedup_polling = True
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_dedup_worker)
+
+    def _poll_dedup_worker(self):
+        """Применяет найденные группы дубликатов."""
+        for kind, payload in self.dedup_worker.poll():
+            if kind == "done":
+                message, status = self.logic.apply_dedup_result(payload)
+                if not self.logic.file_list_outdated:
+                    self._update_info_label(message, status)
+                self._update_duplicates_window()
+            elif kind == "error":
+                self._update_error_label(
+                    f"Ошибка поиска дубликатов:\n{payload}", "error"
+                )
+
+        if self.dedup_worker.busy:
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_dedup_worker)
+        else:
+            self._dedup_polling = False
+        self._update_button_states()
+
+    def show_duplicates(self):
+        """Открывает окно с группами дубликатов для удаления лишних копий."""
+        window = self._duplicates_window
+        if window is not None and window.winfo_exists():
+            window.focus()
+            return
+        self._duplicates_window = ctk.CTkToplevel(self)
+        self._duplicates_window.title("Дубликаты")
+        self._duplicates_window.geometry("640x420")
+        self._duplicates_frame = ctk.CTkScrollableFrame(self._duplicates_window)
+        self._duplicates_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self._duplicates_frame.grid_columnconfigure(0, weight=1)
+        self._update_duplicates_window()
+
+    def _update_duplicates_window(self):
+        """Перестраивает список групп в окне дубликатов, если оно открыто."""
+        window = self._duplicates_window
+        if window is None or not window.winfo_exists():
+            return
+        frame = self._duplicates_frame
+        for widget in frame.winfo_children():
+            widget.destroy()
+
+        groups = self.logic.duplicate_groups
+        if not groups:
+            text = (
+                "Поиск дубликатов еще идет."
+                if self.dedup_worker.busy
+                else "Дубликаты не найдены."
+            )
+            ctk.CTkLabel(frame, text=text).grid(row=0, column=0, sticky="w")
+            return
+
+        row = 0
+        root = Path(self.logic.directory_to_scan)
+        for number, group in enumerate(groups[:MAX_SHOWN_DUPLICATE_GROUPS], 1):
+            ctk.CTkLabel(
+                frame, text=f"Группа {number}, файлов: {len(group)}", anchor="w"
+            ).grid(row=row, column=0, columnspan=2, pady=(8, 2), sticky="w")
+            row += 1
+            for path in group:
+                try:
+                    shown = str(Path(path).relative_to(root))
+                except ValueError:
+                    shown = path
+                ctk.CTkLabel(frame, text=shown, anchor="w").grid(
+                    row=row, column=0, padx=(10, 5), sticky="ew"
+                )
+                marked = path in self.logic.trash_queue
+                ctk.CTkButton(
+                    frame,
+                    text="В очереди" if marked else "В корзину",
+                    state="disabled" if marked else "normal",
+                    width=90,
+                    fg_color="firebrick",
+                    hover_color="darkred",
+                    command=lambda path=path: self._delete_duplicate(path),
+                ).grid(row=row, column=1, pady=1)
+                row += 1
+        if len(groups) > MAX_SHOWN_DUPLICATE_GROUPS:
+            ctk.CTkLabel(
+                frame,
+                text=f"...и еще групп: {len(groups) - MAX_SHOWN_DUPLICATE_GROUPS}",
+            ).grid(row=row, column=0, pady=(8, 0), sticky="w")
+
+    def _delete_duplicate(self, path: str):
+        """Ставит копию в очередь удаления (как кнопка удаления последнего файла)."""
+        message, status = self.logic.delete_file(path)
+        self._after_delete(message, status)
+
+    def show_scan_stats(self):
+        """Открывает окно со статистикой последнего сканирования."""
+        if self._stats_window is not None and self._stats_window.winfo_exists():
+            self._stats_window.focus()
+            return
+        self._stats_window = ctk.CTkToplevel(self)
+        self._stats_window.title("Статистика сканирования")
+        self._stats_window.geometry("420x320")
+        self._stats_textbox = ctk.CTkTextbox(self._stats_window, wrap="none")
+        self._stats_textbox.pack(fill="both", expand=True, padx=10, pady=10)
+        self._update_stats_window()
+
+    def _update_stats_window(self):
+        """Обновляет текст окна статистики, если оно открыто."""
+        if self._stats_window is None or not self._stats_window.winfo_exists():
+            return
+        stats = self.logic.last_scan_stats
+        text = stats.format() if stats else "Сканирование еще не завершено."
+        text += f"\n\nКэш деревьев папок:\n  {self.logic.tree_cache.format()}"
+        self._stats_textbox.configure(state="normal")
+        self._stats_textbox.delete("1.0", "end")
+        self._stats_textbox.insert("1.0", text)
+        self._stats_textbox.configure(state="disabled")
 
     def _update_info_label(self, text: str, status: str | None):
         """Обновляет основную информационную метку."""
@@ -275,10 +659,13 @@ class App(ctk.CTk):
 
     def _update_button_states(self):
         """Обновляет состояние кнопок в зависимости от состояния логики."""
-        # Основная кнопка
-        self.open_button.configure(
-            state="normal" if self.logic.file_list else "disabled"
-        )
+        # Основная кнопка (из устаревшего списка выбирать нельзя, но можно
+        # из пополняемого потоковым сканированием)
+        can_pick = self.logic.can_pick
+        self.open_button.configure(state="normal" if can_pick else "disabled")
+        if can_pick:
+            startup_timing.mark("first_pick_ready")
+            startup_timing.finish()
         # Кнопки действий для последнего файла
         self.open_folder_button.configure(
             state="normal" if self.logic.last_selected_file else "disabled"
@@ -286,20 +673,93 @@ class App(ctk.CTk):
         self.delete_button.configure(
             state="normal" if self.logic.last_selected_file else "disabled"
         )
+        self.undo_delete_button.configure(
+            state="normal" if self.logic.trash_queue.pending_count else "disabled"
+        )
 
     def open_random_file(self):
         """Обработчик нажатия на кнопку 'Открыть случайный файл'."""
         self._update_error_label("", "info")  # Очищаем старые сообщения
 
+        if self.logic.picker_mode == "reservoir":
+            # Поиск файла — обход папки, выполняем его в фоне
+            self.pick_worker.submit(self.logic.make_pick_task())
+            self._update_info_label("Поиск случайного файла...", "info")
+            if not self._pick_polling:
+                self._pick_polling = True
+                self.after(SCAN_POLL_INTERVAL_MS, self._poll_pick_worker)
+            return
+
         file_path, message = self.logic.get_random_file()
 
         self._update_info_label(message, "info")
         self._update_button_states()
 
         if file_path:
-            status = self.logic.open_last_file()
-            if status != "success":
-                self._update_error_label(status, "error")
+            self._open_last_file()
+            self._start_prefetch()
+
+    def _open_last_file(self):
+        """Открывает выбранный файл в фоне; об ошибке сообщит _on_file_launched."""
+        self.launcher.launch(str(self.logic.last_selected_file), self._on_file_launched)
+        if not self._launch_polling:
+            self._launch_polling = True
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_launcher)
+
+    def _on_file_launched(self, filepath: str, error):
+        """Сообщает об ошибке запуска приложения для файла."""
+        if error is not None:
+            self._update_error_label(
+                f"Ошибка открытия файла:\n{Path(filepath).name}", "error"
+            )
+
+    def _poll_launcher(self):
+        """Забирает результаты запуска приложений."""
+        self.launcher.poll()
+        if self.launcher.busy:
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_launcher)
+        else:
+            self._launch_polling = False
+
+    def _start_prefetch(self):
+        """Заранее выбирает и прогревает следующий файл в фоне."""
+        task = self.logic.make_prefetch_task()
+        if task is None:
+            return
+        self.prefetch_worker.submit(task)
+        if not self._prefetch_polling:
+            self._prefetch_polling = True
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_prefetch_worker)
+
+    def _poll_prefetch_worker(self):
+        """Запоминает прогретый файл; если он пропал с диска, берет другой."""
+        for kind, payload in self.prefetch_worker.poll():
+            if kind == "done" and not self.logic.apply_prefetch_result(payload):
+                self._start_prefetch()
+            elif kind == "error":
+                print(f"Не удалось подготовить следующий файл: {payload}")
+
+        if self.prefetch_worker.busy:
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_prefetch_worker)
+        else:
+            self._prefetch_polling = False
+
+    def _poll_pick_worker(self):
+        """Забирает результат выбора без списка и открывает выбранный файл."""
+        for kind, payload in self.pick_worker.poll():
+            if kind == "done":
+                paths, message = self.logic.apply_pick_result(payload)
+                self._update_info_label(message, "info")
+                if paths:
+                    self._open_last_file()
+            elif kind == "error":
+                self._update_info_label(f"Ошибка поиска:\n{payload}", "error")
+
+        if self.pick_worker.busy:
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_pick_worker)
+        else:
+            self._pick_polling = False
+        self._update_button_states()
 
     def select_directory(self):
         """Открывает диалог выбора директории и обновляет состояние."""
@@ -312,9 +772,8 @@ class App(ctk.CTk):
             result = self.logic.select_new_directory(new_directory)
             if result:
                 message, status = result
-                self._update_info_label(message, status)
-                self._update_button_states()
-                self._update_subdirectory_dropdown()  # Обновляем список подпапок
+                # Список подпапок обновится по завершении сканирования
+                self._handle_logic_result(message, status)
 
     def open_containing_folder(self):
         """Открывает папку с последним выбранным файлом."""
@@ -323,13 +782,77 @@ class App(ctk.CTk):
         if status != "success":
             self._update_error_label(status, "error")
             # Если файл не найден, логика сбросила last_selected_file.
-            # Обновим UI, чтобы отразить это (кнопки станут неактивными).
-            self.refresh_ui_from_logic()
+            # Обновим кнопки, чтобы отразить это (они станут неактивными).
+            self._update_button_states()
 
     def delete_last_file(self):
-        """Удаляет последний выбранный файл."""
+        """Ставит последний выбранный файл в очередь удаления."""
         message, status = self.logic.delete_last_file()
+        self._after_delete(message, status)
+
+    def _after_delete(self, message: str, status: str):
+        """Показывает результат отметки файла и откладывает удаление очереди."""
         self._update_error_label(message, status)
-        # Состояние логики изменилось (файл удален, список обновлен),
-        # поэтому полностью обновляем UI.
-        self.refresh_ui_from_logic()
+        # Логика уже убрала файл из списка, пересканирование не нужно
+        if not self.logic.file_list_outdated:
+            self._update_info_label(*self.logic.get_file_count_message())
+        self._schedule_trash()
+        self._update_button_states()
+
+    def _schedule_trash(self):
+        """Откладывает удаление очереди на trash_delay секунд после отметки."""
+        if self._trash_job is not None:
+            self.after_cancel(self._trash_job)
+        delay_ms = int(self.logic.trash_queue.delay * 1000)
+        self._trash_job = self.after(delay_ms, self._commit_trash)
+
+    def _commit_trash(self):
+        """Отправляет очередь удаления в фоновую задачу."""
+        self._trash_job = None
+        if self.trash_worker.busy:
+            # Новая задача отменила бы текущую: ждем ее завершения
+            self._trash_job = self.after(SCAN_POLL_INTERVAL_MS, self._commit_trash)
+            return
+        self._trash_total = self.logic.trash_queue.pending_count
+        task = self.logic.make_trash_task()
+        self._update_button_states()
+        if task is None:
+            return
+        self.trash_worker.submit(task)
+        if not self._trash_polling:
+            self._trash_polling = True
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_trash_worker)
+
+    def _poll_trash_worker(self):
+        """Показывает ход удаления и применяет его результат."""
+        for kind, payload in self.trash_worker.poll():
+            if kind == "progress":
+                self._update_error_label(
+                    f"Перемещение в корзину: {payload} из {self._trash_total}", "info"
+                )
+            elif kind == "done":
+                message, status = self.logic.apply_trash_result(payload)
+                self._update_error_label(message, status)
+                if not self.logic.file_list_outdated:
+                    self._update_info_label(*self.logic.get_file_count_message())
+                self._update_duplicates_window()
+            else:  # error
+                self._update_error_label(f"Ошибка удаления:\n{payload}", "error")
+
+        if self.trash_worker.busy:
+            self.after(SCAN_POLL_INTERVAL_MS, self._poll_trash_worker)
+        else:
+            self._trash_polling = False
+        self._update_button_states()
+
+    def undo_delete(self):
+        """Отменяет удаление файлов, которые еще ждут в очереди."""
+        if self._trash_job is not None:
+            self.after_cancel(self._trash_job)
+            self._trash_job = None
+        message, status = self.logic.undo_delete()
+        self._update_error_label(message, status)
+        if not self.logic.file_list_outdated:
+            self._update_info_label(*self.logic.get_file_count_message())
+        self._update_duplicates_window()
+        self._update_button_states()
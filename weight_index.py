@@ -0,0 +1,155 @@
+import itertools
+
+
+class WeightIndex:
+    """
+    Взвешенный случайный выбор путей за O(log n).
+    Веса хранятся в дереве Фенвика (дереве префиксных сумм): изменение веса
+    и выбор пути по случайной доле общей суммы занимают O(log n).
+    Освободившиеся позиции переиспользуются, поэтому индекс можно
+    поддерживать в актуальном состоянии при добавлении и удалении файлов.
+    """
+
+    def __init__(self, weights=()):
+        """weights: итерируемый набор пар (путь, вес)."""
+        self._paths: list[str | None] = []
+        self._weights: list[float] = []
+        self._slots: dict[str, int] = {}
+        self._free_slots: list[int] = []
+        # Подавленные пути и их исходные веса (см. suppress)
+        self._suppressed: dict[str, float] = {}
+        for path, weight in weights:
+            self._slots[path] = len(self._paths)
+            self._paths.append(path)
+            self._weights.append(max(float(weight), 0.0))
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._slots
+
+    @property
+    def total(self) -> float:
+        """Сумма всех весов."""
+        return self._prefix_sum(len(self._weights))
+
+    def _rebuild(self):
+        """Строит дерево Фенвика по массиву весов за O(n)."""
+        size = len(self._weights)
+        # Емкость — степень двойки, чтобы спуск по дереву был простым
+        capacity = 1
+        while capacity < size:
+            capacity *= 2
+        self._tree = [0.0] * (capacity + 1)
+        self._tree[1 : size + 1] = self._weights
+        # Суммы передаются вверх по всем узлам, включая пустые хвостовые
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                self._tree[parent] += self._tree[i]
+
+    def _add(self, slot: int, delta: float):
+        i = slot + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix_sum(self, count: int) -> float:
+        total = 0.0
+        i = count
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def get(self, path: str) -> float:
+        """Возвращает текущий вес пути (0, если пути нет)."""
+        slot = self._slots.get(path)
+        return self._weights[slot] if slot is not None else 0.0
+
+    def set(self, path: str, weight: float):
+        """Задает вес пути, добавляя путь при необходимости."""
+        weight = max(float(weight), 0.0)
+        if path in self._suppressed:
+            # Новый вес вступит в силу после восстановления
+            self._suppressed[path] = weight
+            return
+        slot = self._slots.get(path)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+                self._paths[slot] = path
+            else:
+                slot = len(self._paths)
+                self._paths.append(path)
+                self._weights.append(0.0)
+                if len(self._weights) >= len(self._tree):
+                    # Емкость исчерпана: удваиваем, перестраивая дерево
+                    self._rebuild()
+            self._slots[path] = slot
+        self._add(slot, weight - self._weights[slot])
+        self._weights[slot] = weight
+
+    def remove(self, path: str) -> bool:
+        """Удаляет путь. Возвращает True, если он был в индексе."""
+        self._suppressed.pop(path, None)
+        slot = self._slots.pop(path, None)
+        if slot is None:
+            return False
+        self._add(slot, -self._weights[slot])
+        self._weights[slot] = 0.0
+        self._paths[slot] = None
+        self._free_slots.append(slot)
+        return True
+
+    def suppress(self, path: str):
+        """Временно обнуляет вес пути, запоминая исходный (см. restore)."""
+        if path in self._slots and path not in self._suppressed:
+            weight = self._weights[self._slots[path]]
+            self.set(path, 0.0)
+            self._suppressed[path] = weight
+
+    def restore(self, path: str):
+        """Возвращает пути вес, обнуленный suppress()."""
+        weight = self._suppressed.pop(path, None)
+        if weight is not None:
+            self.set(path, weight)
+
+    def restore_all(self):
+        """Возвращает веса всем подавленным путям."""
+        for path in list(self._suppressed):
+            self.restore(path)
+
+    def sample(self, rng) -> str | None:
+        """
+        Возвращает путь с вероятностью, пропорциональной его весу.
+        rng — объект random.Random. None, если все веса нулевые.
+        """
+        total = self.total
+        if total <= 0:
+            return None
+        target = rng.random() * total
+        # Спуск по дереву: ищем первую позицию, где префиксная сумма > target
+        position = 0
+        step = (len(self._tree) - 1) or 1
+        while step:
+            next_position = position + step
+            if next_position < len(self._tree) and self._tree[next_position] <= target:
+                position = next_position
+                target -= self._tree[next_position]
+            step //= 2
+        # Из-за округления позиция может указать на пустой слот или путь
+        # с нулевым весом: берем ближайший путь с положительным весом
+        slot = min(position, len(self._weights) - 1)
+        candidates = itertools.chain(
+            range(slot, -1, -1), range(slot + 1, len(self._weights))
+        )
+        for candidate in candidates:
+            if self._paths[candidate] is not None and self._weights[candidate] > 0:
+                return self._paths[candidate]
+        # Все веса нулевые, а сумма в дереве положительна: после многих
+        # изменений в ней накопилась ошибка округления. Пересчитываем дерево
+        self._rebuild()
+        return None